@@ -0,0 +1,227 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lux_utils.display import ManagedProcess, VirtualDisplay, browser_command  # noqa: E402
+from lux_utils.rate_limit import RateLimitedImageProvider, SharedTokenBucket  # noqa: E402
+from lux_utils.tracing import Tracer, export_trace, instrument  # noqa: E402
+
+# pyautogui binds to $DISPLAY when it is imported, so nothing that pulls in
+# oagi.handler (including amazon_scraping) is imported at module level here;
+# each worker imports it after starting its own Xvfb display.
+
+
+def product_slug(product_name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", product_name.lower()).strip("_") or "product"
+
+
+async def scrape_product(product_name, args, image_provider, action_handler) -> dict:
+    """Run the Amazon workflow for one product with a fresh agent and observer."""
+    from oagi.agent.observer import AsyncAgentObserver
+    from oagi.agent.tasker import TaskerAgent
+
+    from lux_utils.run_history import write_run_record
+    from lux_utils.streaming_observer import StreamingObserver
+
+    from amazon_scraping import build_workflow
+
+    product_dir = os.path.join(args.save_dir, args.exp_name, product_slug(product_name))
+    os.makedirs(product_dir, exist_ok=True)
+
+    observer = StreamingObserver(os.path.join(product_dir, "history")) if args.stream_history else AsyncAgentObserver()
+    tracer = Tracer() if args.trace else None
+    observer, image_provider, action_handler = instrument(tracer, observer, image_provider, action_handler)
+    tasker = TaskerAgent(
+        api_key=os.getenv("OAGI_API_KEY"),
+        base_url=os.getenv("OAGI_BASE_URL", "https://api.agiopen.org"),
+        model=args.model_name,
+        max_steps=args.max_steps,
+        temperature=args.temperature,
+        step_observer=observer,
+    )
+    instruction, todos = build_workflow(product_name)
+    tasker.set_task(task=instruction, todos=todos)
+
+    started_at, start = datetime.now(), time.perf_counter()
+    success = False
+    error = None
+    try:
+        success = await tasker.execute(
+            instruction="",
+            action_handler=action_handler,
+            image_provider=image_provider,
+        )
+    except Exception as e:
+        error = str(e)
+        traceback.print_exc()
+    elapsed = time.perf_counter() - start
+
+    memory = tasker.get_memory()
+    result = {
+        "product_name": product_name,
+        "success": success,
+        "error": error,
+        "elapsed_s": round(elapsed, 2),
+        "todo_status": {status.value: count for status, count in memory.get_todo_status_summary().items()},
+        "task_execution_summary": memory.task_execution_summary,
+        "finished_at": datetime.now().isoformat(),
+    }
+    with open(os.path.join(product_dir, "result.json"), "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=4)
+    write_run_record(
+        product_dir, "amazon", memory, success, started_at, elapsed, error,
+        params={"product_name": product_name}, exp_name=args.exp_name,
+    )
+    observer.export("html", os.path.join(product_dir, "execution_history.html"))
+    export_trace(tracer, product_dir, "execution")
+    return result
+
+
+def worker_main(worker_id, args, product_queue, result_queue, bucket) -> None:
+    """Own one Xvfb display, browser profile and agent stack, and scrape products until the queue is drained.
+
+    Every product opens a new tab, so the browser is restarted (on the same
+    profile, keeping its cookies and cache) between products instead of letting
+    tabs pile up in a long-lived window.
+    """
+    display = VirtualDisplay(args.display_base + worker_id, args.screen_width, args.screen_height)
+    with display, tempfile.TemporaryDirectory(prefix="lux-browser-") as profile_dir:
+        from oagi import AsyncScreenshotMaker
+        from oagi.handler import AsyncPyautoguiActionHandler
+
+        image_provider = RateLimitedImageProvider(AsyncScreenshotMaker(), bucket)
+        action_handler = AsyncPyautoguiActionHandler()
+
+        while True:
+            product_name = product_queue.get()
+            if product_name is None:
+                break
+            print(f"[worker {worker_id} {display.name}] {product_name}")
+            waited_before = image_provider.waited_s
+            browser = ManagedProcess(
+                browser_command(args.browser, args.screen_width, args.screen_height, profile_dir),
+                settle_s=args.browser_settle,
+            )
+            try:
+                with browser:
+                    result = asyncio.run(scrape_product(product_name, args, image_provider, action_handler))
+            except Exception as e:
+                result = {"product_name": product_name, "success": False, "error": str(e)}
+            result["worker"] = worker_id
+            result["rate_limit_wait_s"] = round(image_provider.waited_s - waited_before, 2)
+            result_queue.put(result)
+
+
+def load_products(args) -> list[str]:
+    products = [p.strip() for p in args.products.split(",") if p.strip()] if args.products else []
+    if args.products_file:
+        with open(args.products_file, "r", encoding="utf-8") as f:
+            products += [line.strip() for line in f if line.strip()]
+    return products
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crawl Amazon for many products in parallel on virtual displays')
+    parser.add_argument('--products', type=str, default='', help='Comma-separated product names')
+    parser.add_argument('--products_file', type=str, default='', help='File with one product name per line')
+    parser.add_argument('--workers', type=int, default=4, help='Number of parallel workers (one Xvfb display each)')
+    parser.add_argument('--exp_name', type=str, default='amazon_parallel', help='Experiment name')
+    parser.add_argument('--save_dir', type=str, default='results/', help='Directory to save results')
+    parser.add_argument('--model_name', type=str, default='lux-actor-1', help='Model name')
+    parser.add_argument('--max_steps', type=int, default=24, help='Max steps per todo')
+    parser.add_argument('--temperature', type=float, default=0.0, help='Temperature')
+    parser.add_argument('--trace', action='store_true', help='Record per-phase latency spans for every product')
+    parser.add_argument('--stream_history', action='store_true', help='Write each product\'s events and screenshots to <product_dir>/history as they arrive')
+    parser.add_argument('--lux_rps', type=float, default=2.0, help='Global Lux request rate across all workers')
+    parser.add_argument('--lux_burst', type=float, default=4.0, help='Token bucket burst size')
+    parser.add_argument('--display_base', type=int, default=99, help='First Xvfb display number')
+    parser.add_argument('--screen_width', type=int, default=1920)
+    parser.add_argument('--screen_height', type=int, default=1080)
+    parser.add_argument('--browser', type=str, default='google-chrome', help='Chromium-family browser binary')
+    parser.add_argument('--browser_settle', type=float, default=3.0, help='Seconds to wait after launching the browser')
+
+    args = parser.parse_args()
+
+    products = load_products(args)
+    if not products:
+        parser.error("no products given; use --products or --products_file")
+
+    save_dir = os.path.join(args.save_dir, args.exp_name)
+    os.makedirs(save_dir, exist_ok=True)
+
+    # spawn, not fork: every worker must import pyautogui fresh against its own display
+    ctx = multiprocessing.get_context("spawn")
+    bucket = SharedTokenBucket(args.lux_rps, args.lux_burst, ctx)
+    product_queue = ctx.Queue()
+    result_queue = ctx.Queue()
+    for product in products:
+        product_queue.put(product)
+    num_workers = min(args.workers, len(products))
+    for _ in range(num_workers):
+        product_queue.put(None)
+
+    print(f"Starting {len(products)} products on {num_workers} workers at {datetime.now()}")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    workers = [
+        ctx.Process(target=worker_main, args=(i, args, product_queue, result_queue, bucket), name=f"amazon-worker-{i}")
+        for i in range(num_workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    results = []
+    while len(results) < len(products):
+        if not any(worker.is_alive() for worker in workers) and result_queue.empty():
+            print("All workers exited before every product finished")
+            break
+        try:
+            result = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            continue
+        results.append(result)
+        status = "✅" if result.get("success") else "❌"
+        print(f"  {status} {result['product_name']} ({result.get('elapsed_s', 0)}s, worker {result.get('worker')})")
+
+    for worker in workers:
+        worker.join()
+    wall_s = time.perf_counter() - start
+
+    succeeded = sum(1 for r in results if r.get("success"))
+    summary = {
+        "products": len(products),
+        "completed": len(results),
+        "succeeded": succeeded,
+        "workers": num_workers,
+        "wall_s": round(wall_s, 2),
+        "products_per_hour": round(len(results) / wall_s * 3600, 1) if wall_s > 0 else 0.0,
+        "mean_product_s": round(sum(r.get("elapsed_s", 0) for r in results) / len(results), 2) if results else 0.0,
+        "lux_rps_limit": args.lux_rps,
+        "results": results,
+    }
+    summary_path = os.path.join(save_dir, "summary.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=4)
+
+    print("\n" + "=" * 60)
+    print("THROUGHPUT REPORT")
+    print("=" * 60)
+    print(f"Products: {len(results)}/{len(products)} finished, {succeeded} succeeded")
+    print(f"Workers: {num_workers}, wall time: {wall_s:.1f}s")
+    print(f"Throughput: {summary['products_per_hour']} products/hour")
+    print(f"\n📄 Summary written to: {summary_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,49 @@
 import argparse
 import asyncio
 import os
+import sys
+import time
 import traceback
 from datetime import datetime
 
 from oagi import AsyncScreenshotMaker
 from oagi.agent.observer import AsyncAgentObserver
-from oagi.agent.tasker import TaskerAgent
-from oagi.handler import AsyncPyautoguiActionHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lux_utils.budget import add_budget_arguments, budget_kwargs, print_budget_stats  # noqa: E402
+from lux_utils.cdp import CDPActionHandler, CDPImageProvider, add_browser_arguments, open_browser_page, print_browser_stats  # noqa: E402
+from lux_utils.checkpoint import ResumableTaskerAgent, TodoCheckpoint, print_checkpoint_stats  # noqa: E402
+from lux_utils.pipeline import add_pipeline_arguments, close_pipeline, pipeline, pipeline_config, print_pipeline_stats  # noqa: E402
+from lux_utils.replay import LuxSession, add_replay_arguments  # noqa: E402
+from lux_utils.run_history import write_run_record  # noqa: E402
+from lux_utils.settle import StabilityConfig, print_stability_stats, stabilize  # noqa: E402
+from lux_utils.streaming_observer import StreamingObserver  # noqa: E402
+from lux_utils.tracing import Tracer, export_trace, instrument  # noqa: E402
+
+
+def make_action_handler():
+    # pyautogui needs a display at import time, so it is only imported for live and recorded runs
+    from oagi.handler import AsyncPyautoguiActionHandler
+
+    return AsyncPyautoguiActionHandler()
+
+
+START_URL = "https://www.amazon.com"
+
+
+def build_workflow(product_name: str, on_site: bool = False) -> tuple[str, list[str]]:
+    """Instruction and todos for finding the top-selling `product_name` on Amazon.
+
+    With `on_site` the browser already shows `START_URL` (the headless backend
+    opens it directly and has no tab strip), so the first todo only searches.
+    """
+    instruction = f"Find the information about the top-selling {product_name} on Amazon"
+    todos = [
+        f"Search for {product_name} in the search bar" if on_site
+        else f"Open a new tab, go to www.amazon.com, and search for {product_name} in the search bar",
+        f"Click on 'Sort by' in the top right of the page and select 'Best Sellers'",
+    ]
+    return instruction, todos
 
 
 async def main():
@@ -18,25 +54,48 @@ async def main():
     parser.add_argument('--model_name', type=str, default='lux-actor-1', help='Model name')
     parser.add_argument('--max_steps', type=int, default=24, help='Max steps per todo')
     parser.add_argument('--temperature', type=float, default=0.0, help='Temperature')
+    parser.add_argument('--trace', action='store_true', help='Record per-phase latency spans (Chrome trace + JSONL)')
+    parser.add_argument('--stream_history', action='store_true', help='Write events and screenshots to <save_dir>/history as they arrive instead of holding them in memory')
+    parser.add_argument('--settle_detect', action='store_true', help='Wait for the screen to stop changing instead of fixed post-action delays')
+    parser.add_argument('--settle_timeout', type=float, default=5.0, help='Max seconds to wait for the screen to settle')
+    parser.add_argument('--settle_threshold', type=float, default=0.002, help='Fraction of changed thumbnail pixels still counted as the same screen')
+    parser.add_argument('--resume', action='store_true', help='Skip todos completed by the last run of this exp_name')
+    parser.add_argument('--resume_check', action='store_true', help='With --resume, start over unless the screen still matches the checkpoint')
+    add_replay_arguments(parser)
+    add_budget_arguments(parser)
+    add_pipeline_arguments(parser)
+    add_browser_arguments(parser)
 
     args = parser.parse_args()
 
     save_dir = os.path.join(args.save_dir, args.exp_name)
     os.makedirs(save_dir, exist_ok=True)
 
-    instruction = f"Find the information about the top-selling {args.product_name} on Amazon"
-    todos = [
-        f"Open a new tab, go to www.amazon.com, and search for {args.product_name} in the search bar",
-        f"Click on 'Sort by' in the top right of the page and select 'Best Sellers'",
-    ]
-
-    observer = AsyncAgentObserver()
-    image_provider = AsyncScreenshotMaker()
-    action_handler = AsyncPyautoguiActionHandler()
+    instruction, todos = build_workflow(args.product_name, on_site=args.backend == "cdp")
+
+    session = LuxSession.from_args(args).start()
+    observer = StreamingObserver(os.path.join(save_dir, "history"), resume=args.resume) if args.stream_history else AsyncAgentObserver()
+    browser = None
+    if args.backend == "cdp" and not session.replaying:
+        browser, page = await open_browser_page(args, START_URL)
+        image_provider, action_handler = session.io(lambda: CDPImageProvider(page), lambda: CDPActionHandler(page))
+    else:
+        image_provider, action_handler = session.io(AsyncScreenshotMaker, make_action_handler)
+    raw_io = (image_provider, action_handler)
+
+    tracer = Tracer() if args.trace else None
+    observer, image_provider, action_handler = instrument(tracer, observer, image_provider, action_handler)
+    stability = StabilityConfig(timeout_s=args.settle_timeout, diff_threshold=args.settle_threshold) if args.settle_detect else None
+    image_provider, action_handler = stabilize(stability, image_provider, action_handler)
+    observer, image_provider, action_handler = pipeline(
+        pipeline_config(args), observer, image_provider, action_handler, api_key=session.api_key, base_url=session.base_url
+    )
 
-    tasker = TaskerAgent(
-        api_key=os.getenv("OAGI_API_KEY"),
-        base_url=os.getenv("OAGI_BASE_URL", "https://api.agiopen.org"),
+    checkpoint = TodoCheckpoint(save_dir)
+    tasker = ResumableTaskerAgent(
+        **session.agent_kwargs(),
+        checkpoint=checkpoint,
+        **budget_kwargs(args),
         model=args.model_name,
         max_steps=args.max_steps,
         temperature=args.temperature,
@@ -44,12 +103,17 @@ async def main():
     )
 
     tasker.set_task(task=instruction, todos=todos)
+    if args.resume:
+        await tasker.restore_checkpoint(image_provider, check_screen=args.resume_check)
 
-    print(f"Starting task execution at {datetime.now()}")
+    started_at = datetime.now()
+    print(f"Starting task execution at {started_at}")
     print(f"Task: {instruction}")
     print(f"Number of todos: {len(todos)}")
     print("=" * 60)
 
+    start = time.perf_counter()
+    success, error = False, None
     try:
         success = await tasker.execute(
             instruction="",
@@ -85,9 +149,27 @@ async def main():
     except Exception as e:
         print(f"\n❌ Error during execution: {e}")
         traceback.print_exc()
+        error = repr(e)
+    finally:
+        # Stop in-flight prefetch captures and uploads while the browser they talk to is still up
+        await close_pipeline(image_provider)
+        if browser is not None:
+            await browser.close()
+    write_run_record(
+        save_dir, "amazon", tasker.get_memory(), success, started_at, time.perf_counter() - start, error,
+        params={"product_name": args.product_name, "backend": args.backend},
+    )
 
     output_file = os.path.join(save_dir, f"{args.product_name}_execution_history.html")
     observer.export("html", output_file)
+    export_trace(tracer, save_dir, args.product_name)
+    session.stop()
+    session.report()
+    print_stability_stats(image_provider)
+    print_browser_stats(*raw_io)
+    print_checkpoint_stats(checkpoint)
+    print_budget_stats(tasker)
+    print_pipeline_stats(observer)
     print(f"\n📄 Execution history exported to: {output_file}")
 
 
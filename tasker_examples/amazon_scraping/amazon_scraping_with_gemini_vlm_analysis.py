@@ -1,41 +1,102 @@
 import os
+import sys
 import json
 import argparse
-import base64
 import asyncio
+import time
 import traceback
 from datetime import datetime
 
-from oagi import AsyncScreenshotMaker
 from oagi.agent.observer import AsyncAgentObserver
 from oagi.agent.tasker import TaskerAgent
+from oagi.agent.tasker.memory import PlannerMemory
 from oagi.handler import AsyncPyautoguiActionHandler
+from oagi.types import Action, ActionType
 
 # Our custom VLM
 from model_engine import ModelEngine, ModelInfo
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lux_utils.artifacts import ArtifactStore, AsyncArtifactWriter, print_artifact_stats  # noqa: E402
+from lux_utils.async_engine import AsyncModelEngine, add_engine_arguments, print_engine_stats  # noqa: E402
+from lux_utils.extraction import RowSink, ViewportExtractor, print_extraction_stats  # noqa: E402
+from lux_utils.hedging import HedgedEngine, add_hedge_arguments, print_hedge_stats  # noqa: E402
+from lux_utils.imaging import PreprocessConfig, encode_image, parse_crop  # noqa: E402
+from lux_utils.run_history import write_run_record  # noqa: E402
+from lux_utils.settle import StabilityConfig, changed_fraction, thumbnail  # noqa: E402
+from lux_utils.streaming_observer import StreamingObserver  # noqa: E402
+from lux_utils.vlm_batch import FieldSpec, analyze_fields  # noqa: E402
+from lux_utils.vlm_cache import VLMAnswerCache  # noqa: E402
+from lux_utils.x11_capture import add_capture_arguments, apply_capture_region, make_image_provider, print_capture_stats  # noqa: E402
+from lux_utils.tracing import Tracer, export_trace, instrument  # noqa: E402
 
-def analyze_screenshot(screenshot_path: str, question: str, vlm: ModelEngine):
-    """Encode a screenshot and ask the model to answer `question` about it."""
-    if not os.path.exists(screenshot_path):
-        raise FileNotFoundError(f"Screenshot not found: {screenshot_path}")
+# Regions of the results page worth sending to the VLM, as left, top, right, bottom fractions
+CROP_PRESETS = {
+    "results": (0.18, 0.12, 1.0, 1.0),
+    "first_row": (0.18, 0.12, 1.0, 0.65),
+}
 
-    with open(screenshot_path, "rb") as f:
-        b64_image = base64.b64encode(f.read()).decode("ascii")
+# Everything we want from the results page, asked in one VLM request
+PRODUCT_FIELDS = {
+    "name": FieldSpec("Name of the first (top-selling) product in the search results"),
+    "price": FieldSpec("Current price of that product, as a number without currency symbol", type="number"),
+    "discount": FieldSpec("Discount shown for that product, e.g. '20% off'", required=False),
+    "rating": FieldSpec("Star rating of that product out of 5", type="number", required=False),
+    "color": FieldSpec("Color of that product", required=False),
+    "first_row": FieldSpec(
+        "Every item in the first row of the search results as objects with name, color, price and discount",
+        type="array",
+    ),
+}
 
-    lower_path = screenshot_path.lower()
-    if lower_path.endswith((".jpg", ".jpeg")):
-        mime = "image/jpeg"
-    else:
-        mime = "image/png"
+# One row per product card when extracting the top N results across viewports and pages
+PRODUCT_ROW_FIELDS = {
+    "name": FieldSpec("product title"),
+    "price": FieldSpec("current price as a number without currency symbol", type="number"),
+    "rating": FieldSpec("star rating out of 5", type="number", required=False),
+    "reviews": FieldSpec("number of ratings", type="integer", required=False),
+    "discount": FieldSpec("discount shown, e.g. '20% off'", required=False),
+    "sponsored": FieldSpec("whether the card is marked Sponsored", type="boolean", required=False),
+}
+# Adjacent viewports overlap, so the same card is seen twice; name and price identify it
+PRODUCT_KEY_FIELDS = ["name", "price"]
 
-    user_messages = [
-        {"type": "text", "content": question},
-        {"type": "image_url", "image_url": {"url": f"data:{mime};base64,{b64_image}"}},
-    ]
 
-    # No special system prompt needed; keep it empty to let the model focus on the question.
-    return vlm([], user_messages)
+async def extract_top_products(tasker, image_provider, action_handler, extractor, screenshot, args) -> None:
+    """Walk the results viewport by viewport and page by page, extracting each viewport while moving to the next.
+
+    Scrolling is a plain scroll action; only moving to the next page goes
+    through the agent. A scroll that leaves the screen unchanged means the
+    bottom of the page has been reached.
+    """
+    stability = StabilityConfig()
+    for page in range(1, args.max_pages + 1):
+        previous = None
+        for viewport in range(1, args.max_viewports + 1):
+            current = thumbnail(screenshot, stability.thumb_size)
+            if previous is not None and changed_fraction(previous, current, stability.pixel_threshold) <= stability.diff_threshold:
+                break
+            previous = current
+            await extractor.submit(screenshot, page, viewport)
+            if extractor.full or viewport == args.max_viewports:
+                break
+            await action_handler([Action(type=ActionType.SCROLL, argument="500, 600, down", count=args.scroll_count)])
+            await asyncio.sleep(args.scroll_settle)
+            screenshot = await image_provider()
+        if extractor.full or page == args.max_pages:
+            return
+
+        # The previous page's last viewports are extracted while the agent finds the next page
+        tasker.memory = PlannerMemory()
+        tasker.current_todo_index = -1
+        tasker.set_task(
+            task=f"Go to page {page + 1} of the {args.product_name} search results on Amazon",
+            todos=[f"Scroll to the bottom of the search results and click 'Next' to go to page {page + 1}"],
+        )
+        if not await tasker.execute(instruction="", action_handler=action_handler, image_provider=image_provider):
+            print(f"⚠️ Could not reach results page {page + 1}; stopping extraction")
+            return
+        screenshot = await image_provider()
 
 
 async def main():
@@ -47,6 +108,28 @@ async def main():
     parser.add_argument('--model_name', type=str, default='lux-actor-1', help='Model name')
     parser.add_argument('--max_steps', type=int, default=24, help='Max steps per todo')
     parser.add_argument('--temperature', type=float, default=0.0, help='Temperature')
+    parser.add_argument('--trace', action='store_true', help='Record per-phase latency spans (Chrome trace + JSONL)')
+    parser.add_argument('--stream_history', action='store_true', help='Write events and screenshots to <save_dir>/history as they arrive instead of holding them in memory')
+    parser.add_argument('--vlm_cache', type=str, default='', help='SQLite file for the VLM answer cache (disabled if empty)')
+    parser.add_argument('--vlm_cache_distance', type=int, default=4, help='Max perceptual-hash bit distance for a cache hit')
+    parser.add_argument('--vlm_cache_ttl_hours', type=float, default=24.0, help='Ignore cached answers older than this')
+    parser.add_argument('--vlm_cache_size', type=int, default=5000, help='Max cached answers before LRU eviction')
+    parser.add_argument('--vlm_max_dim', type=int, default=None, help='Downscale VLM screenshots so the longest side fits')
+    parser.add_argument('--vlm_crop', type=str, default='', help='Crop preset (results, first_row) or left,top,right,bottom fractions')
+    parser.add_argument('--vlm_format', type=str, default=None, choices=['PNG', 'JPEG', 'WEBP'], help='Re-encode VLM screenshots')
+    parser.add_argument('--vlm_quality', type=int, default=80, help='JPEG/WebP quality for re-encoded screenshots')
+    parser.add_argument('--skip_screenshot_save', action='store_true', help='Do not write the analyzed screenshot to save_dir')
+    parser.add_argument('--artifact_store', type=str, default='', help='Content-addressed directory to keep screenshots in, deduplicated across runs (disabled if empty)')
+    parser.add_argument('--top_n', type=int, default=0, help='Also extract the top N products across viewports and pages (disabled if 0)')
+    parser.add_argument('--max_pages', type=int, default=3, help='Results pages to visit for --top_n')
+    parser.add_argument('--max_viewports', type=int, default=6, help='Viewports to extract per results page')
+    parser.add_argument('--scroll_count', type=int, default=5, help='Scroll clicks between viewports; keep some overlap so no card is cut off')
+    parser.add_argument('--scroll_settle', type=float, default=1.0, help='Seconds to let the page render after a scroll')
+    parser.add_argument('--extract_depth', type=int, default=2, help='Viewports extracted concurrently while navigating')
+    parser.add_argument('--products_out', type=str, default='', help='Product rows file, .jsonl or .parquet (default: <save_dir>/<product>_products.jsonl)')
+    add_engine_arguments(parser)
+    add_hedge_arguments(parser)
+    add_capture_arguments(parser)
 
     args = parser.parse_args()
 
@@ -55,10 +138,26 @@ async def main():
     os.makedirs(save_dir, exist_ok=True)
 
     # load VLM
-    with open(args.model_info_path, 'r', encoding='utf-8') as f:
-        model_info = json.load(f)
-    model_info = ModelInfo(**model_info)
-    vlm = ModelEngine(model_info)
+    def make_vlm(model_info_path):
+        with open(model_info_path, 'r', encoding='utf-8') as f:
+            model_info = ModelInfo(**json.load(f))
+        return AsyncModelEngine.from_args(model_info, args) if args.vlm_pooled else ModelEngine(model_info)
+
+    vlm = HedgedEngine.from_args(args, make_vlm) if args.vlm_hedge else make_vlm(args.model_info_path)
+    preprocess = PreprocessConfig(
+        max_dim=args.vlm_max_dim,
+        crop=parse_crop(args.vlm_crop, CROP_PRESETS),
+        format=args.vlm_format,
+        quality=args.vlm_quality,
+    )
+    vlm_cache = None
+    if args.vlm_cache:
+        vlm_cache = VLMAnswerCache(
+            args.vlm_cache,
+            max_distance=args.vlm_cache_distance,
+            ttl_s=args.vlm_cache_ttl_hours * 3600,
+            max_entries=args.vlm_cache_size,
+        )
 
     # Define the workflow
     instruction = f"Find the information about the top-selling {args.product_name} on Amazon"
@@ -68,9 +167,14 @@ async def main():
     ]
 
     # Initialize automation toolkit
-    observer = AsyncAgentObserver()
-    image_provider = AsyncScreenshotMaker()
+    observer = StreamingObserver(os.path.join(save_dir, "history")) if args.stream_history else AsyncAgentObserver()
+    image_provider = make_image_provider(args)
     action_handler = AsyncPyautoguiActionHandler()
+    apply_capture_region(args, image_provider, action_handler)
+    capture = image_provider
+
+    tracer = Tracer() if args.trace else None
+    observer, image_provider, action_handler = instrument(tracer, observer, image_provider, action_handler)
 
     tasker = TaskerAgent(
         api_key=os.getenv("OAGI_API_KEY"),
@@ -83,11 +187,14 @@ async def main():
 
     tasker.set_task(task=instruction, todos=todos)
 
-    print(f"Starting task execution at {datetime.now()}")
+    started_at = datetime.now()
+    print(f"Starting task execution at {started_at}")
     print(f"Task: {instruction}")
     print(f"Number of todos: {len(todos)}")
     print("=" * 60)
 
+    start = time.perf_counter()
+    success, error = False, None
     try:
         # Execute the task
         success = await tasker.execute(
@@ -127,31 +234,81 @@ async def main():
     except Exception as e:
         print(f"\n❌ Error during execution: {e}")
         traceback.print_exc()
+        error = repr(e)
+    # Product extraction starts each results page with fresh memory; the record covers the todos
+    run_memory = tasker.get_memory()
 
-    # Analyze the final screenshot with VLM
-    screenshot_path = os.path.join(save_dir, f"{args.product_name}_screenshot.png")
+    # Analyze the final screenshot with VLM; the artifact is written in the background
+    artifact_store = ArtifactStore(args.artifact_store) if args.artifact_store else None
+    writer = AsyncArtifactWriter(enabled=not args.skip_screenshot_save, store=artifact_store)
     last_screenshot = await image_provider()
-    last_screenshot.image.save(screenshot_path)
-    
-    result = analyze_screenshot(
-        screenshot_path,
-        "Describe the name, color, price, and discount of the items in the first row of the search results",
-        vlm,
+    encoded = encode_image(last_screenshot, preprocess=preprocess)
+    screenshot_path = writer.write(encoded, os.path.join(save_dir, f"{args.product_name}_screenshot.png"))
+
+    analyze = asyncio.to_thread(analyze_fields, encoded, PRODUCT_FIELDS, vlm, vlm_cache)
+    extraction = None
+    if args.top_n:
+        products_path = args.products_out or os.path.join(save_dir, f"{args.product_name}_products.jsonl")
+        extractor = ViewportExtractor(
+            PRODUCT_ROW_FIELDS,
+            PRODUCT_KEY_FIELDS,
+            vlm,
+            RowSink(products_path, PRODUCT_ROW_FIELDS),
+            item_description="Every product card in the search results visible in the screenshot, ignoring ads outside the results grid",
+            cache=vlm_cache,
+            preprocess=preprocess,
+            depth=args.extract_depth,
+            limit=args.top_n,
+        )
+        try:
+            analysis, _ = await asyncio.gather(
+                analyze,
+                extract_top_products(tasker, image_provider, action_handler, extractor, last_screenshot, args),
+            )
+        finally:
+            stats = await extractor.finish()
+        print_extraction_stats(stats, products_path)
+        extraction = {"path": products_path, **stats.as_dict()}
+    else:
+        analysis = await analyze
+    print(f"VLM result: {json.dumps(analysis.values, ensure_ascii=False)}")
+    print(
+        f"VLM requests: {analysis.requests}, uploaded {analysis.upload_bytes} bytes, "
+        f"re-asked: {analysis.reasked or 'none'}"
     )
-    print(f"VLM result: {result}")
+    if analysis.errors:
+        print(f"Fields failing validation: {analysis.errors}")
+    await writer.flush()
+    print_artifact_stats(artifact_store)
+    print_capture_stats(capture)
+    if vlm_cache:
+        print(f"VLM cache: {vlm_cache.stats()}")
+        vlm_cache.close()
+    print_engine_stats(vlm)
+    print_hedge_stats(vlm)
+    if isinstance(vlm, (AsyncModelEngine, HedgedEngine)):
+        vlm.close()
 
     # Save JSON results
     result_path = os.path.join(save_dir, f"{args.product_name}_result.json")
     with open(result_path, 'w', encoding='utf-8') as f:
         json.dump({
-            "result": result,
+            "result": analysis.values,
+            "validation_errors": analysis.errors,
+            "vlm_requests": analysis.requests,
             "screenshot_path": screenshot_path,
+            "products": extraction,
         }, f, ensure_ascii=False, indent=4)
     print(f"Results saved to {result_path}")
+    write_run_record(
+        save_dir, "amazon_vlm", run_memory, success, started_at, time.perf_counter() - start, error,
+        vlm_results=analysis.values, params={"product_name": args.product_name, "top_n": args.top_n},
+    )
 
     # Export HTML execution history
     output_file = os.path.join(save_dir, f"{args.product_name}_execution_history.html")
     observer.export("html", output_file)
+    export_trace(tracer, save_dir, args.product_name)
     print(f"\n📄 Execution history exported to: {output_file}")
 
 
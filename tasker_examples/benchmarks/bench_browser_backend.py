@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from oagi.handler.utils import PyautoguiConfig
+from oagi.types import Action, ActionType
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lux_utils.async_engine import percentile  # noqa: E402
+from lux_utils.cdp import CDPActionHandler, CDPImageProvider, HeadlessChromium  # noqa: E402
+from lux_utils.display import VirtualDisplay  # noqa: E402
+
+# A search box, a results list long enough to scroll, and a button that fetches nothing
+TEST_PAGE = """<!doctype html>
+<html><head><style>
+body { font: 15px sans-serif; margin: 0; }
+header { background: #232f3e; color: white; padding: 12px; display: flex; gap: 8px; }
+input { flex: 1; font-size: 16px; padding: 6px; }
+li { padding: 18px; border-bottom: 1px solid #ddd; }
+li:nth-child(odd) { background: #f7f7f7; }
+</style></head><body>
+<header><input id="q" placeholder="Search"><button onclick="document.title = q.value">Go</button></header>
+<ul>""" + "".join(f"<li>Product {i}: a purse with a {i % 7 + 2}-star rating, ${10 + i}.99</li>" for i in range(300)) + """</ul>
+</body></html>"""
+
+# One scripted agent step per batch, cycled: roughly what a search-and-browse todo does
+STEP_ACTIONS = [
+    [Action(type=ActionType.CLICK, argument="400, 40")],
+    [Action(type=ActionType.HOTKEY, argument="ctrl+a"), Action(type=ActionType.TYPE, argument="leather purse")],
+    [Action(type=ActionType.HOTKEY, argument="enter")],
+    [Action(type=ActionType.SCROLL, argument="500, 600, down", count=2)],
+    [Action(type=ActionType.CLICK, argument="300, 500")],
+    [Action(type=ActionType.SCROLL, argument="500, 600, up", count=2)],
+]
+
+
+async def run_steps(image_provider, action_handler, steps: int) -> dict[str, list[float]]:
+    """Capture, hand the bytes on as Lux would get them, act; repeated `steps` times."""
+    timings = {"step": [], "capture": [], "act": []}
+    for step in range(steps):
+        start = time.perf_counter()
+        image = await image_provider()
+        image.read()
+        captured = time.perf_counter()
+        await action_handler(STEP_ACTIONS[step % len(STEP_ACTIONS)])
+        done = time.perf_counter()
+        timings["capture"].append((captured - start) * 1000)
+        timings["act"].append((done - captured) * 1000)
+        timings["step"].append((done - start) * 1000)
+    return timings
+
+
+def report(label: str, sessions: int, wall_s: float, timings: list[dict[str, list[float]]]) -> float:
+    steps = [t for run in timings for t in run["step"]]
+    captures = [t for run in timings for t in run["capture"]]
+    acts = [t for run in timings for t in run["act"]]
+    rate = len(steps) / wall_s
+    print(
+        f"{label:<26}{sessions:>9}{rate:>11.2f}{percentile(steps, 50):>11.1f}{percentile(steps, 95):>11.1f}"
+        f"{statistics.mean(captures):>12.1f}{statistics.mean(acts):>9.1f}"
+    )
+    return rate
+
+
+async def bench_pyautogui(url: str, args) -> float:
+    """A headed Chromium filling an Xvfb screen, driven by the stock provider and handler."""
+    with VirtualDisplay(args.display, 1920, 1080):
+        # pyautogui binds to $DISPLAY at import, so it comes in once the display is up
+        from oagi import AsyncScreenshotMaker
+        from oagi.handler import AsyncPyautoguiActionHandler
+
+        profile = tempfile.TemporaryDirectory(prefix="lux-bench-")
+        browser = subprocess.Popen(
+            [args.chromium, f"--user-data-dir={profile.name}", "--no-first-run", "--start-fullscreen", f"--app={url}"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            await asyncio.sleep(args.browser_startup)
+            handler = AsyncPyautoguiActionHandler(config=PyautoguiConfig(post_batch_delay=args.step_delay))
+            provider = AsyncScreenshotMaker()
+            start = time.perf_counter()
+            timings = await run_steps(provider, handler, args.steps)
+            return report("pyautogui + Xvfb", 1, time.perf_counter() - start, [timings])
+        finally:
+            browser.terminate()
+            browser.wait()
+            profile.cleanup()
+
+
+async def bench_cdp(url: str, sessions: int, args) -> float:
+    """`sessions` isolated pages in one headless Chromium, stepping concurrently."""
+    async with HeadlessChromium(args.chromium) as browser:
+        pages = await asyncio.gather(*(browser.new_page(url) for _ in range(sessions)))
+        start = time.perf_counter()
+        timings = await asyncio.gather(*(
+            run_steps(CDPImageProvider(page), CDPActionHandler(page, PyautoguiConfig(post_batch_delay=args.step_delay)), args.steps)
+            for page in pages
+        ))
+        return report("CDP headless", sessions, time.perf_counter() - start, timings)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Agent steps/sec: pyautogui on a virtual display vs. headless Chromium over DevTools')
+    parser.add_argument('--steps', type=int, default=60, help='Scripted steps per session')
+    parser.add_argument('--sessions', type=str, default='1,4,8', help='Comma-separated concurrent CDP session counts')
+    parser.add_argument('--step_delay', type=float, default=1.0, help='post_batch_delay, as the agent configures it; the CDP handler treats it as an upper bound')
+    parser.add_argument('--chromium', type=str, default='chromium')
+    parser.add_argument('--browser_startup', type=float, default=3.0, help='Seconds to let the headed browser open before the pyautogui run')
+    parser.add_argument('--display', type=int, default=130, help='Xvfb display number for the pyautogui run')
+    parser.add_argument('--skip_pyautogui', action='store_true', help='Only run the CDP backend (no Xvfb needed)')
+    args = parser.parse_args()
+
+    if shutil.which(args.chromium) is None:
+        raise SystemExit(f"{args.chromium} not found; pass --chromium with a Chromium or Chrome binary")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "page.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(TEST_PAGE)
+        url = f"file://{path}"
+
+        print(f"{args.steps} scripted steps per session, step delay {args.step_delay}s")
+        print(f"{'backend':<26}{'sessions':>9}{'steps/s':>11}{'p50 ms':>11}{'p95 ms':>11}{'capture ms':>12}{'act ms':>9}")
+        baseline = None if args.skip_pyautogui else await bench_pyautogui(url, args)
+        for sessions in (int(n) for n in args.sessions.split(',')):
+            rate = await bench_cdp(url, sessions, args)
+            if baseline:
+                print(f"  {rate / baseline:.1f}x the pyautogui steps/sec")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_step_loop_replay import synthesize_recording
+
+EXAMPLES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, EXAMPLES_DIR)
+from lux_utils.async_engine import percentile  # noqa: E402
+from lux_utils.daemon import load_workflow_builders, request, submit_job, wait_for_daemon  # noqa: E402
+
+AMAZON_SCRIPT = os.path.join(EXAMPLES_DIR, "amazon_scraping", "amazon_scraping.py")
+
+
+def cold_run(recording_dir: str, save_dir: str, exp_name: str, args) -> float:
+    """One `amazon_scraping.py --replay` process, from spawn to exit."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [
+            sys.executable, AMAZON_SCRIPT,
+            "--replay", recording_dir,
+            "--replay_latency", str(args.replay_latency),
+            "--product_name", args.product_name,
+            "--save_dir", save_dir,
+            "--exp_name", exp_name,
+        ],
+        cwd=EXAMPLES_DIR,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"cold run failed:\n{result.stderr[-2000:]}")
+    return elapsed
+
+
+async def warm_runs(recording_dir: str, save_dir: str, socket_path: str, args) -> tuple[float, list[float], list[float]]:
+    """Start the daemon once, then submit `args.runs` jobs; returns (startup, job latencies, time to first step)."""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "lux_utils.daemon", "--socket", socket_path, "serve",
+            "--replay", recording_dir,
+            "--replay_latency", str(args.replay_latency),
+            "--save_dir", save_dir,
+        ],
+        cwd=EXAMPLES_DIR,
+        stdout=subprocess.DEVNULL,
+        # oagi logs every request at INFO on stderr
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        await wait_for_daemon(socket_path, process)
+        startup_s = time.perf_counter() - start
+
+        latencies, first_step = [], []
+        for i in range(args.runs):
+            submitted = time.perf_counter()
+            first: list[float] = []
+
+            def on_event(message):
+                if message["event"] == "step" and not first:
+                    first.append(time.perf_counter() - submitted)
+
+            job = {"workflow": "amazon", "params": {"product_name": args.product_name}, "exp_name": f"warm_{i}"}
+            result = await submit_job(job, socket_path, on_event)
+            latencies.append(time.perf_counter() - submitted)
+            if result["event"] != "done" or not result["success"]:
+                raise RuntimeError(f"warm job failed: {result}")
+            first_step.extend(first)
+        await request({"op": "shutdown"}, socket_path)
+        process.wait(timeout=30)
+    finally:
+        if process.poll() is None:
+            process.kill()
+    return startup_s, latencies, first_step
+
+
+def row(label: str, values: list[float]) -> str:
+    return (
+        f"{label:<22}{statistics.mean(values) * 1000:>10.0f}{percentile(values, 50) * 1000:>10.0f}"
+        f"{percentile(values, 95) * 1000:>10.0f}{min(values) * 1000:>10.0f}"
+    )
+
+
+async def run(args) -> None:
+    _, todos = load_workflow_builders()["amazon"](args.product_name)
+    with tempfile.TemporaryDirectory() as tmp:
+        recording_dir = os.path.join(tmp, "recording")
+        synthesize_recording(recording_dir, todos, args.steps_per_todo, args.synthetic_latency)
+
+        cold = [cold_run(recording_dir, os.path.join(tmp, "cold"), f"cold_{i}", args) for i in range(args.runs)]
+        startup_s, warm, first_step = await warm_runs(recording_dir, os.path.join(tmp, "warm"), os.path.join(tmp, "daemon.sock"), args)
+
+    print(f"amazon workflow: {len(todos)} todos x {args.steps_per_todo} steps, replayed offline, {args.runs} runs each")
+    print(f"{'':<22}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'min ms':>10}")
+    print(row("cold CLI process", cold))
+    print(row("warm daemon job", warm))
+    if first_step:
+        print(row("daemon first step", first_step))
+    print(f"daemon startup (once): {startup_s * 1000:.0f} ms")
+    saved = statistics.mean(cold) - statistics.mean(warm)
+    print(f"saved per job: {saved * 1000:.0f} ms ({statistics.mean(cold) / statistics.mean(warm):.1f}x)")
+    if saved > 0:
+        print(f"daemon pays for itself after {startup_s / saved:.1f} jobs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare cold CLI runs with jobs submitted to a warm daemon, offline via replay')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--product_name', type=str, default='purse')
+    parser.add_argument('--steps_per_todo', type=int, default=3, help='Actor steps per synthetic todo (last one finishes)')
+    parser.add_argument('--synthetic_latency', type=float, default=1.5, help='Model latency stored in the synthetic recording')
+    parser.add_argument('--replay_latency', type=float, default=0.0, help='Fraction of recorded latency to sleep during replay')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from bench_screenshot_encoding import synthetic_screenshot
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lux_utils.async_engine import percentile  # noqa: E402
+from lux_utils.display import VirtualDisplay  # noqa: E402
+from lux_utils.x11_capture import XShmCapture, XShmScreenshotMaker, parse_region  # noqa: E402
+
+RESOLUTIONS = {"1080p": (1920, 1080), "4k": (3840, 2160)}
+
+
+def paint_screen(width: int, height: int) -> None:
+    """Draw a UI-like frame on the root window, so grabs and resizes work on realistic pixels."""
+    from Xlib import X, display
+
+    connection = display.Display()
+    root = connection.screen().root
+    gc = root.create_gc()
+    image = synthetic_screenshot(width, height)
+    # Stay under the server's maximum request size
+    rows = max(1, (connection.info.max_request_length * 4 - 64) // (width * 4))
+    for top in range(0, height, rows):
+        band = image.crop((0, top, width, min(height, top + rows)))
+        root.put_image(gc, 0, top, band.width, band.height, X.ZPixmap, 24, 0, band.tobytes("raw", "BGRX"))
+    connection.sync()
+    connection.close()
+
+
+def measure(fn, iterations: int, warmup: int = 2) -> list[float]:
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def row(label: str, timings: list[float]) -> str:
+    mean = statistics.mean(timings)
+    return (
+        f"{label:<34}{mean:>9.2f}{percentile(timings, 50):>9.2f}{percentile(timings, 95):>9.2f}"
+        f"{1000 / mean:>9.1f}"
+    )
+
+
+def run_resolution(name: str, width: int, height: int, display_number: int, args) -> None:
+    with VirtualDisplay(display_number, width, height):
+        paint_screen(width, height)
+        # pyautogui binds to $DISPLAY at import, so it comes in once the display is up
+        import pyautogui
+        from oagi.handler.screenshot_maker import ScreenshotMaker
+
+        region = parse_region(args.region) or (0, height // 10, width, height - height // 10)
+        stock = ScreenshotMaker()
+        capture = XShmCapture()
+        region_capture = XShmCapture(region)
+        provider = XShmScreenshotMaker()
+        region_provider = XShmScreenshotMaker(region=region)
+        try:
+            cases = {
+                "pyautogui grab (stock)": pyautogui.screenshot,
+                "xshm grab": capture.grab,
+                f"xshm grab {region[2]}x{region[3]} region": region_capture.grab,
+                "AsyncScreenshotMaker path (stock)": stock,
+                "XShmScreenshotMaker": provider.capture,
+                "XShmScreenshotMaker region": region_provider.capture,
+            }
+            print(f"\n{name} ({width}x{height}), {args.iterations} captures each; provider rows include the default ImageConfig resize")
+            print(f"{'capture':<34}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'fps':>9}")
+            results = {}
+            for label, fn in cases.items():
+                results[label] = measure(fn, args.iterations)
+                print(row(label, results[label]))
+            stock_ms = statistics.mean(results["pyautogui grab (stock)"])
+            print(f"xshm grab is {stock_ms / statistics.mean(results['xshm grab']):.1f}x faster than the stock grab")
+        finally:
+            capture.close()
+            region_capture.close()
+            provider.close()
+            region_provider.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare stock and X11 shared-memory screen capture on Xvfb at 1080p and 4K')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--resolutions', type=str, default='1080p,4k', help='Comma-separated subset of 1080p, 4k')
+    parser.add_argument('--region', type=str, default='', help='x,y,width,height for the region rows (default: below a browser toolbar)')
+    parser.add_argument('--display_base', type=int, default=120, help='First Xvfb display number to use')
+    args = parser.parse_args()
+
+    for i, name in enumerate(name.strip() for name in args.resolutions.split(',')):
+        width, height = RESOLUTIONS[name]
+        run_resolution(name, width, height, args.display_base + i, args)
+
+
+if __name__ == '__main__':
+    main()
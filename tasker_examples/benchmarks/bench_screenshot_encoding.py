@@ -0,0 +1,95 @@
+import argparse
+import base64
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+from oagi.handler.pil_image import PILImage
+from oagi.types import ImageConfig
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lux_utils.imaging import PreprocessConfig, encode_image  # noqa: E402
+
+
+def synthetic_screenshot(width: int, height: int, seed: int = 0) -> Image.Image:
+    """Draw a UI-like frame: flat panels, a sidebar and rows of text-sized blocks."""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), (245, 245, 245))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width // 6, height), fill=(40, 44, 52))
+    for y in range(20, height, 36):
+        draw.text((16, y), f"Sidebar item {y}", fill=(220, 220, 220))
+    for _ in range(120):
+        x = rng.randint(width // 6, width - 200)
+        y = rng.randint(0, height - 60)
+        color = tuple(rng.randint(0, 255) for _ in range(3))
+        draw.rectangle((x, y, x + rng.randint(40, 200), y + rng.randint(10, 60)), fill=color)
+    return image
+
+
+def old_path(image: Image.Image, directory: str) -> int:
+    """Baseline: PNG to disk, read it back, base64."""
+    path = os.path.join(directory, "screenshot.png")
+    image.save(path)
+    with open(path, "rb") as f:
+        b64 = base64.b64encode(f.read()).decode("ascii")
+    return len(b64)
+
+
+def new_path(image: PILImage, format: str | None, preprocess: PreprocessConfig | None = None) -> int:
+    """In-memory encode (reusing the screenshot's own bytes with format "native"), then base64."""
+    # Fresh wrapper each run so the cached `read()` bytes do not hide the encode cost
+    encoded = encode_image(PILImage(image.image, image.config), format=format, preprocess=preprocess)
+    return len(encoded.b64)
+
+
+def measure(fn, iterations: int) -> tuple[list[float], int]:
+    timings = []
+    size = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        size = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-check screenshot encode latency and bytes')
+    parser.add_argument('--image', type=str, default=None, help='Real screenshot to use instead of a synthetic one')
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--full_resolution', action='store_true', help='Skip the default ImageConfig resize')
+    parser.add_argument('--max_dim', type=int, default=1024, help='Downscale target for the preprocessed cases')
+    args = parser.parse_args()
+
+    raw = Image.open(args.image).convert("RGB") if args.image else synthetic_screenshot(args.width, args.height)
+    # Mirror what AsyncScreenshotMaker hands to the scripts: a PILImage resized per the default ImageConfig
+    screenshot = PILImage(raw) if args.full_resolution else PILImage(raw).transform(ImageConfig())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = {
+            "disk png (old)": lambda: old_path(screenshot.image, tmp),
+            "memory png (new)": lambda: new_path(screenshot, None),
+            "memory native": lambda: new_path(screenshot, "native"),
+            "preprocess jpeg q80": lambda: new_path(screenshot, None, PreprocessConfig(max_dim=args.max_dim)),
+            "preprocess webp q80": lambda: new_path(
+                screenshot, None, PreprocessConfig(max_dim=args.max_dim, format="WEBP")
+            ),
+        }
+        print(f"Screenshot {screenshot.image.size[0]}x{screenshot.image.size[1]}, {args.iterations} iterations")
+        print(f"{'path':<22}{'mean ms':>10}{'p50 ms':>10}{'max ms':>10}{'b64 bytes':>12}")
+        for name, fn in cases.items():
+            timings, size = measure(fn, args.iterations)
+            print(
+                f"{name:<22}{statistics.mean(timings):>10.2f}{statistics.median(timings):>10.2f}"
+                f"{max(timings):>10.2f}{size:>12}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from oagi.agent.tasker import TaskerAgent
+from oagi.constants import DEFAULT_STEP_DELAY
+from oagi.handler.pil_image import PILImage
+from oagi.types import ImageConfig
+from oagi.utils.output_parser import parse_raw_output
+
+from bench_screenshot_encoding import synthetic_screenshot
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lux_utils.pipeline import PipelineConfig, close_pipeline, pipeline  # noqa: E402
+from lux_utils.replay import LuxStandIn, RecordedFrame, Recording, ReplayActionHandler, ReplayImageProvider  # noqa: E402
+from lux_utils.tracing import Tracer, instrument  # noqa: E402
+
+
+def generate_response(payload: dict) -> dict:
+    return {"response": json.dumps(payload), "prompt_tokens": 0, "completion_tokens": 0}
+
+
+def chat_response(content: str) -> dict:
+    return {
+        "id": "chatcmpl-replay",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "lux-actor-1",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def synthesize_recording(path: str, todos: list[str], steps_per_todo: int, latency_s: float) -> Recording:
+    """Write a recording shaped like a real run: plan, N-1 clicks, finish, reflection and summary per todo."""
+    recording = Recording(path).create()
+    for i, todo in enumerate(todos):
+        # One frame for the plan, one per step and one for the reflection
+        for step in range(steps_per_todo + 2):
+            screenshot = PILImage(synthetic_screenshot(1920, 1080, seed=i * 100 + step)).transform(ImageConfig())
+            recording.add_frame(screenshot)
+        signature_request = {"external_worker_id": "oagi_first", "overall_todo": todo, "current_todo_index": i}
+        recording.add_exchange(
+            "generate:oagi_first", "/v1/generate", signature_request, 200,
+            generate_response({"reasoning": "synthetic", "subtask": todo}), latency_s,
+        )
+        for step in range(steps_per_todo):
+            action = "finish()" if step == steps_per_todo - 1 else f"click({100 + step * 50}, 300)"
+            content = f"<|think_start|> step {step} <|think_end|>\n<|action_start|> {action} <|action_end|>"
+            # The actor sends its whole history: one user turn per step plus the previous assistant turns
+            request = {"messages": [{}] * (2 * step + 1)}
+            recording.add_exchange("chat", "/v1/chat/completions", request, 200, chat_response(content), latency_s)
+            recording.add_actions(parse_raw_output(content).actions)
+        reflect_request = {"external_worker_id": "oagi_follow", "overall_todo": todo, "current_todo_index": i}
+        recording.add_exchange(
+            "generate:oagi_follow", "/v1/generate", reflect_request, 200,
+            generate_response({"assessment": "done", "reflection": "done", "success": "yes", "subtask_instruction": ""}),
+            latency_s,
+        )
+        summary_request = {"external_worker_id": "oagi_task_summary", "overall_todo": todo, "current_todo_index": i}
+        recording.add_exchange(
+            "generate:oagi_task_summary", "/v1/generate", summary_request, 200,
+            generate_response({"task_summary": f"Finished todo {i + 1}"}), latency_s,
+        )
+    return recording
+
+
+class ScreenAfterActions(ReplayImageProvider):
+    """Serve the recorded frame for the number of action batches run so far.
+
+    Like a real screen, it only changes when an action runs, so capturing it
+    twice between actions (as the pipelined mode does) returns the same frame.
+    """
+
+    def __init__(self, recording: Recording, action_handler: ReplayActionHandler):
+        super().__init__(recording)
+        self.action_handler = action_handler
+
+    async def __call__(self) -> RecordedFrame:
+        path = self.paths[min(self.action_handler.calls, len(self.paths) - 1)]
+        self._last = await asyncio.to_thread(self._load, path)
+        return self._last
+
+
+async def replay_once(recording: Recording, todos: list[str], args, tracer: Tracer | None, pipelined: bool = False) -> dict:
+    with LuxStandIn(recording, latency_scale=args.replay_latency, upload_latency_s=args.upload_latency) as stand_in:
+        action_handler = ReplayActionHandler(recording)
+        replay_handler = action_handler
+        image_provider = ScreenAfterActions(recording, action_handler)
+        observer, image_provider, action_handler = instrument(tracer, None, image_provider, action_handler)
+        observer, image_provider, action_handler = pipeline(
+            PipelineConfig() if pipelined else None, observer, image_provider, action_handler,
+            api_key="replay", base_url=stand_in.base_url,
+        )
+        tasker = TaskerAgent(
+            api_key="replay",
+            base_url=stand_in.base_url,
+            max_steps=args.steps_per_todo + 4,
+            # Reflect only once the synthetic todo has finished, as the recording expects
+            reflection_interval=args.steps_per_todo + 4,
+            step_delay=DEFAULT_STEP_DELAY * args.replay_latency,
+            step_observer=observer,
+        )
+        tasker.set_task(task="Replay benchmark", todos=todos)
+        start = time.perf_counter()
+        success = await tasker.execute(instruction="", action_handler=action_handler, image_provider=image_provider)
+        wall_s = time.perf_counter() - start
+        await close_pipeline(image_provider)
+    steps = max(replay_handler.calls, 1)
+    return {
+        "success": success,
+        "wall_s": wall_s,
+        "requests": stand_in.served,
+        "steps": replay_handler.calls,
+        "per_step_ms": wall_s / steps * 1000,
+        "step_ms": [step_s * 1000 for step_s in observer.latency.step_s],
+        "divergences": stand_in.divergences,
+        "missing": stand_in.exhausted,
+    }
+
+
+async def run(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.recording:
+            recording = Recording(args.recording)
+            todos = list(dict.fromkeys(
+                e["signature"]["todo"] for e in recording.exchanges() if e["key"] == "generate:oagi_first"
+            ))
+        else:
+            todos = [f"Synthetic todo {i + 1}" for i in range(args.todos)]
+            recording = synthesize_recording(tmp, todos, args.steps_per_todo, args.synthetic_latency)
+
+        modes = [False, True] if args.pipeline else [False]
+        results = {pipelined: [] for pipelined in modes}
+        for _ in range(args.runs):
+            for pipelined in modes:
+                results[pipelined].append(await replay_once(recording, todos, args, None, pipelined))
+        tracer = Tracer() if args.trace else None
+        if tracer is not None:
+            await replay_once(recording, todos, args, tracer, args.pipeline)
+
+    last = results[False][-1]
+    print(f"{len(todos)} todos, {last['steps']} steps, {last['requests']} Lux responses per run, {args.runs} runs")
+    print(f"replay latency scale: {args.replay_latency}, upload latency: {args.upload_latency * 1000:.0f} ms")
+    # per-step ms is wall time over action batches; step p50/p95 time one actor step to the next within a todo
+    print(f"{'mode':<12}{'wall s':>10}{'per-step ms':>14}{'step p50 ms':>14}{'step p95 ms':>14}")
+    for pipelined, runs in results.items():
+        per_step = [r["per_step_ms"] for r in runs]
+        step_ms = sorted(ms for r in runs for ms in r["step_ms"])
+        p50 = statistics.median(step_ms) if step_ms else 0.0
+        p95 = step_ms[min(len(step_ms) - 1, int(len(step_ms) * 0.95))] if step_ms else 0.0
+        print(
+            f"{'pipelined' if pipelined else 'sequential':<12}{statistics.mean(r['wall_s'] for r in runs):>10.3f}"
+            f"{statistics.mean(per_step):>14.2f}{p50:>14.2f}{p95:>14.2f}"
+        )
+        last = runs[-1]
+        if last["divergences"] or last["missing"] or not last["success"]:
+            print(f"⚠️  replay success={last['success']} diverged={last['divergences']} missing={last['missing']}")
+    if tracer is not None:
+        print("\nTime by phase (one traced run):")
+        for cat, stats in tracer.summary().items():
+            print(f"  {cat:<8} n={stats['count']:<4} mean={stats['mean_s'] * 1000:.2f}ms p95={stats['p95_s'] * 1000:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure client-side step-loop overhead by replaying against a local Lux stand-in')
+    parser.add_argument('--recording', type=str, default='', help='Recording made with --record; synthesized when omitted')
+    parser.add_argument('--todos', type=int, default=5, help='Todos in the synthetic recording')
+    parser.add_argument('--steps_per_todo', type=int, default=4, help='Actor steps per synthetic todo (last one finishes)')
+    parser.add_argument('--synthetic_latency', type=float, default=1.5, help='Model latency stored in the synthetic recording')
+    parser.add_argument('--replay_latency', type=float, default=0.0, help='Fraction of recorded latency to sleep during replay')
+    parser.add_argument('--upload_latency', type=float, default=0.0, help='Seconds the stand-in sleeps on every screenshot upload')
+    parser.add_argument('--pipeline', action='store_true', help='Also run every replay in pipelined mode and compare')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--trace', action='store_true', help='Add one traced run and print its per-phase summary')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,14 +2,59 @@ import argparse
 import asyncio
 import os
 import sys
+import time
 import traceback
 from datetime import datetime
 
 from oagi import AsyncScreenshotMaker
 from oagi.agent.observer import AsyncAgentObserver
-from oagi.agent.tasker import TaskerAgent
-from oagi.handler import AsyncPyautoguiActionHandler
-from oagi.handler.pyautogui_action_handler import PyautoguiConfig
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lux_utils.budget import add_budget_arguments, budget_kwargs, print_budget_stats  # noqa: E402
+from lux_utils.cdp import CDPActionHandler, CDPImageProvider, add_browser_arguments, open_browser_page, print_browser_stats  # noqa: E402
+from lux_utils.checkpoint import ResumableTaskerAgent, TodoCheckpoint, print_checkpoint_stats  # noqa: E402
+from lux_utils.pipeline import add_pipeline_arguments, close_pipeline, pipeline, pipeline_config, print_pipeline_stats  # noqa: E402
+from lux_utils.replay import LuxSession, add_replay_arguments  # noqa: E402
+from lux_utils.run_history import write_run_record  # noqa: E402
+from lux_utils.settle import StabilityConfig, print_stability_stats, stabilize  # noqa: E402
+from lux_utils.streaming_observer import StreamingObserver  # noqa: E402
+from lux_utils.tracing import Tracer, export_trace, instrument  # noqa: E402
+from lux_utils.trajectory_cache import TrajectoryCache, print_trajectory_stats  # noqa: E402
+
+
+def make_action_handler():
+    # pyautogui needs a display at import time, so it is only imported for live and recorded runs
+    from oagi.handler import AsyncPyautoguiActionHandler
+    from oagi.handler.pyautogui_action_handler import PyautoguiConfig
+
+    return AsyncPyautoguiActionHandler(
+        config=PyautoguiConfig(scroll_amount=10) if sys.platform == "darwin" else None
+    )
+
+
+START_URL = "https://www.cvs.com"
+
+
+def build_workflow(first_name: str, last_name: str, email: str, birthday: str, zip_code: str, on_site: bool = False) -> tuple[str, list[str]]:
+    """Instruction and todos for booking a CVS flu shot; `birthday` is MM-DD-YYYY.
+
+    With `on_site` the browser already shows `START_URL`, so the first todo
+    skips opening a tab and navigating.
+    """
+    month, day, year = birthday.split("-")
+    instruction = (
+        f"Schedule an appointment at CVS for {first_name} {last_name} "
+        f"with email {email} and birthday {birthday}"
+    )
+    search = "type 'flu shot' in the search bar and press enter, wait for the page to load, then click on the button of Schedule vaccinations on the top of the page"
+    todos = [
+        search[0].upper() + search[1:] if on_site else f"Open a new tab, go to www.cvs.com, {search}",
+        f"Enter the first name '{first_name}', last name '{last_name}', and email '{email}' in the form. Do not use any suggested autofills. Make sure the mobile phone number is empty.",
+        f"Slightly scroll down to see the date of birth, enter Month '{month}', Day '{day}', and Year '{year}' in the form",
+        "Scroll down and click on 'Continue as guest' button, wait for the page to load with wait, click on 'Add vaccines' button, select 'Flu' and click on 'Add vaccines'",
+        f"Click on 'next' to enter the page with recommendation vaccines, then click on 'next' again, until on the page of entering zip code, enter '{zip_code}', select the first option from the dropdown menu, and click on 'Search'",
+    ]
+    return instruction, todos
 
 
 async def main():
@@ -32,45 +77,73 @@ async def main():
     parser.add_argument("--model_name", default="lux-actor-1")
     parser.add_argument("--max_steps", type=int, default=24)
     parser.add_argument("--temperature", type=float, default=0.0)
+    parser.add_argument("--trace", action="store_true", help="Record per-phase latency spans (Chrome trace + JSONL)")
+    parser.add_argument("--stream_history", action="store_true", help="Write events and screenshots to <save_dir>/history as they arrive instead of holding them in memory")
+    parser.add_argument("--trajectory_cache", type=str, default="", help="SQLite file of known-good action sequences to replay (disabled if empty)")
+    parser.add_argument("--trajectory_distance", type=int, default=6, help="Max perceptual-hash bit distance for a screen to match")
+    parser.add_argument("--settle_detect", action="store_true", help="Wait for the screen to stop changing instead of fixed post-action delays")
+    parser.add_argument("--settle_timeout", type=float, default=5.0, help="Max seconds to wait for the screen to settle")
+    parser.add_argument("--settle_threshold", type=float, default=0.002, help="Fraction of changed thumbnail pixels still counted as the same screen")
+    parser.add_argument("--resume", action="store_true", help="Skip todos completed by the last run of this exp_name")
+    parser.add_argument("--resume_check", action="store_true", help="With --resume, start over unless the screen still matches the checkpoint")
+    add_replay_arguments(parser)
+    add_budget_arguments(parser)
+    add_pipeline_arguments(parser)
+    add_browser_arguments(parser)
 
     args = parser.parse_args()
 
     save_dir = os.path.join(args.save_dir, args.exp_name)
     os.makedirs(save_dir, exist_ok=True)
 
-    observer = AsyncAgentObserver()
-    image_provider = AsyncScreenshotMaker()
-    action_handler = AsyncPyautoguiActionHandler(
-        config=PyautoguiConfig(scroll_amount=10) if sys.platform == "darwin" else None
+    session = LuxSession.from_args(args).start()
+    observer = StreamingObserver(os.path.join(save_dir, "history"), resume=args.resume) if args.stream_history else AsyncAgentObserver()
+    browser = None
+    if args.backend == "cdp" and not session.replaying:
+        browser, page = await open_browser_page(args, START_URL)
+        image_provider, action_handler = session.io(lambda: CDPImageProvider(page), lambda: CDPActionHandler(page))
+    else:
+        image_provider, action_handler = session.io(AsyncScreenshotMaker, make_action_handler)
+    raw_io = (image_provider, action_handler)
+
+    tracer = Tracer() if args.trace else None
+    observer, image_provider, action_handler = instrument(tracer, observer, image_provider, action_handler)
+    stability = StabilityConfig(timeout_s=args.settle_timeout, diff_threshold=args.settle_threshold) if args.settle_detect else None
+    image_provider, action_handler = stabilize(stability, image_provider, action_handler)
+    observer, image_provider, action_handler = pipeline(
+        pipeline_config(args), observer, image_provider, action_handler, api_key=session.api_key, base_url=session.base_url
     )
 
-    tasker = TaskerAgent(
-        api_key=os.getenv("OAGI_API_KEY"),
-        base_url=os.getenv("OAGI_BASE_URL", "https://api.agiopen.org"),
+    trajectory_cache = None
+    if args.trajectory_cache:
+        trajectory_cache = TrajectoryCache(args.trajectory_cache, max_distance=args.trajectory_distance)
+
+    checkpoint = TodoCheckpoint(save_dir)
+    tasker = ResumableTaskerAgent(
+        **session.agent_kwargs(),
+        checkpoint=checkpoint,
+        **budget_kwargs(args),
+        trajectory_cache=trajectory_cache,
         model=args.model_name,
         max_steps=args.max_steps,
         temperature=args.temperature,
         step_observer=observer,
     )
 
-    month, day, year = args.birthday.split("-")
-    instruction = (
-        f"Schedule an appointment at CVS for {args.first_name} {args.last_name} "
-        f"with email {args.email} and birthday {args.birthday}"
+    instruction, todos = build_workflow(
+        args.first_name, args.last_name, args.email, args.birthday, args.zip_code, on_site=args.backend == "cdp"
     )
-    todos = [
-        "Open a new tab, go to www.cvs.com, type 'flu shot' in the search bar and press enter, wait for the page to load, then click on the button of Schedule vaccinations on the top of the page",
-        f"Enter the first name '{args.first_name}', last name '{args.last_name}', and email '{args.email}' in the form. Do not use any suggested autofills. Make sure the mobile phone number is empty.",
-        f"Slightly scroll down to see the date of birth, enter Month '{month}', Day '{day}', and Year '{year}' in the form",
-        "Scroll down and click on 'Continue as guest' button, wait for the page to load with wait, click on 'Add vaccines' button, select 'Flu' and click on 'Add vaccines'",
-        f"Click on 'next' to enter the page with recommendation vaccines, then click on 'next' again, until on the page of entering zip code, enter '{args.zip_code}', select the first option from the dropdown menu, and click on 'Search'",
-    ]
 
     tasker.set_task(instruction, todos)
+    if args.resume:
+        await tasker.restore_checkpoint(image_provider, check_screen=args.resume_check)
 
-    print(f"Starting task execution at {datetime.now()}")
+    started_at = datetime.now()
+    print(f"Starting task execution at {started_at}")
     print("=" * 60)
 
+    start = time.perf_counter()
+    success, error = False, None
     try:
         success = await tasker.execute(
             instruction="",
@@ -89,9 +162,28 @@ async def main():
     except Exception as exc:
         print(f"Error during execution: {exc}")
         traceback.print_exc()
+        error = repr(exc)
+    finally:
+        # Stop in-flight prefetch captures and uploads while the browser they talk to is still up
+        await close_pipeline(image_provider)
+        if browser is not None:
+            await browser.close()
+    write_run_record(
+        save_dir, "cvs", tasker.get_memory(), success, started_at, time.perf_counter() - start, error,
+        params={"zip_code": args.zip_code, "backend": args.backend},
+    )
 
     output_file = os.path.join(save_dir, "cvs_execution_history.html")
     observer.export("html", output_file)
+    export_trace(tracer, save_dir, "cvs")
+    session.stop()
+    session.report()
+    print_stability_stats(image_provider)
+    print_browser_stats(*raw_io)
+    print_trajectory_stats(trajectory_cache)
+    print_checkpoint_stats(checkpoint)
+    print_budget_stats(tasker)
+    print_pipeline_stats(observer)
     print(f"Exported execution history to {output_file}")
 
 
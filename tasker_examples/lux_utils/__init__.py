@@ -0,0 +1 @@
+"""Shared helpers for the Lux tasker examples."""
@@ -0,0 +1,288 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Iterator
+
+from .imaging import EncodedImage
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "artifacts.json"
+
+
+class ArtifactStore:
+    """Content-addressed screenshot blobs shared by every run.
+
+    A blob lives at ``<root>/blobs/<aa>/<sha256><ext>`` and is written once,
+    however many runs save the same bytes; runs keep a manifest that maps their
+    artifact names to blobs instead of their own copies. Blobs are written to a
+    temporary file and renamed into place, so concurrent runs and shards can
+    share a store. Only byte-identical screenshots are deduplicated.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.blobs_dir = os.path.join(root, "blobs")
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.puts = 0
+        self.new_blobs = 0
+        self.bytes_written = 0
+        self.bytes_deduped = 0
+        self.hash_s = 0.0
+        self.write_s = 0.0
+
+    def blob_path(self, digest: str, extension: str) -> str:
+        return os.path.join(self.blobs_dir, digest[:2], digest + extension)
+
+    def put(self, data: bytes, extension: str) -> str:
+        """Store `data` unless an identical blob exists; returns the blob path relative to the store."""
+        start = time.perf_counter()
+        digest = hashlib.sha256(data).hexdigest()
+        hashed = time.perf_counter()
+        path = self.blob_path(digest, extension)
+        exists = os.path.exists(path)
+        if not exists:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        elapsed = time.perf_counter() - hashed
+        with self._lock:
+            self.puts += 1
+            self.hash_s += hashed - start
+            if exists:
+                self.bytes_deduped += len(data)
+            else:
+                self.new_blobs += 1
+                self.bytes_written += len(data)
+                self.write_s += elapsed
+        # Touched on every hit, so GC can tell blobs a running job still needs
+        if exists:
+            os.utime(path)
+        return os.path.relpath(path, self.root)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            write_rate = self.write_s / self.bytes_written if self.bytes_written else None
+            return {
+                "puts": self.puts,
+                "new_blobs": self.new_blobs,
+                "dedup_hits": self.puts - self.new_blobs,
+                "bytes_written": self.bytes_written,
+                "bytes_saved": self.bytes_deduped,
+                "hash_s": round(self.hash_s, 3),
+                "write_s": round(self.write_s, 3),
+                # Hits estimated at this run's own write throughput, less what hashing cost;
+                # unknown when every screenshot was already stored
+                "write_saved_s": round(self.bytes_deduped * write_rate - self.hash_s, 3) if write_rate is not None else None,
+            }
+
+
+def read_manifest(run_dir: str) -> dict[str, Any]:
+    path = os.path.join(run_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"store": "", "artifacts": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def resolve(path: str) -> str:
+    """Where the bytes for an artifact `path` are: the file itself, or the blob its manifest points at."""
+    if os.path.exists(path):
+        return path
+    run_dir, name = os.path.split(path)
+    manifest = read_manifest(run_dir)
+    entry = manifest["artifacts"].get(name)
+    if entry is None:
+        raise FileNotFoundError(f"{path} is neither a file nor listed in {os.path.join(run_dir, MANIFEST_NAME)}")
+    return os.path.join(manifest["store"], entry["blob"])
+
+
+def iter_manifests(runs_root: str) -> Iterator[str]:
+    for dirpath, _, filenames in os.walk(runs_root):
+        if MANIFEST_NAME in filenames:
+            yield os.path.join(dirpath, MANIFEST_NAME)
+
+
+def collect_garbage(store: ArtifactStore, runs_root: str, older_than_days: float | None = None, grace_s: float = 3600.0, dry_run: bool = False) -> dict[str, Any]:
+    """Drop manifests of runs older than `older_than_days`, then delete blobs no manifest references.
+
+    Blobs touched within `grace_s` are kept, since a run still in progress has
+    not written its manifest yet.
+    """
+    now = time.time()
+    referenced: set[str] = set()
+    dropped_runs = 0
+    store_root = os.path.realpath(store.root)
+    for manifest_path in iter_manifests(runs_root):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if os.path.realpath(manifest.get("store", "")) != store_root:
+            continue
+        if older_than_days is not None and now - os.path.getmtime(manifest_path) > older_than_days * 86400:
+            dropped_runs += 1
+            if not dry_run:
+                os.remove(manifest_path)
+            continue
+        referenced.update(os.path.normpath(entry["blob"]) for entry in manifest["artifacts"].values())
+
+    deleted, freed, kept = 0, 0, 0
+    for dirpath, _, filenames in os.walk(store.blobs_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if os.path.normpath(os.path.relpath(path, store.root)) in referenced or now - os.path.getmtime(path) < grace_s:
+                kept += 1
+                continue
+            deleted += 1
+            freed += os.path.getsize(path)
+            if not dry_run:
+                os.remove(path)
+    return {"runs_dropped": dropped_runs, "blobs_deleted": deleted, "bytes_freed": freed, "blobs_kept": kept, "dry_run": dry_run}
+
+
+def disk_usage(store: ArtifactStore, runs_root: str) -> dict[str, Any]:
+    """Bytes the store holds against what the runs' manifests would take as plain files."""
+    logical, artifacts = 0, 0
+    store_root = os.path.realpath(store.root)
+    for manifest_path in iter_manifests(runs_root):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if os.path.realpath(manifest.get("store", "")) != store_root:
+            continue
+        for entry in manifest["artifacts"].values():
+            artifacts += 1
+            logical += entry["bytes"]
+    stored, blobs = 0, 0
+    for dirpath, _, filenames in os.walk(store.blobs_dir):
+        for filename in filenames:
+            blobs += 1
+            stored += os.path.getsize(os.path.join(dirpath, filename))
+    return {
+        "artifacts": artifacts,
+        "blobs": blobs,
+        "logical_bytes": logical,
+        "stored_bytes": stored,
+        "saved_bytes": logical - stored,
+        "ratio": round(logical / stored, 2) if stored else 0.0,
+    }
+
+
+class AsyncArtifactWriter:
+    """Write encoded screenshots to disk in background threads, off the agent's hot path.
+
+    With a `store`, the bytes go to the content-addressed `ArtifactStore` and
+    each target directory gets an ``artifacts.json`` manifest naming the blob
+    behind every artifact path; `resolve` maps such a path back to its bytes.
+    """
+
+    def __init__(self, enabled: bool = True, store: ArtifactStore | None = None):
+        self.enabled = enabled
+        self.store = store
+        self.written: list[str] = []
+        self._tasks: set[asyncio.Task] = set()
+        self._manifests: dict[str, dict[str, dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def write(self, encoded: EncodedImage, path: str) -> str | None:
+        """Schedule `encoded` to be written to `path` (extension fixed to match its format)."""
+        if not self.enabled:
+            return None
+        path = os.path.splitext(path)[0] + encoded.extension
+        if self.store is None:
+            task = asyncio.create_task(asyncio.to_thread(encoded.save, path))
+        else:
+            task = asyncio.create_task(asyncio.to_thread(self._put, encoded, path))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self.written.append(path)
+        return path
+
+    def _put(self, encoded: EncodedImage, path: str) -> None:
+        blob = self.store.put(encoded.data, encoded.extension)
+        run_dir, name = os.path.split(path)
+        entry = {
+            "blob": blob,
+            "bytes": len(encoded.data),
+            "mime": encoded.mime,
+            "size": list(encoded.size),
+            "saved_at": datetime.now().isoformat(),
+        }
+        with self._lock:
+            self._manifests.setdefault(run_dir, {})[name] = entry
+
+    async def flush(self) -> None:
+        """Wait for every pending write, then update the manifests."""
+        if self._tasks:
+            results = await asyncio.gather(*self._tasks, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Failed to write screenshot artifact: {result}")
+        if self._manifests:
+            await asyncio.to_thread(self._write_manifests)
+
+    def _write_manifests(self) -> None:
+        with self._lock:
+            manifests, self._manifests = self._manifests, {}
+        for run_dir, entries in manifests.items():
+            # Merged with what a resumed run or another writer already listed
+            manifest = read_manifest(run_dir)
+            manifest["store"] = os.path.abspath(self.store.root)
+            manifest["artifacts"].update(entries)
+            os.makedirs(run_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=run_dir, prefix=".tmp-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, os.path.join(run_dir, MANIFEST_NAME))
+
+
+def print_artifact_stats(store: ArtifactStore | None) -> None:
+    if store is None:
+        return
+    stats = store.stats()
+    print(
+        f"🗄️ Artifact store: {stats['puts']} screenshots, {stats['new_blobs']} new blobs, "
+        f"{stats['dedup_hits']} already stored; wrote {stats['bytes_written']} B, "
+        f"saved {stats['bytes_saved']} B"
+        + (f" and ~{stats['write_saved_s']}s of writes" if stats["write_saved_s"] is not None else "")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and garbage-collect a content-addressed screenshot store")
+    parser.add_argument("--store", required=True, help="Artifact store directory (the --artifact_store of the runs)")
+    parser.add_argument("--runs", default="results/", help="Directory holding the run directories and their manifests")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("du", help="Compare stored bytes with what the runs would take as plain files")
+    gc_parser = subparsers.add_parser("gc", help="Delete blobs no run references")
+    gc_parser.add_argument("--older_than_days", type=float, default=None, help="First drop the manifests of runs older than this")
+    gc_parser.add_argument("--grace_hours", type=float, default=1.0, help="Keep blobs touched this recently (runs in progress)")
+    gc_parser.add_argument("--dry_run", action="store_true", help="Report what would be deleted without deleting")
+    args = parser.parse_args()
+
+    store = ArtifactStore(args.store)
+    if args.command == "du":
+        usage = disk_usage(store, args.runs)
+        print(
+            f"{usage['artifacts']} artifacts in {usage['blobs']} blobs: {usage['stored_bytes']} B stored "
+            f"for {usage['logical_bytes']} B of screenshots, {usage['saved_bytes']} B saved ({usage['ratio']}x)"
+        )
+    else:
+        result = collect_garbage(store, args.runs, args.older_than_days, args.grace_hours * 3600, args.dry_run)
+        prefix = "Would delete" if args.dry_run else "Deleted"
+        print(
+            f"{prefix} {result['blobs_deleted']} blobs ({result['bytes_freed']} B) after dropping "
+            f"{result['runs_dropped']} old run manifests; {result['blobs_kept']} blobs kept"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import asyncio
+import concurrent.futures
+import logging
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+import httpx
+
+from .rate_limit import SharedTokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Gemini's OpenAI-compatible endpoint; any chat-completions provider works with its own base_url
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai"
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of `values` (``q`` in 0-100); 0.0 when empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+class RetryableError(Exception):
+    """A failed attempt worth retrying (rate limit, server error, timeout, dropped connection)."""
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class EngineMetrics:
+    requests: int = 0
+    attempts: int = 0
+    retries: int = 0
+    failures: int = 0
+    statuses: dict[str, int] = field(default_factory=dict)
+    queue_wait_s: list[float] = field(default_factory=list)
+    latency_s: list[float] = field(default_factory=list)
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "statuses": dict(self.statuses),
+            "queue_wait_p50_s": round(percentile(self.queue_wait_s, 50), 3),
+            "queue_wait_p95_s": round(percentile(self.queue_wait_s, 95), 3),
+            "latency_p50_s": round(percentile(self.latency_s, 50), 3),
+            "latency_p95_s": round(percentile(self.latency_s, 95), 3),
+            "latency_max_s": round(max(self.latency_s, default=0.0), 3),
+        }
+
+
+def _setting(model_info: Any, *names: str, default: Any = None) -> Any:
+    for name in names:
+        value = model_info.get(name) if isinstance(model_info, dict) else getattr(model_info, name, None)
+        if value:
+            return value
+    return default
+
+
+def to_openai_messages(system_messages: list, user_messages: list) -> list[dict[str, Any]]:
+    """Convert `ModelEngine`-style message parts into chat-completions messages."""
+
+    def parts(items: list) -> list[dict[str, Any]]:
+        converted = []
+        for item in items:
+            if isinstance(item, str):
+                converted.append({"type": "text", "text": item})
+            elif item.get("type") == "text":
+                converted.append({"type": "text", "text": item.get("content", item.get("text", ""))})
+            else:
+                converted.append(item)
+        return converted
+
+    messages = []
+    if system_messages:
+        messages.append({"role": "system", "content": "\n".join(p["text"] for p in parts(system_messages) if p["type"] == "text")})
+    messages.append({"role": "user", "content": parts(user_messages)})
+    return messages
+
+
+class AsyncModelEngine:
+    """`ModelEngine`-compatible VLM client with pooled connections, limits and retries.
+
+    All requests go through one keep-alive `httpx.AsyncClient` owned by a
+    background event loop, so VLM worker threads calling the engine
+    synchronously (``engine(system, user)``, as `analyze_screenshot` does) and
+    coroutines awaiting `acomplete` share the same connections. At most
+    `max_in_flight` requests are on the wire at once, and with `rate` set a
+    token bucket spaces them to `rate` per second. Rate limits (429), server
+    errors and timeouts are retried up to `max_retries` times with full-jitter
+    exponential backoff, honouring ``Retry-After``; each attempt is bounded by
+    `timeout_s`. Speaks the OpenAI chat-completions protocol.
+    """
+
+    def __init__(
+        self,
+        model_info: Any,
+        max_in_flight: int = 8,
+        rate: float | None = None,
+        burst: float = 4.0,
+        timeout_s: float = 60.0,
+        max_retries: int = 4,
+        backoff_base_s: float = 0.5,
+        backoff_max_s: float = 20.0,
+    ):
+        self.model_info = model_info
+        self.model = _setting(model_info, "model", "model_name", "name")
+        self.base_url = _setting(model_info, "base_url", "api_base", default=DEFAULT_BASE_URL).rstrip("/")
+        api_key_env = _setting(model_info, "api_key_env", default="GEMINI_API_KEY")
+        self.api_key = _setting(model_info, "api_key") or os.getenv(api_key_env)
+        # Without these the first request is an opaque provider 400 that the retry path cannot explain
+        if not self.model:
+            raise ValueError("Model info has no model name; set one of 'model', 'model_name' or 'name'")
+        if not self.api_key:
+            raise ValueError(f"No API key for model '{self.model}'; set 'api_key' in the model info or the {api_key_env} environment variable (name it with 'api_key_env')")
+        self.max_in_flight = max_in_flight
+        self.timeout_s = timeout_s
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.bucket = SharedTokenBucket(rate, burst) if rate else None
+        self.metrics = EngineMetrics()
+        self._metrics_lock = threading.Lock()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="vlm-engine", daemon=True)
+        self._thread.start()
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        asyncio.run_coroutine_threadsafe(self._open(), self._loop).result()
+
+    async def _open(self) -> None:
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {self.api_key}"} if self.api_key else {},
+            limits=httpx.Limits(
+                max_connections=self.max_in_flight,
+                max_keepalive_connections=self.max_in_flight,
+                keepalive_expiry=60.0,
+            ),
+            timeout=httpx.Timeout(self.timeout_s, connect=min(10.0, self.timeout_s)),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    @classmethod
+    def from_args(cls, model_info: Any, args) -> "AsyncModelEngine":
+        return cls(
+            model_info,
+            max_in_flight=args.vlm_max_in_flight,
+            rate=args.vlm_rps or None,
+            timeout_s=args.vlm_timeout,
+            max_retries=args.vlm_retries,
+        )
+
+    def __call__(self, system_messages: list, user_messages: list) -> str:
+        """Blocking call for worker threads; must not be called from the engine's own loop."""
+        return self.submit(system_messages, user_messages).result()
+
+    def submit(self, system_messages: list, user_messages: list) -> concurrent.futures.Future:
+        """Start a completion and return its future; cancelling the future aborts the request."""
+        return asyncio.run_coroutine_threadsafe(self._complete(system_messages, user_messages), self._loop)
+
+    async def acomplete(self, system_messages: list, user_messages: list) -> str:
+        """Await a completion from any event loop."""
+        future = self.submit(system_messages, user_messages)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    def _count(self, name: str) -> None:
+        with self._metrics_lock:
+            setattr(self.metrics, name, getattr(self.metrics, name) + 1)
+
+    def _observe(self, name: str, value: float) -> None:
+        with self._metrics_lock:
+            getattr(self.metrics, name).append(value)
+
+    async def _complete(self, system_messages: list, user_messages: list) -> str:
+        payload = {"model": self.model, "messages": to_openai_messages(system_messages, user_messages)}
+        start = time.perf_counter()
+        self._count("requests")
+        try:
+            for attempt in range(self.max_retries + 1):
+                queued = time.perf_counter()
+                if self.bucket is not None:
+                    await self.bucket.acquire_async()
+                async with self._semaphore:
+                    self._observe("queue_wait_s", time.perf_counter() - queued)
+                    self._count("attempts")
+                    try:
+                        return await asyncio.wait_for(self._attempt(payload), self.timeout_s)
+                    except (RetryableError, asyncio.TimeoutError, httpx.TransportError) as e:
+                        error = e
+                if attempt == self.max_retries:
+                    break
+                delay = random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** attempt))
+                retry_after = getattr(error, "retry_after", None)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                logger.info(f"VLM request attempt {attempt + 1} failed ({error!r}); retrying in {delay:.2f}s")
+                self._count("retries")
+                await asyncio.sleep(delay)
+            raise RuntimeError(f"VLM request failed after {self.max_retries + 1} attempts: {error!r}")
+        except Exception:
+            self._count("failures")
+            raise
+        finally:
+            self._observe("latency_s", time.perf_counter() - start)
+
+    async def _attempt(self, payload: dict[str, Any]) -> str:
+        response = await self._client.post("/chat/completions", json=payload)
+        with self._metrics_lock:
+            self.metrics.statuses[str(response.status_code)] = self.metrics.statuses.get(str(response.status_code), 0) + 1
+        if response.status_code in RETRY_STATUSES:
+            retry_after = response.headers.get("retry-after")
+            raise RetryableError(
+                f"HTTP {response.status_code}",
+                retry_after=float(retry_after) if retry_after and retry_after.replace(".", "", 1).isdigit() else None,
+            )
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    def stats(self) -> dict[str, Any]:
+        with self._metrics_lock:
+            return self.metrics.summary()
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def add_engine_arguments(parser) -> None:
+    parser.add_argument("--vlm_pooled", action="store_true", help="Use the pooled async VLM client (keep-alive, limits, retries)")
+    parser.add_argument("--vlm_max_in_flight", type=int, default=8, help="Max concurrent VLM requests with --vlm_pooled")
+    parser.add_argument("--vlm_rps", type=float, default=0.0, help="VLM requests per second with --vlm_pooled (0 = unlimited)")
+    parser.add_argument("--vlm_timeout", type=float, default=60.0, help="Per-attempt VLM request timeout in seconds")
+    parser.add_argument("--vlm_retries", type=int, default=4, help="Retries on 429/5xx/timeouts with --vlm_pooled")
+
+
+def print_engine_stats(engine) -> None:
+    if not isinstance(engine, AsyncModelEngine):
+        return
+    stats = engine.stats()
+    print(
+        f"🌐 VLM engine: {stats['requests']} requests, {stats['retries']} retries, {stats['failures']} failed; "
+        f"latency p50 {stats['latency_p50_s']}s p95 {stats['latency_p95_s']}s, "
+        f"queue wait p95 {stats['queue_wait_p95_s']}s, statuses {stats['statuses']}"
+    )
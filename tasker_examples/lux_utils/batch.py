@@ -0,0 +1,346 @@
+import argparse
+import asyncio
+import contextlib
+import csv
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Iterator
+
+from .daemon import submit_job, wait_for_daemon
+from .display import ManagedProcess, VirtualDisplay, browser_command
+from .workflow_spec import WorkflowSpec
+from .x11_capture import add_capture_arguments
+
+logger = logging.getLogger(__name__)
+
+_EXAMPLES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def row_slug(row_id: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9]+", "_", row_id).strip("_") or "row"
+
+
+def iter_rows(path: str, id_column: str = "id") -> Iterator[tuple[str, dict[str, Any]]]:
+    """Yield ``(row_id, row)`` from a CSV or JSONL file one row at a time.
+
+    The id is the row's `id_column` value, or its 1-based position in the file
+    when it has none, so resuming relies on the file keeping its order.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for index, row in enumerate(rows, start=1):
+            yield str(row.get(id_column) or index), row
+
+
+class BatchResults:
+    """Append-only JSONL with one line per finished row; the record a batch resumes from."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def finished(self) -> dict[str, bool]:
+        """Whether each row already run last succeeded, stopping at a line cut short by a crash."""
+        if not os.path.exists(self.path):
+            return {}
+        outcomes = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_num, line in enumerate(f, start=1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Ignoring unreadable line {line_num} of {self.path}")
+                    continue
+                outcomes[record["row_id"]] = bool(record.get("success"))
+        return outcomes
+
+    def __enter__(self) -> "BatchResults":
+        # Line-buffered, so a crash loses at most the rows still running
+        self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._file.close()
+
+    def append(self, record: dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class DaemonWorker:
+    """A `lux_utils.daemon` process started for the batch, on its own Xvfb display and browser unless replaying.
+
+    Every workflow opens a new tab, so `reset_browser` restarts the browser
+    before each job after the first; with ``--fresh_profile`` it also swaps in
+    an empty profile, so no cookies or form state carry over between rows.
+    """
+
+    def __init__(self, worker_id: int, args, work_dir: str):
+        self.worker_id = worker_id
+        self.args = args
+        self.socket_path = os.path.join(work_dir, f"worker_{worker_id}.sock")
+        self.log_path = os.path.join(work_dir, f"worker_{worker_id}.log")
+        self.process: subprocess.Popen | None = None
+        self.browser: ManagedProcess | None = None
+        self.profile_dir: str | None = None
+        self.jobs = 0
+        self._env: dict[str, str] | None = None
+        self._stack = contextlib.ExitStack()
+
+    def command(self) -> list[str]:
+        args = self.args
+        command = [
+            sys.executable, "-m", "lux_utils.daemon", "--socket", self.socket_path, "serve",
+            "--save_dir", os.path.join(args.out, "jobs"),
+            "--model_name", args.model_name,
+            "--max_steps", str(args.max_steps),
+            "--temperature", str(args.temperature),
+        ]
+        if args.trajectory_cache:
+            command += ["--trajectory_cache", args.trajectory_cache]
+        if args.capture != "pyautogui" or args.capture_region:
+            command += ["--capture", args.capture, "--capture_region", args.capture_region]
+        if args.replay:
+            command += ["--replay", args.replay, "--replay_latency", str(args.replay_latency)]
+        return command
+
+    def start(self) -> "DaemonWorker":
+        args = self.args
+        if not args.replay:
+            display = self._stack.enter_context(VirtualDisplay(args.display_base + self.worker_id, args.screen_width, args.screen_height))
+            self._env = {**os.environ, "DISPLAY": display.name}
+            self._start_browser(tempfile.mkdtemp(prefix="lux-browser-"))
+            self._stack.callback(self._stop_browser)
+            logger.info(f"Worker {self.worker_id} on display {display.name}")
+        log = self._stack.enter_context(open(self.log_path, "w", encoding="utf-8"))
+        # Inherits DISPLAY, which VirtualDisplay has just pointed at this worker's screen
+        self.process = subprocess.Popen(self.command(), cwd=_EXAMPLES_DIR, stdout=log, stderr=subprocess.STDOUT)
+        self._stack.callback(self.stop_process)
+        return self
+
+    def _start_browser(self, profile_dir: str) -> None:
+        self.profile_dir = profile_dir
+        self.browser = ManagedProcess(
+            browser_command(self.args.browser, self.args.screen_width, self.args.screen_height, profile_dir),
+            settle_s=self.args.browser_settle,
+            env=self._env,
+        ).start()
+
+    def _stop_browser(self) -> None:
+        if self.browser is not None:
+            self.browser.stop()
+            self.browser = None
+        if self.profile_dir is not None:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
+    def reset_browser(self) -> None:
+        """Restart the browser before the next job, so tabs (and with ``--fresh_profile``, state) do not pile up."""
+        self.jobs += 1
+        if self.jobs == 1 or self.profile_dir is None:
+            return
+        if self.args.fresh_profile:
+            self._stop_browser()
+            self._start_browser(tempfile.mkdtemp(prefix="lux-browser-"))
+        else:
+            self.browser.stop()
+            self.browser.start()
+
+    def stop_process(self) -> None:
+        # SIGTERM lets the daemon finish its current job and clean up its socket
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+    def stop(self) -> None:
+        self._stack.close()
+
+
+async def run_batch(
+    spec: WorkflowSpec,
+    sockets: list[str],
+    results: BatchResults,
+    args,
+    before_job: dict[str, Callable[[], None]] | None = None,
+) -> dict[str, Any]:
+    """Stream rows to the daemons on `sockets`, one job per daemon at a time, appending each result as it lands.
+
+    `before_job` maps a socket to a blocking callable run (in a thread) before
+    each job is sent to it, e.g. `DaemonWorker.reset_browser`.
+    """
+    outcomes = results.finished()
+    free: asyncio.Queue[str | None] = asyncio.Queue()
+    for socket_path in sockets:
+        free.put_nowait(socket_path)
+    alive = set(sockets)
+    running: set[asyncio.Task] = set()
+    counts = {"rows": 0, "skipped": 0, "submitted": 0, "succeeded": 0, "failed": 0}
+
+    def record(row_id: str, row: dict, job: dict | None, result: dict[str, Any], worker: str, wall_s: float) -> None:
+        success = result.get("event") == "done" and bool(result.get("success"))
+        counts["succeeded" if success else "failed"] += 1
+        results.append({
+            "row_id": row_id,
+            "row": row,
+            "success": success,
+            "error": result.get("error") or result.get("message"),
+            "todo_status": result.get("todo_status"),
+            "exp_name": job["exp_name"] if job else None,
+            "history": result.get("history"),
+            "worker": worker,
+            "wall_s": round(wall_s, 2),
+            "finished_at": datetime.now().isoformat(),
+        })
+        finished = counts["succeeded"] + counts["failed"]
+        print(f"  {'✅' if success else '❌'} {row_id} ({wall_s:.1f}s, {worker or 'not run'}) [{finished} done]", flush=True)
+
+    async def run_row(row_id: str, row: dict, job: dict, socket_path: str) -> None:
+        start = time.perf_counter()
+        reset = (before_job or {}).get(socket_path)
+        try:
+            if reset is not None:
+                await asyncio.to_thread(reset)
+        except Exception as e:
+            result = {"event": "error", "message": f"browser reset failed: {e}"}
+            free.put_nowait(socket_path)
+            record(row_id, row, job, result, os.path.basename(socket_path), time.perf_counter() - start)
+            return
+        try:
+            result = await submit_job(job, socket_path)
+        except OSError as e:
+            # A daemon that refuses connections is gone; keep the rest of the pool going without it
+            result = {"event": "error", "message": f"worker lost: {e!r}"}
+            alive.discard(socket_path)
+            if not alive:
+                free.put_nowait(None)
+        else:
+            free.put_nowait(socket_path)
+        record(row_id, row, job, result, os.path.basename(socket_path), time.perf_counter() - start)
+
+    for row_id, row in iter_rows(args.rows, args.id_column):
+        if args.limit and counts["submitted"] >= args.limit:
+            break
+        counts["rows"] += 1
+        previous = outcomes.get(row_id)
+        if previous is not None and (previous or not args.retry_failed):
+            counts["skipped"] += 1
+            continue
+        try:
+            job = spec.job(row, exp_name=f"{spec.name}_{row_slug(row_id)}")
+        except (ValueError, KeyError, IndexError) as e:
+            record(row_id, row, None, {"event": "error", "message": str(e)}, "", 0.0)
+            continue
+        # A retried row picks up after the todos its failed attempt completed
+        job["resume"] = previous is not None
+        socket_path = await free.get()
+        if socket_path is None:
+            print("All workers are gone; stopping the batch")
+            break
+        counts["submitted"] += 1
+        task = asyncio.create_task(run_row(row_id, row, job, socket_path))
+        running.add(task)
+        task.add_done_callback(running.discard)
+
+    if running:
+        await asyncio.gather(*running)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a workflow spec over every row of a CSV/JSONL file on a pool of Lux daemons")
+    parser.add_argument("--workflow", required=True, help="Workflow spec (YAML or JSON), e.g. workflows/cvs_booking.yaml")
+    parser.add_argument("--rows", required=True, help="CSV or JSONL file with one job's parameters per row")
+    parser.add_argument("--out", default="", help="Batch directory (default: results/batch/<workflow name>)")
+    parser.add_argument("--id_column", default="id", help="Column that identifies a row across resumes (default: row position)")
+    parser.add_argument("--daemons", default="", help="Comma-separated sockets of running daemons to use as workers")
+    parser.add_argument("--workers", type=int, default=1, help="Daemons to start when --daemons is not given, each on its own Xvfb display")
+    parser.add_argument("--retry_failed", action="store_true", help="Run rows whose last attempt failed again, resuming from their checkpoints")
+    parser.add_argument("--limit", type=int, default=0, help="Submit at most this many rows (0 = all)")
+
+    # config for daemons started by the batch
+    parser.add_argument("--model_name", default="lux-actor-1")
+    parser.add_argument("--max_steps", type=int, default=24)
+    parser.add_argument("--temperature", type=float, default=0.0)
+    parser.add_argument("--trajectory_cache", default="", help="SQLite trajectory cache shared by the started daemons")
+    parser.add_argument("--replay", default="", help="Start daemons that replay this recording instead of using a desktop (dry run)")
+    parser.add_argument("--replay_latency", type=float, default=0.0)
+    parser.add_argument("--display_base", type=int, default=99, help="First Xvfb display number")
+    parser.add_argument("--screen_width", type=int, default=1920)
+    parser.add_argument("--screen_height", type=int, default=1080)
+    parser.add_argument("--browser", default="google-chrome", help="Chromium-family browser binary")
+    parser.add_argument("--browser_settle", type=float, default=3.0, help="Seconds to wait after launching a browser")
+    parser.add_argument("--fresh_profile", action="store_true", help="Give every row an empty browser profile (no cookies or form state from earlier rows)")
+    add_capture_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    spec = WorkflowSpec.load(args.workflow)
+    # Started daemons run from tasker_examples/, so hand them absolute paths
+    args.out = os.path.abspath(args.out or os.path.join("results", "batch", spec.name))
+    args.trajectory_cache = os.path.abspath(args.trajectory_cache) if args.trajectory_cache else ""
+    args.replay = os.path.abspath(args.replay) if args.replay else ""
+    os.makedirs(args.out, exist_ok=True)
+
+    print(f"Batch '{spec.name}' over {args.rows} -> {args.out} at {datetime.now()}")
+    print("=" * 60)
+    start = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        if args.daemons:
+            sockets = [path.strip() for path in args.daemons.split(",") if path.strip()]
+            processes = [None] * len(sockets)
+            before_job = {}
+        else:
+            work_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="lux-batch-"))
+            workers = []
+            for i in range(args.workers):
+                worker = DaemonWorker(i, args, work_dir).start()
+                stack.callback(worker.stop)
+                workers.append(worker)
+            sockets = [worker.socket_path for worker in workers]
+            processes = [worker.process for worker in workers]
+            before_job = {worker.socket_path: worker.reset_browser for worker in workers}
+
+        async def run() -> dict[str, Any]:
+            await asyncio.gather(*(wait_for_daemon(path, process) for path, process in zip(sockets, processes)))
+            with BatchResults(os.path.join(args.out, "results.jsonl")) as results:
+                return await run_batch(spec, sockets, results, args, before_job)
+
+        counts = asyncio.run(run())
+    wall_s = time.perf_counter() - start
+
+    run_count = counts["succeeded"] + counts["failed"]
+    summary = {
+        "workflow": spec.path,
+        "rows_file": args.rows,
+        "workers": len(sockets),
+        **counts,
+        "wall_s": round(wall_s, 2),
+        "rows_per_hour": round(run_count / wall_s * 3600, 1) if wall_s > 0 else 0.0,
+        "finished_at": datetime.now().isoformat(),
+    }
+    summary_path = os.path.join(args.out, "summary.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=4)
+
+    print("\n" + "=" * 60)
+    print("BATCH REPORT")
+    print("=" * 60)
+    print(f"Rows: {counts['rows']} read, {counts['skipped']} already finished, {run_count} run ({counts['succeeded']} succeeded, {counts['failed']} failed)")
+    print(f"Workers: {len(sockets)}, wall time: {wall_s:.1f}s, throughput: {summary['rows_per_hour']} rows/hour")
+    print(f"\n📄 Results: {os.path.join(args.out, 'results.jsonl')}, summary: {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+
+from oagi.types import ActionType
+
+from .async_engine import percentile
+from .imaging import hamming_distance, perceptual_hash
+from .wrappers import ImageProviderWrapper
+
+logger = logging.getLogger(__name__)
+
+# Completed todos from the `lux_utils.run_history` index, newest first; replayed todos have no steps
+_SAMPLES_SQL = """
+SELECT t.steps, t.duration_s FROM todos t JOIN runs r ON r.run_id = t.run_id
+WHERE t.description = ? AND t.status = 'completed' AND t.steps > 0
+ORDER BY r.started_at DESC LIMIT ?
+"""
+
+
+@dataclass
+class BudgetConfig:
+    """How per-todo budgets are derived from history and when a todo counts as stuck.
+
+    A todo with at least `min_samples` completed runs in the index gets
+    ``ceil(p95 steps * step_margin) + step_slack`` steps (never more than the
+    agent's ``max_steps``) and ``p95 seconds * time_margin + time_slack_s``.
+    A todo is aborted when the same action batch leaves the screen unchanged
+    `repeat_limit` times in a row, or `stall_limit` batches in a row leave it
+    unchanged; batches that only wait are not counted either way.
+    """
+
+    step_margin: float = 1.5
+    step_slack: int = 2
+    min_steps: int = 3
+    time_margin: float = 2.0
+    time_slack_s: float = 30.0
+    min_samples: int = 5
+    window: int = 50
+    repeat_limit: int = 3
+    stall_limit: int = 5
+    same_screen_distance: int = 2
+    hash_size: int = 16
+
+
+@dataclass
+class TodoBudget:
+    max_steps: int
+    max_s: float | None = None
+    samples: int = 0
+
+
+class TodoBudgets:
+    """Step and time budgets per todo text, from completed runs in a run-history database."""
+
+    def __init__(self, path: str, config: BudgetConfig | None = None):
+        self.path = path
+        self.config = config or BudgetConfig()
+        self._conn = None
+        if os.path.exists(path):
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            logger.warning(f"No run history at {path}; todos keep the global step budget")
+
+    def budget(self, todo: str, max_steps: int) -> TodoBudget:
+        if self._conn is None:
+            return TodoBudget(max_steps)
+        rows = self._conn.execute(_SAMPLES_SQL, (todo, self.config.window)).fetchall()
+        if len(rows) < self.config.min_samples:
+            return TodoBudget(max_steps, samples=len(rows))
+        steps = math.ceil(percentile([row[0] for row in rows], 95) * self.config.step_margin) + self.config.step_slack
+        durations = [row[1] for row in rows if row[1] is not None]
+        max_s = percentile(durations, 95) * self.config.time_margin + self.config.time_slack_s if durations else None
+        return TodoBudget(min(max_steps, max(self.config.min_steps, steps)), max_s, len(rows))
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+
+
+class NoProgressError(RuntimeError):
+    """Raised inside a todo to stop it; the taskee records it as the todo's error."""
+
+
+class ProgressMonitor:
+    """Watches one todo's action batches and screens for loops, stalls and an exhausted time budget."""
+
+    def __init__(self, budget: TodoBudget, config: BudgetConfig, detect_loops: bool = True):
+        self.budget = budget
+        self.config = config
+        self.detect_loops = detect_loops
+        self.start = time.perf_counter()
+        self.batches = 0
+        self.repeats = 0
+        self.stalls = 0
+        self.aborted: str | None = None
+        self._last_hash: int | None = None
+        self._pending: tuple | None = None
+        self._last_unchanged: tuple | None = None
+
+    def check_time(self) -> None:
+        elapsed = time.perf_counter() - self.start
+        if self.budget.max_s is not None and elapsed > self.budget.max_s:
+            self._abort("time", f"time budget of {self.budget.max_s:.0f}s exceeded after {self.batches} steps")
+
+    def _abort(self, reason: str, message: str) -> None:
+        self.aborted = reason
+        raise NoProgressError(message)
+
+    def before_actions(self, actions) -> None:
+        self.check_time()
+        self.batches += 1
+        self._pending = tuple((action.type.value, action.argument, action.count) for action in actions)
+
+    async def after_capture(self, image) -> None:
+        self.check_time()
+        if not self.detect_loops:
+            return
+        current = await asyncio.to_thread(perceptual_hash, image, self.config.hash_size)
+        batch, previous, self._pending, self._last_hash = self._pending, self._last_hash, None, current
+        if batch is None or previous is None:
+            return
+        if hamming_distance(previous, current) > self.config.same_screen_distance:
+            self.repeats, self.stalls, self._last_unchanged = 0, 0, None
+            return
+        # Waiting on a slow page is expected to leave the screen as it was; the step budget bounds those
+        if all(action_type == ActionType.WAIT.value for action_type, _, _ in batch):
+            return
+        self.repeats = self.repeats + 1 if batch == self._last_unchanged else 1
+        self._last_unchanged = batch
+        self.stalls += 1
+        if self.repeats >= self.config.repeat_limit:
+            self._abort("loop", f"the same actions left the screen unchanged {self.repeats} times in a row: {list(batch)}")
+        if self.stalls >= self.config.stall_limit:
+            self._abort("stall", f"the screen did not change over {self.stalls} steps")
+
+
+class _MonitoredImageProvider(ImageProviderWrapper):
+    def __init__(self, provider, monitor: ProgressMonitor):
+        super().__init__(provider)
+        self.monitor = monitor
+
+    async def __call__(self):
+        image = await self.provider()
+        await self.monitor.after_capture(image)
+        return image
+
+
+class _MonitoredActionHandler:
+    """Pass-through proxy that shows each batch to the monitor first; the wrapped handler keeps its own settle delay."""
+
+    def __init__(self, handler, monitor: ProgressMonitor):
+        self.handler = handler
+        self.monitor = monitor
+
+    @property
+    def config(self):
+        return self.handler.config
+
+    def reset(self) -> None:
+        from oagi.handler.utils import reset_handler
+
+        reset_handler(self.handler)
+
+    async def __call__(self, actions) -> None:
+        self.monitor.before_actions(actions)
+        await self.handler(actions)
+
+    def __getattr__(self, name):
+        return getattr(self.handler, name)
+
+
+@dataclass
+class BudgetStats:
+    todos: int = 0
+    budgeted: int = 0
+    budget_steps: int = 0
+    global_steps: int = 0
+    exhausted: int = 0
+    aborts: dict[str, int] = field(default_factory=dict)
+    # Model steps the global budget would still have allowed on todos that stopped early
+    steps_avoided: int = 0
+
+
+class BudgetMixin:
+    """Adds per-todo step/time budgets and no-progress aborts to `TaskerAgent` (or `QATaskerAgent`).
+
+    With ``budgets=``, each todo runs with the step and time budget its own
+    history supports instead of the global ``max_steps``. With
+    ``detect_loops=True``, a todo that keeps repeating an action or leaves the
+    screen unchanged is stopped with `NoProgressError`, which fails it like any
+    other todo error. Mix in ahead of `TaskerAgent` and behind
+    `TrajectoryCacheMixin`, so cached replays are not budgeted.
+    """
+
+    def __init__(self, *args, budgets: TodoBudgets | None = None, detect_loops: bool = False, budget_config: BudgetConfig | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.budgets = budgets
+        self.detect_loops = detect_loops
+        self.budget_config = budget_config or (budgets.config if budgets is not None else BudgetConfig())
+        self.budget_stats = BudgetStats()
+
+    async def _execute_todo(self, todo_index: int, action_handler, image_provider) -> bool:
+        if self.budgets is None and not self.detect_loops:
+            return await super()._execute_todo(todo_index, action_handler, image_provider)
+
+        todo = self.memory.todos[todo_index].description
+        budget = self.budgets.budget(todo, self.max_steps) if self.budgets is not None else TodoBudget(self.max_steps)
+        stats = self.budget_stats
+        stats.todos += 1
+        stats.global_steps += self.max_steps
+        stats.budget_steps += budget.max_steps
+        if budget.samples >= self.budget_config.min_samples:
+            stats.budgeted += 1
+            logger.info(
+                f"Todo {todo_index} budget: {budget.max_steps} steps (global {self.max_steps})"
+                + (f", {budget.max_s:.0f}s" if budget.max_s is not None else "")
+                + f" from {budget.samples} past runs"
+            )
+        if self.current_taskee_agent is not None:
+            self.current_taskee_agent.max_steps = budget.max_steps
+
+        monitor = ProgressMonitor(budget, self.budget_config, self.detect_loops)
+        success = await super()._execute_todo(
+            todo_index, _MonitoredActionHandler(action_handler, monitor), _MonitoredImageProvider(image_provider, monitor)
+        )
+        if monitor.aborted is not None:
+            stats.aborts[monitor.aborted] = stats.aborts.get(monitor.aborted, 0) + 1
+            stats.steps_avoided += max(0, self.max_steps - monitor.batches)
+            logger.warning(f"Todo {todo_index} stopped early ({monitor.aborted}) after {monitor.batches} steps")
+        elif not success and monitor.batches >= budget.max_steps and budget.max_steps < self.max_steps:
+            stats.exhausted += 1
+            stats.steps_avoided += self.max_steps - budget.max_steps
+        return success
+
+
+def add_budget_arguments(parser) -> None:
+    parser.add_argument("--budget_db", type=str, default="", help="Run-history database (lux_utils.run_history) to derive per-todo step and time budgets from")
+    parser.add_argument("--abort_loops", action="store_true", help="Stop a todo that repeats actions or leaves the screen unchanged")
+
+
+def budget_kwargs(args) -> dict:
+    """Agent keywords for `BudgetMixin` from `add_budget_arguments` options."""
+    return {"budgets": TodoBudgets(args.budget_db) if args.budget_db else None, "detect_loops": args.abort_loops}
+
+
+def print_budget_stats(agent) -> None:
+    stats = getattr(agent, "budget_stats", None)
+    if stats is None or not stats.todos:
+        return
+    aborts = ", ".join(f"{count} {reason}" for reason, count in sorted(stats.aborts.items())) or "none"
+    print(
+        f"🎯 Budgets: {stats.budgeted}/{stats.todos} todos budgeted from history, {stats.budget_steps} steps allowed "
+        f"vs {stats.global_steps} global; {stats.exhausted} ran out, early aborts: {aborts}; "
+        f"up to {stats.steps_avoided} model steps avoided"
+    )
@@ -0,0 +1,491 @@
+import asyncio
+import base64
+import io
+import itertools
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Callable
+
+from oagi.handler.capslock_manager import CapsLockManager
+from oagi.handler.utils import PyautoguiConfig, parse_hotkey
+from oagi.types import Action, ActionType, ImageConfig, parse_coords, parse_drag_coords, parse_scroll
+from PIL import Image as PILImageLib
+
+logger = logging.getLogger(__name__)
+
+# Requests that never finish on their own; waiting on them would never settle
+_LONG_LIVED = {"WebSocket", "EventSource"}
+_MODIFIERS = {"alt": 1, "ctrl": 2, "control": 2, "command": 4, "cmd": 4, "meta": 4, "win": 4, "shift": 8}
+# pyautogui key name -> (DOM key, DOM code, Windows virtual key code)
+_KEYS = {
+    "enter": ("Enter", "Enter", 13), "return": ("Enter", "Enter", 13), "tab": ("Tab", "Tab", 9),
+    "esc": ("Escape", "Escape", 27), "escape": ("Escape", "Escape", 27), "space": (" ", "Space", 32),
+    "backspace": ("Backspace", "Backspace", 8), "delete": ("Delete", "Delete", 46), "del": ("Delete", "Delete", 46),
+    "insert": ("Insert", "Insert", 45), "home": ("Home", "Home", 36), "end": ("End", "End", 35),
+    "pgup": ("PageUp", "PageUp", 33), "pgdn": ("PageDown", "PageDown", 34),
+    "up": ("ArrowUp", "ArrowUp", 38), "down": ("ArrowDown", "ArrowDown", 40),
+    "left": ("ArrowLeft", "ArrowLeft", 37), "right": ("ArrowRight", "ArrowRight", 39),
+    "alt": ("Alt", "AltLeft", 18), "ctrl": ("Control", "ControlLeft", 17), "control": ("Control", "ControlLeft", 17),
+    "shift": ("Shift", "ShiftLeft", 16), "command": ("Meta", "MetaLeft", 91), "cmd": ("Meta", "MetaLeft", 91),
+    "meta": ("Meta", "MetaLeft", 91), "win": ("Meta", "MetaLeft", 91),
+    **{f"f{n}": (f"F{n}", f"F{n}", 111 + n) for n in range(1, 13)},
+}
+
+
+class CDPError(RuntimeError):
+    pass
+
+
+class CDPConnection:
+    """One DevTools websocket, multiplexing every attached page by session id."""
+
+    def __init__(self, ws_url: str):
+        self.ws_url = ws_url
+        self._ws = None
+        self._ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future] = {}
+        self._listeners: dict[tuple[str | None, str], list[Callable[[dict], None]]] = defaultdict(list)
+        self._reader: asyncio.Task | None = None
+
+    async def connect(self) -> "CDPConnection":
+        from websockets.asyncio.client import connect
+
+        # Full-resolution screenshots are several MB of base64
+        self._ws = await connect(self.ws_url, max_size=None)
+        self._reader = asyncio.create_task(self._read(), name="cdp-reader")
+        return self
+
+    async def send(self, method: str, params: dict[str, Any] | None = None, session_id: str | None = None) -> dict[str, Any]:
+        message_id = next(self._ids)
+        message = {"id": message_id, "method": method, "params": params or {}}
+        if session_id is not None:
+            message["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        await self._ws.send(json.dumps(message))
+        return await future
+
+    def on(self, method: str, callback: Callable[[dict], None], session_id: str | None = None) -> None:
+        self._listeners[(session_id, method)].append(callback)
+
+    async def _read(self) -> None:
+        try:
+            async for raw in self._ws:
+                message = json.loads(raw)
+                if "id" in message:
+                    future = self._pending.pop(message["id"], None)
+                    if future is None or future.done():
+                        continue
+                    if "error" in message:
+                        future.set_exception(CDPError(f"{message['error'].get('message')} ({message['error'].get('code')})"))
+                    else:
+                        future.set_result(message.get("result", {}))
+                    continue
+                for callback in self._listeners.get((message.get("sessionId"), message.get("method")), ()):
+                    callback(message.get("params", {}))
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("DevTools connection closed"))
+            self._pending.clear()
+
+    async def close(self) -> None:
+        if self._ws is not None:
+            await self._ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+
+class BrowserPage:
+    """A tab in its own browser context (separate cookies and storage), driven over `CDPConnection`.
+
+    Tracks page loads and in-flight requests, so callers can wait for the page
+    to go quiet instead of sleeping. Reduced motion is emulated, so pages that
+    honour it skip their animations.
+    """
+
+    def __init__(self, connection: CDPConnection, session_id: str, target_id: str, context_id: str, width: int, height: int):
+        self.connection = connection
+        self.session_id = session_id
+        self.target_id = target_id
+        self.context_id = context_id
+        self.width = width
+        self.height = height
+        self.loading = 0
+        self.inflight: set[str] = set()
+        self.last_activity = time.perf_counter()
+
+    async def send(self, method: str, params: dict[str, Any] | None = None) -> dict[str, Any]:
+        return await self.connection.send(method, params, self.session_id)
+
+    def _listen(self, method: str, callback: Callable[[dict], None]) -> None:
+        def wrapped(params: dict) -> None:
+            callback(params)
+            self.last_activity = time.perf_counter()
+
+        self.connection.on(method, wrapped, self.session_id)
+
+    async def start(self, url: str = "about:blank") -> "BrowserPage":
+        self._listen("Page.frameStartedLoading", lambda params: setattr(self, "loading", self.loading + 1))
+        self._listen("Page.frameStoppedLoading", lambda params: setattr(self, "loading", max(0, self.loading - 1)))
+        self._listen(
+            "Network.requestWillBeSent",
+            lambda params: params.get("type") in _LONG_LIVED or self.inflight.add(params["requestId"]),
+        )
+        self._listen("Network.loadingFinished", lambda params: self.inflight.discard(params["requestId"]))
+        self._listen("Network.loadingFailed", lambda params: self.inflight.discard(params["requestId"]))
+        await asyncio.gather(
+            self.send("Page.enable"),
+            self.send("Network.enable"),
+            self.send("Emulation.setDeviceMetricsOverride", {"width": self.width, "height": self.height, "deviceScaleFactor": 1, "mobile": False}),
+            self.send("Emulation.setEmulatedMedia", {"features": [{"name": "prefers-reduced-motion", "value": "reduce"}]}),
+        )
+        if url != "about:blank":
+            await self.navigate(url)
+        return self
+
+    async def navigate(self, url: str, timeout_s: float = 30.0) -> None:
+        result = await self.send("Page.navigate", {"url": url})
+        if result.get("errorText"):
+            raise CDPError(f"Navigating to {url} failed: {result['errorText']}")
+        await self.wait_until_quiet(timeout_s)
+
+    async def wait_until_quiet(self, timeout_s: float, quiet_s: float = 0.25, poll_s: float = 0.05) -> float:
+        """Wait until no frame is loading and no request has been in flight for `quiet_s`; returns the seconds waited.
+
+        Quiet is counted from the call at the earliest, so a click gets
+        `quiet_s` to start the navigation or request it triggers.
+        """
+        start = time.perf_counter()
+        deadline = start + timeout_s
+        while time.perf_counter() < deadline:
+            now = time.perf_counter()
+            if not self.loading and not self.inflight and now - max(self.last_activity, start) >= quiet_s:
+                break
+            await asyncio.sleep(poll_s)
+        return time.perf_counter() - start
+
+    async def screenshot(self, format: str = "jpeg", quality: int = 85) -> bytes:
+        params = {"format": format, "captureBeyondViewport": False}
+        if format == "jpeg":
+            params["quality"] = quality
+        result = await self.send("Page.captureScreenshot", params)
+        return base64.b64decode(result["data"])
+
+    async def close(self) -> None:
+        await self.connection.send("Target.closeTarget", {"targetId": self.target_id})
+        await self.connection.send("Target.disposeBrowserContext", {"browserContextId": self.context_id})
+
+
+class HeadlessChromium:
+    """A headless Chromium process, one DevTools connection, and any number of isolated `BrowserPage`s.
+
+    Use as an async context manager. Each `new_page` is a fresh browser
+    context, so sessions share the process but not cookies, storage or cache.
+    """
+
+    def __init__(self, binary: str = "chromium", extra_args: tuple[str, ...] = ()):
+        self.binary = binary
+        self.extra_args = extra_args
+        self.process: subprocess.Popen | None = None
+        self.connection: CDPConnection | None = None
+        self.pages: list[BrowserPage] = []
+        self._profile: tempfile.TemporaryDirectory | None = None
+
+    async def start(self, timeout_s: float = 20.0) -> "HeadlessChromium":
+        self._profile = tempfile.TemporaryDirectory(prefix="lux-cdp-")
+        self.process = subprocess.Popen(
+            [
+                self.binary,
+                "--headless=new",
+                "--remote-debugging-port=0",
+                f"--user-data-dir={self._profile.name}",
+                "--no-first-run",
+                "--no-default-browser-check",
+                "--hide-scrollbars",
+                "--mute-audio",
+                *self.extra_args,
+                "about:blank",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        # Chromium writes the port it picked and the browser endpoint here once it listens
+        port_file = os.path.join(self._profile.name, "DevToolsActivePort")
+        deadline = time.monotonic() + timeout_s
+        while True:
+            if os.path.exists(port_file):
+                with open(port_file, "r", encoding="utf-8") as f:
+                    lines = f.read().split()
+                if len(lines) >= 2:
+                    break
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.binary} exited with {self.process.returncode} while starting")
+            if time.monotonic() > deadline:
+                await self.close()
+                raise RuntimeError(f"Timed out waiting for {self.binary} to open its DevTools port")
+            await asyncio.sleep(0.05)
+        self.connection = await CDPConnection(f"ws://127.0.0.1:{lines[0]}{lines[1]}").connect()
+        logger.info(f"Headless {self.binary} on DevTools port {lines[0]}")
+        return self
+
+    async def new_page(self, url: str = "about:blank", width: int = 1260, height: int = 700) -> BrowserPage:
+        context_id = (await self.connection.send("Target.createBrowserContext", {"disposeOnDetach": True}))["browserContextId"]
+        target_id = (await self.connection.send("Target.createTarget", {"url": "about:blank", "browserContextId": context_id}))["targetId"]
+        session_id = (await self.connection.send("Target.attachToTarget", {"targetId": target_id, "flatten": True}))["sessionId"]
+        page = BrowserPage(self.connection, session_id, target_id, context_id, width, height)
+        self.pages.append(page)
+        return await page.start(url)
+
+    async def close(self) -> None:
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                await asyncio.to_thread(self.process.wait, 10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+        if self._profile is not None:
+            self._profile.cleanup()
+            self._profile = None
+
+    async def __aenter__(self) -> "HeadlessChromium":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+
+class BrowserScreenshot:
+    """A viewport screenshot as the browser encoded it; `read()` hands Lux those bytes unchanged."""
+
+    def __init__(self, data: bytes, config: ImageConfig):
+        self.data = data
+        self.config = config
+        self._image: PILImageLib.Image | None = None
+
+    @property
+    def image(self) -> PILImageLib.Image:
+        # Opening only parses the header; pixels are decoded if something reads them
+        if self._image is None:
+            self._image = PILImageLib.open(io.BytesIO(self.data))
+        return self._image
+
+    def read(self) -> bytes:
+        return self.data
+
+
+class CDPImageProvider:
+    """Drop-in for `AsyncScreenshotMaker` that captures a `BrowserPage` viewport.
+
+    With the page viewport at the `ImageConfig` size (1260x700 by default), the
+    browser's own JPEG/PNG goes to Lux without a resize or re-encode in Python;
+    other sizes get the stock transform.
+    """
+
+    def __init__(self, page: BrowserPage, config: ImageConfig | None = None):
+        self.page = page
+        self.config = config or ImageConfig()
+        self.captures = 0
+        self.capture_s = 0.0
+        self._last_image = None
+
+    async def __call__(self):
+        start = time.perf_counter()
+        data = await self.page.screenshot(self.config.format.lower(), self.config.quality)
+        image = BrowserScreenshot(data, self.config)
+        if self.config.width and self.config.height and image.image.size != (self.config.width, self.config.height):
+            from oagi.handler.pil_image import PILImage
+
+            image = PILImage(image.image).transform(self.config)
+        self.capture_s += time.perf_counter() - start
+        self.captures += 1
+        self._last_image = image
+        return image
+
+    async def last_image(self):
+        if self._last_image is None:
+            return await self()
+        return self._last_image
+
+
+class CDPActionHandler:
+    """Drop-in for `AsyncPyautoguiActionHandler` that sends the agent's actions to a `BrowserPage` as input events.
+
+    Clicks, drags and scrolls become `Input.dispatchMouseEvent`, hotkeys
+    `Input.dispatchKeyEvent` and typing `Input.insertText`, at the page's
+    viewport coordinates. No desktop, window focus or pointer is involved, so
+    any number of pages can be driven at once. After a batch it waits for the
+    page to go quiet (no loads, no requests in flight) rather than the fixed
+    ``post_batch_delay``, which stays the upper bound; `ActionHandlerWrapper`
+    settles through `wait_until_settled` the same way.
+    """
+
+    def __init__(self, page: BrowserPage, config: PyautoguiConfig | None = None, scroll_fraction: float = 0.5):
+        self.page = page
+        self.config = config or PyautoguiConfig()
+        # pyautogui's `scroll_amount` is in platform units (100 wheel clicks on Linux, lines on macOS),
+        # so a scroll here moves a fixed share of the viewport and keeps some overlap with the last one
+        self.scroll_fraction = scroll_fraction
+        # There is no system caps lock behind the page, so it is always tracked per session
+        self.caps_manager = CapsLockManager(mode="session")
+        self.settle_s = 0.0
+        self.blind_wait_s = 0.0
+
+    def reset(self) -> None:
+        self.caps_manager.reset()
+
+    def _point(self, x: float, y: float) -> tuple[float, float]:
+        return (
+            min(max(x, 0), 1000) / 1000 * (self.page.width - 1),
+            min(max(y, 0), 1000) / 1000 * (self.page.height - 1),
+        )
+
+    def _parse_point(self, arg: str) -> tuple[float, float]:
+        coords = parse_coords(arg)
+        if not coords:
+            raise ValueError(f"Invalid coordinates format: {arg}")
+        return self._point(*coords)
+
+    async def _mouse(self, type: str, x: float, y: float, **params) -> None:
+        await self.page.send("Input.dispatchMouseEvent", {"type": type, "x": x, "y": y, **params})
+
+    async def _click(self, x: float, y: float, button: str = "left", clicks: int = 1) -> None:
+        await self._mouse("mouseMoved", x, y)
+        for count in range(1, clicks + 1):
+            await self._mouse("mousePressed", x, y, button=button, clickCount=count)
+            await self._mouse("mouseReleased", x, y, button=button, clickCount=count)
+
+    async def _key(self, type: str, name: str, modifiers: int) -> None:
+        key, code, key_code = _KEYS.get(name) or (name, f"Key{name.upper()}" if name.isalpha() else f"Digit{name}", ord(name.upper()))
+        if modifiers & 8 and key.isalpha() and len(key) == 1:
+            key = key.upper()
+        params = {"type": type, "key": key, "code": code, "windowsVirtualKeyCode": key_code, "modifiers": modifiers}
+        # Only unmodified printable keys produce text; ctrl+a and friends are commands
+        if type == "keyDown" and (len(key) == 1 or key == "Enter") and not modifiers & ~8:
+            params["text"] = "\r" if key == "Enter" else key
+        elif type == "keyDown":
+            params["type"] = "rawKeyDown"
+        await self.page.send("Input.dispatchKeyEvent", params)
+
+    async def _hotkey(self, keys: list[str]) -> None:
+        unknown = [name for name in keys if name not in _KEYS and len(name) != 1]
+        if unknown:
+            logger.warning(f"Skipping keys with no DevTools mapping: {', '.join(unknown)}")
+            keys = [name for name in keys if name not in unknown]
+        modifiers = 0
+        for name in keys:
+            await self._key("keyDown", name, modifiers)
+            modifiers |= _MODIFIERS.get(name, 0)
+        for name in reversed(keys):
+            modifiers &= ~_MODIFIERS.get(name, 0)
+            await self._key("keyUp", name, modifiers)
+
+    async def _type(self, text: str) -> None:
+        for i, line in enumerate(self.caps_manager.transform_text(text).split("\n")):
+            if i:
+                await self._hotkey(["enter"])
+            if line:
+                await self.page.send("Input.insertText", {"text": line})
+
+    async def _execute_single(self, action: Action) -> None:
+        arg = action.argument.strip("()")
+        match action.type:
+            case ActionType.CLICK:
+                await self._click(*self._parse_point(arg))
+            case ActionType.LEFT_DOUBLE:
+                await self._click(*self._parse_point(arg), clicks=2)
+            case ActionType.LEFT_TRIPLE:
+                await self._click(*self._parse_point(arg), clicks=3)
+            case ActionType.RIGHT_SINGLE:
+                await self._click(*self._parse_point(arg), button="right")
+            case ActionType.DRAG:
+                coords = parse_drag_coords(arg)
+                if not coords:
+                    raise ValueError(f"Invalid drag coordinates format: {arg}")
+                (x1, y1), (x2, y2) = self._point(*coords[:2]), self._point(*coords[2:])
+                await self._mouse("mouseMoved", x1, y1)
+                await self._mouse("mousePressed", x1, y1, button="left", clickCount=1)
+                steps = 10
+                for step in range(1, steps + 1):
+                    await self._mouse("mouseMoved", x1 + (x2 - x1) * step / steps, y1 + (y2 - y1) * step / steps, button="left", buttons=1)
+                    await asyncio.sleep(self.config.drag_duration / steps)
+                await self._mouse("mouseReleased", x2, y2, button="left", clickCount=1)
+            case ActionType.HOTKEY:
+                keys = parse_hotkey(arg, validate=False)
+                if keys == ["capslock"]:
+                    self.caps_manager.toggle()
+                else:
+                    await self._hotkey(keys)
+            case ActionType.TYPE:
+                await self._type(arg)
+            case ActionType.SCROLL:
+                parsed = parse_scroll(arg)
+                if not parsed:
+                    raise ValueError(f"Invalid scroll format: {arg}")
+                x, y = self._point(parsed[0], parsed[1])
+                delta = round(self.page.height * self.scroll_fraction)
+                await self._mouse("mouseWheel", x, y, deltaX=0, deltaY=-delta if parsed[2] == "up" else delta)
+            case ActionType.FINISH | ActionType.FAIL:
+                self.reset()
+            case ActionType.WAIT:
+                await asyncio.sleep(self.config.wait_duration)
+            case ActionType.CALL_USER:
+                logger.info("User intervention requested")
+            case _:
+                logger.warning(f"Unknown action type: {action.type}")
+
+    async def __call__(self, actions: list[Action]) -> None:
+        for action in actions:
+            for _ in range(action.count or 1):
+                await self._execute_single(action)
+        if self.config.post_batch_delay > 0:
+            await self.wait_until_settled(self.config.post_batch_delay)
+
+    async def wait_until_settled(self, timeout_s: float) -> None:
+        self.blind_wait_s += timeout_s
+        self.settle_s += await self.page.wait_until_quiet(timeout_s)
+
+
+def add_browser_arguments(parser) -> None:
+    parser.add_argument("--backend", type=str, default="desktop", choices=["desktop", "cdp"], help="desktop drives the screen with pyautogui; cdp drives a headless Chromium over DevTools")
+    parser.add_argument("--chromium", type=str, default="chromium", help="Chromium-family binary for --backend cdp")
+    parser.add_argument("--viewport", type=str, default="1260x700", help="Headless viewport WIDTHxHEIGHT; the default matches what Lux is sent, so screenshots skip the resize")
+
+
+def parse_viewport(text: str) -> tuple[int, int]:
+    width, _, height = text.lower().partition("x")
+    if not (width.isdigit() and height.isdigit()):
+        raise ValueError(f"Viewport must be WIDTHxHEIGHT, got '{text}'")
+    return int(width), int(height)
+
+
+async def open_browser_page(args, url: str) -> tuple[HeadlessChromium, BrowserPage]:
+    """Start Chromium for `--backend cdp` and open `url` in a fresh page of `--viewport` size."""
+    width, height = parse_viewport(args.viewport)
+    browser = await HeadlessChromium(args.chromium).start()
+    try:
+        page = await browser.new_page(url, width, height)
+    except Exception:
+        await browser.close()
+        raise
+    return browser, page
+
+
+def print_browser_stats(image_provider, action_handler) -> None:
+    """Pass the unwrapped provider and handler, as returned by `session.io`."""
+    if isinstance(image_provider, CDPImageProvider) and image_provider.captures:
+        print(f"🌐 CDP: {image_provider.captures} viewport captures, {image_provider.capture_s / image_provider.captures * 1000:.1f} ms each")
+    if isinstance(action_handler, CDPActionHandler) and action_handler.blind_wait_s:
+        print(
+            f"   waited {action_handler.settle_s:.1f}s for the page to go quiet instead of "
+            f"{action_handler.blind_wait_s:.1f}s of fixed post-action delay"
+        )
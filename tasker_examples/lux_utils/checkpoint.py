@@ -0,0 +1,196 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any
+
+from oagi.agent.tasker import TaskerAgent
+from oagi.agent.tasker.memory import PlannerMemory
+from oagi.agent.tasker.models import Todo, TodoHistory, TodoStatus
+
+from .budget import BudgetMixin
+from .imaging import encode_image, hamming_distance, perceptual_hash
+from .trajectory_cache import TrajectoryCacheMixin
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+class TodoCheckpoint:
+    """Snapshot of `TaskerAgent` memory, written to `save_dir` after every completed todo.
+
+    ``checkpoint.json`` holds the todo statuses, history and summaries plus a
+    perceptual hash of the last screen; the screenshot itself sits next to it
+    for inspection. Writes go through a temporary file, so a crash mid-write
+    leaves the previous checkpoint intact, and are serialized, so a save from a
+    worker thread never overwrites a newer one.
+    """
+
+    def __init__(self, save_dir: str, max_distance: int = 8, hash_size: int = 16):
+        os.makedirs(save_dir, exist_ok=True)
+        self.save_dir = save_dir
+        self.path = os.path.join(save_dir, CHECKPOINT_FILE)
+        self.max_distance = max_distance
+        self.hash_size = hash_size
+        self.todos_saved = 0
+        self.skipped_todos = 0
+        self._screen: dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._written_seq = -1
+
+    def _write(self, seq: int, payload: dict[str, Any]) -> None:
+        with self._lock:
+            if seq < self._written_seq:
+                return
+            fd, tmp_path = tempfile.mkstemp(dir=self.save_dir, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(payload, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            self._written_seq = seq
+
+    @staticmethod
+    def _memory_state(memory: PlannerMemory) -> dict[str, Any]:
+        return {
+            "task_description": memory.task_description,
+            "todos": [todo.model_dump(mode="json") for todo in memory.todos],
+            "history": [history.model_dump(mode="json") for history in memory.history],
+            "task_execution_summary": memory.task_execution_summary,
+            "todo_execution_summaries": memory.todo_execution_summaries,
+        }
+
+    def save_screen(self, image: Any) -> None:
+        """Keep the screen a completed todo left behind, for the next `save`."""
+        # Only fingerprinted on resume, so the bytes already encoded for Lux will do
+        encoded = encode_image(image, format="native")
+        filename = "checkpoint_screen" + encoded.extension
+        encoded.save(os.path.join(self.save_dir, filename))
+        self._screen = {"file": filename, "hash": format(perceptual_hash(encoded, self.hash_size), "x")}
+        self.todos_saved += 1
+
+    def _snapshot(self, memory: PlannerMemory, extra: dict[str, Any] | None) -> tuple[int, dict[str, Any]]:
+        return next(self._seq), {
+            "saved_at": time.time(),
+            "memory": self._memory_state(memory),
+            "screen": self._screen,
+            "extra": extra or {},
+        }
+
+    def save(self, memory: PlannerMemory, extra: dict[str, Any] | None = None) -> None:
+        self._write(*self._snapshot(memory, extra))
+
+    async def asave(self, memory: PlannerMemory, extra: dict[str, Any] | None = None) -> None:
+        """`save` with the state captured on the event loop and the file written from a worker thread."""
+        await asyncio.to_thread(self._write, *self._snapshot(memory, extra))
+
+    def load(self) -> dict[str, Any] | None:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def restore(self, memory: PlannerMemory, state: dict[str, Any]) -> int:
+        """Load `state` into `memory` (set up with the same todos); returns the number of completed todos."""
+        saved = state["memory"]
+        memory.task_description = saved["task_description"]
+        memory.todos = [Todo.model_validate(todo) for todo in saved["todos"]]
+        memory.history = [TodoHistory.model_validate(history) for history in saved["history"]]
+        memory.task_execution_summary = saved["task_execution_summary"]
+        # JSON object keys are strings; PlannerMemory indexes summaries by todo number
+        memory.todo_execution_summaries = {int(k): v for k, v in saved["todo_execution_summaries"].items()}
+        self._screen = state.get("screen") or {}
+        self.skipped_todos = sum(todo.status == TodoStatus.COMPLETED for todo in memory.todos)
+        return self.skipped_todos
+
+    def screen_matches(self, state: dict[str, Any], image: Any) -> bool:
+        """Whether `image` looks like the screen `state` was saved on (True if none was stored)."""
+        expected = (state.get("screen") or {}).get("hash")
+        if not expected:
+            return True
+        distance = hamming_distance(int(expected, 16), perceptual_hash(image, self.hash_size))
+        logger.info(f"Resume screen check: distance {distance} (max {self.max_distance})")
+        return distance <= self.max_distance
+
+
+class CheckpointMixin:
+    """Adds checkpoint/resume to `TaskerAgent` (or a subclass such as `QATaskerAgent`).
+
+    After each todo that succeeds, the screen is captured and memory is saved
+    to the ``checkpoint=`` `TodoCheckpoint`; the save is refreshed once the
+    agent has rolled up its task summary. `restore_checkpoint` loads the saved
+    memory before `execute`, which then starts at the first incomplete todo.
+    Subclasses with their own per-run results override `checkpoint_state` and
+    `load_checkpoint_state`. Mix in ahead of `TaskerAgent` and any other mixin
+    that overrides `_execute_todo`.
+    """
+
+    def __init__(self, *args, checkpoint: TodoCheckpoint | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkpoint = checkpoint
+
+    def checkpoint_state(self) -> dict[str, Any]:
+        return {}
+
+    def load_checkpoint_state(self, state: dict[str, Any]) -> None:
+        pass
+
+    async def restore_checkpoint(self, image_provider=None, check_screen: bool = False) -> int:
+        """Resume from the saved checkpoint; returns how many todos will be skipped.
+
+        Call after `set_task`. The checkpoint is ignored when its todos differ
+        from the current ones, or when `check_screen` is set and the screen no
+        longer resembles the one the last completed todo left behind.
+        """
+        if self.checkpoint is None:
+            return 0
+        state = self.checkpoint.load()
+        if state is None:
+            logger.info(f"No checkpoint at {self.checkpoint.path}; starting from the first todo")
+            return 0
+        saved_todos = [todo["description"] for todo in state["memory"]["todos"]]
+        if saved_todos != [todo.description for todo in self.memory.todos]:
+            logger.warning(f"Checkpoint at {self.checkpoint.path} is for different todos; starting from the first todo")
+            return 0
+        if check_screen and image_provider is not None:
+            if not await asyncio.to_thread(self.checkpoint.screen_matches, state, await image_provider()):
+                logger.warning("Screen does not match the checkpoint; starting from the first todo")
+                return 0
+        completed = self.checkpoint.restore(self.memory, state)
+        self.load_checkpoint_state(state.get("extra") or {})
+        logger.info(f"Resuming after {completed} completed todos from {self.checkpoint.path}")
+        return completed
+
+    async def _execute_todo(self, todo_index: int, action_handler, image_provider) -> bool:
+        success = await super()._execute_todo(todo_index, action_handler, image_provider)
+        if success and self.checkpoint is not None:
+            image = await image_provider()
+            await asyncio.to_thread(self.checkpoint.save_screen, image)
+            await self.checkpoint.asave(self.memory, self.checkpoint_state())
+        return success
+
+    def _update_task_summary(self) -> None:
+        super()._update_task_summary()
+        if self.checkpoint is not None and self.checkpoint.todos_saved:
+            self.checkpoint.save(self.memory, self.checkpoint_state())
+
+
+class ResumableTaskerAgent(CheckpointMixin, TrajectoryCacheMixin, BudgetMixin, TaskerAgent):
+    """`TaskerAgent` that takes ``checkpoint=``, ``trajectory_cache=``, ``budgets=`` and ``detect_loops=`` keywords."""
+
+
+def print_checkpoint_stats(checkpoint: TodoCheckpoint | None) -> None:
+    if checkpoint is None:
+        return
+    print(
+        f"💾 Checkpoint: skipped {checkpoint.skipped_todos} todos completed in an earlier run, "
+        f"saved after {checkpoint.todos_saved} more to {checkpoint.path}"
+    )
@@ -0,0 +1,437 @@
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import signal
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+from oagi.agent.tasker.memory import PlannerMemory
+from oagi.types import ActionEvent, PlanEvent, SplitEvent, StepEvent
+
+from .budget import add_budget_arguments, budget_kwargs, print_budget_stats
+from .checkpoint import ResumableTaskerAgent, TodoCheckpoint
+from .replay import LuxSession, add_replay_arguments
+from .run_history import write_run_record
+from .streaming_observer import StreamingObserver
+from .trajectory_cache import TrajectoryCache, print_trajectory_stats
+from .workflow_spec import WorkflowSpec
+from .x11_capture import add_capture_arguments, apply_capture_region, make_image_provider, print_capture_stats
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "lux_daemon.sock")
+_EXAMPLES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Workflows a job can name instead of spelling out its todos: name -> (script, builder function)
+WORKFLOW_BUILDERS = {
+    "amazon": ("amazon_scraping/amazon_scraping.py", "build_workflow"),
+    "cvs": ("cvs_appointment_booking/cvs_tasker.py", "build_workflow"),
+}
+_FINAL_EVENTS = {"done", "error", "status", "bye"}
+
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+def make_action_handler():
+    # pyautogui needs a display at import time, so it is only imported for live and recorded runs
+    from oagi.handler import AsyncPyautoguiActionHandler
+    from oagi.handler.pyautogui_action_handler import PyautoguiConfig
+
+    return AsyncPyautoguiActionHandler(
+        config=PyautoguiConfig(scroll_amount=10) if sys.platform == "darwin" else None
+    )
+
+
+def load_workflow_builders() -> dict[str, Callable[..., tuple[str, list[str]]]]:
+    """Import every script in `WORKFLOW_BUILDERS` once and return its builder by workflow name."""
+    builders = {}
+    for name, (script, function) in WORKFLOW_BUILDERS.items():
+        spec = importlib.util.spec_from_file_location(f"lux_workflow_{name}", os.path.join(_EXAMPLES_DIR, script))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        builders[name] = getattr(module, function)
+    return builders
+
+
+def progress_event(event) -> dict[str, Any] | None:
+    """Compact, screenshot-free summary of an agent event for streaming to a client."""
+    if isinstance(event, SplitEvent):
+        return {"event": "split", "label": event.label}
+    if isinstance(event, StepEvent):
+        return {
+            "event": "step",
+            "step": event.step_num,
+            "actions": [action.type.value for action in event.step.actions],
+            "reason": (event.step.reason or "")[:200],
+            "stop": event.step.stop,
+        }
+    if isinstance(event, PlanEvent):
+        return {"event": "plan", "phase": event.phase}
+    if isinstance(event, ActionEvent) and event.error:
+        return {"event": "action_error", "step": event.step_num, "error": event.error}
+    return None
+
+
+class ProgressObserver:
+    """Forward agent events to `inner` and stream a summary of each to the submitting client."""
+
+    def __init__(self, send: Send, inner=None):
+        self.send = send
+        self.inner = inner
+
+    async def on_event(self, event) -> None:
+        if self.inner is not None:
+            await self.inner.on_event(event)
+        progress = progress_event(event)
+        if progress is not None:
+            await self.send(progress)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+class LuxDaemon:
+    """Long-lived process that keeps a warm `TaskerAgent` and runs jobs sent over a Unix socket.
+
+    Imports, the desktop action handler and image provider, the planner's HTTP
+    connections and the trajectory cache are set up once at start; each job
+    only gets fresh memory, a checkpoint and a streamed history under
+    ``<save_dir>/<exp_name>``. Jobs share one desktop, so they run one at a
+    time in arrival order. See `submit_job` for the wire protocol.
+    """
+
+    def __init__(self, args, workflows: dict[str, Callable[..., tuple[str, list[str]]]]):
+        self.args = args
+        self.socket_path = args.socket
+        self.workflows = workflows
+        self.session = LuxSession.from_args(args).start()
+        self.image_provider, self.action_handler = self.session.io(lambda: make_image_provider(args), make_action_handler)
+        if not self.session.replaying:
+            apply_capture_region(args, self.image_provider, self.action_handler)
+        self.trajectory_cache = None
+        if args.trajectory_cache:
+            self.trajectory_cache = TrajectoryCache(args.trajectory_cache, max_distance=args.trajectory_distance)
+        self.tasker = ResumableTaskerAgent(
+            **self.session.agent_kwargs(),
+            trajectory_cache=self.trajectory_cache,
+            **budget_kwargs(args),
+            model=args.model_name,
+            max_steps=args.max_steps,
+            temperature=args.temperature,
+        )
+        self.started_at = time.time()
+        self.jobs_run = 0
+        self.jobs_succeeded = 0
+        self.pending = 0
+        self._next_job_id = 1
+        self._run_lock = asyncio.Lock()
+        self._stopping = asyncio.Event()
+
+    def resolve(self, job: dict[str, Any]) -> tuple[str, list[str]]:
+        """Instruction and todos for `job`: from a named workflow, or its own templates filled with ``params``."""
+        params = job.get("params") or {}
+        if job.get("workflow"):
+            builder = self.workflows.get(job["workflow"])
+            if builder is None:
+                raise ValueError(f"unknown workflow {job['workflow']!r}; known: {', '.join(self.workflows)}")
+            return builder(**params)
+        if not job.get("todos"):
+            raise ValueError("a job needs a workflow or a list of todos")
+        instruction, todos = job.get("instruction", ""), list(job["todos"])
+        if params:
+            instruction, todos = instruction.format(**params), [todo.format(**params) for todo in todos]
+        return instruction, todos
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "event": "status",
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "jobs_run": self.jobs_run,
+            "jobs_succeeded": self.jobs_succeeded,
+            "pending": self.pending,
+            "workflows": sorted(self.workflows),
+        }
+
+    async def run_job(self, job: dict[str, Any], send: Send) -> dict[str, Any]:
+        instruction, todos = self.resolve(job)
+        job_id = self._next_job_id
+        self._next_job_id += 1
+        received = time.perf_counter()
+        await send({"event": "accepted", "job_id": job_id, "ahead": self.pending})
+        self.pending += 1
+        try:
+            async with self._run_lock:
+                return await self._execute(job_id, job, instruction, todos, send, time.perf_counter() - received)
+        finally:
+            self.pending -= 1
+
+    async def _execute(self, job_id: int, job: dict[str, Any], instruction: str, todos: list[str], send: Send, queued_s: float) -> dict[str, Any]:
+        exp_name = job.get("exp_name") or f"job_{job_id:04d}"
+        save_dir = os.path.join(self.args.save_dir, exp_name)
+        os.makedirs(save_dir, exist_ok=True)
+        # Streamed, so a daemon running thousands of jobs does not hold their screenshots
+        # A resumed job appends to the history of the run it continues
+        observer = StreamingObserver(os.path.join(save_dir, "history"), resume=bool(job.get("resume")))
+
+        self.session.rewind()
+        tasker = self.tasker
+        tasker.memory = PlannerMemory()
+        tasker.current_todo_index = -1
+        tasker.step_observer = ProgressObserver(send, observer)
+        tasker.checkpoint = TodoCheckpoint(save_dir)
+        tasker.max_steps = job.get("max_steps") or self.args.max_steps
+        tasker.set_task(instruction, todos)
+        skipped = await tasker.restore_checkpoint(self.image_provider) if job.get("resume") else 0
+
+        await send({"event": "started", "job_id": job_id, "exp_name": exp_name, "todos": len(todos), "skipped": skipped, "queued_s": round(queued_s, 3)})
+        started_at, start = datetime.now(), time.perf_counter()
+        error = None
+        try:
+            success = await tasker.execute(instruction="", action_handler=self.action_handler, image_provider=self.image_provider)
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed")
+            success, error = False, repr(e)
+        wall_s = time.perf_counter() - start
+        write_run_record(
+            save_dir, job.get("workflow") or job.get("label") or "adhoc", tasker.get_memory(), success, started_at, wall_s, error,
+            params=job.get("params"),
+        )
+
+        output_file = os.path.join(save_dir, "execution_history.html")
+        await asyncio.to_thread(observer.export, "html", output_file)
+        observer.close()
+        self.jobs_run += 1
+        self.jobs_succeeded += bool(success)
+        result = {
+            "event": "done",
+            "job_id": job_id,
+            "success": success,
+            "error": error,
+            "todo_status": {status.value: count for status, count in tasker.get_memory().get_todo_status_summary().items()},
+            "queued_s": round(queued_s, 3),
+            "wall_s": round(wall_s, 3),
+            "history": output_file,
+        }
+        await send(result)
+        return result
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        async def send(message: dict[str, Any]) -> None:
+            # A client that hangs up only loses its progress; the job keeps running
+            if writer.is_closing():
+                return
+            writer.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+        try:
+            request = json.loads(await reader.readline())
+            op = request.get("op", "run")
+            if op == "run":
+                await self.run_job(request["job"], send)
+            elif op == "status":
+                await send(self.status())
+            elif op == "shutdown":
+                await send({"event": "bye", "jobs_run": self.jobs_run})
+                self._stopping.set()
+            else:
+                await send({"event": "error", "message": f"unknown op {op!r}"})
+        except (ValueError, KeyError, TypeError) as e:
+            await send({"event": "error", "message": str(e)})
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        if os.path.exists(self.socket_path):
+            try:
+                _, writer = await asyncio.open_unix_connection(self.socket_path)
+            except OSError:
+                os.remove(self.socket_path)
+            else:
+                writer.close()
+                raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stopping.set)
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        print(f"🔥 Lux daemon ready on {self.socket_path} (pid {os.getpid()}, workflows: {', '.join(sorted(self.workflows))})", flush=True)
+        try:
+            async with server:
+                await self._stopping.wait()
+                # Let a running job finish before the handlers go away
+                async with self._run_lock:
+                    pass
+        finally:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            await self.tasker.planner.close()
+            self.session.stop()
+            self.session.report()
+            print_trajectory_stats(self.trajectory_cache)
+            print_budget_stats(self.tasker)
+            print_capture_stats(self.image_provider)
+            print(f"Lux daemon stopped after {self.jobs_run} jobs ({self.jobs_succeeded} succeeded)")
+
+
+async def request(payload: dict[str, Any], socket_path: str = DEFAULT_SOCKET, on_event: Callable[[dict], None] | None = None) -> dict[str, Any]:
+    """Send one request to the daemon and return its final message, passing every message to `on_event`."""
+    # Progress lines carry the model's reasoning, which can exceed the default 64 KiB line limit
+    reader, writer = await asyncio.open_unix_connection(socket_path, limit=1 << 22)
+    final = {"event": "error", "message": "daemon closed the connection"}
+    try:
+        writer.write((json.dumps(payload) + "\n").encode("utf-8"))
+        await writer.drain()
+        while line := await reader.readline():
+            message = json.loads(line)
+            if on_event is not None:
+                on_event(message)
+            if message["event"] in _FINAL_EVENTS:
+                final = message
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return final
+
+
+async def wait_for_daemon(socket_path: str, process=None, timeout_s: float = 60.0) -> None:
+    """Wait until the daemon on `socket_path` answers; fails early if its `process` (a `Popen`) exits."""
+    deadline = time.perf_counter() + timeout_s
+    while time.perf_counter() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Daemon for {socket_path} exited with {process.returncode}")
+        if os.path.exists(socket_path):
+            try:
+                await request({"op": "status"}, socket_path)
+                return
+            except OSError:
+                pass
+        await asyncio.sleep(0.01)
+    raise TimeoutError(f"No daemon answered on {socket_path} within {timeout_s}s")
+
+
+async def submit_job(job: dict[str, Any], socket_path: str = DEFAULT_SOCKET, on_event: Callable[[dict], None] | None = None) -> dict[str, Any]:
+    """Run `job` on the daemon and return its ``done`` (or ``error``) message.
+
+    The protocol is newline-delimited JSON over the Unix socket: the client
+    sends ``{"op": "run", "job": {...}}`` and the daemon answers ``accepted``
+    (with how many jobs are ahead), ``started``, then ``split`` / ``plan`` /
+    ``step`` / ``action_error`` progress as the agent works, and finally
+    ``done``. A job is ``{"workflow": name, "params": {...}}`` or
+    ``{"instruction": ..., "todos": [...], "params": {...}}`` with
+    ``str.format`` placeholders, plus optional ``exp_name``, ``max_steps``
+    and ``resume``.
+    """
+    return await request({"op": "run", "job": job}, socket_path, on_event)
+
+
+def format_event(message: dict[str, Any]) -> str | None:
+    event = message["event"]
+    if event == "accepted":
+        return f"📥 Job {message['job_id']} accepted ({message['ahead']} ahead)"
+    if event == "started":
+        return f"▶️  Started {message['exp_name']}: {message['todos']} todos, waited {message['queued_s']}s"
+    if event == "split":
+        return f"— {message['label']}"
+    if event == "step":
+        return f"   step {message['step']}: {', '.join(message['actions']) or 'no action'} | {message['reason'][:100]}"
+    if event == "plan":
+        return f"   plan: {message['phase']}"
+    if event == "action_error":
+        return f"   ⚠️  action error at step {message['step']}: {message['error']}"
+    if event == "done":
+        icon = "✅" if message["success"] else "❌"
+        return f"{icon} Job {message['job_id']} done in {message['wall_s']}s: {message['todo_status']} -> {message['history']}"
+    if event == "error":
+        return f"❌ {message['message']}"
+    return json.dumps(message)
+
+
+def _parse_params(pairs: list[str]) -> dict[str, str]:
+    params = {}
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        if not sep:
+            raise ValueError(f"--param expects key=value, got {pair!r}")
+        params[key] = value
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep a warm Lux tasker resident and run workflow jobs sent over a Unix socket")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Start the daemon")
+    serve.add_argument("--save_dir", default="results/daemon", help="Each job writes to <save_dir>/<exp_name>")
+    serve.add_argument("--model_name", default="lux-actor-1")
+    serve.add_argument("--max_steps", type=int, default=24)
+    serve.add_argument("--temperature", type=float, default=0.0)
+    serve.add_argument("--trajectory_cache", type=str, default="", help="SQLite file of known-good action sequences to replay (disabled if empty)")
+    serve.add_argument("--trajectory_distance", type=int, default=6, help="Max perceptual-hash bit distance for a screen to match")
+    add_replay_arguments(serve)
+    add_capture_arguments(serve)
+    add_budget_arguments(serve)
+
+    submit = commands.add_parser("submit", help="Run a job and stream its progress")
+    submit.add_argument("--workflow", choices=sorted(WORKFLOW_BUILDERS), help="Named workflow, filled from --param")
+    submit.add_argument("--spec", default="", help="Workflow spec file (YAML/JSON) to render with --param")
+    submit.add_argument("--param", action="append", default=[], help="Workflow or template parameter as key=value (repeatable)")
+    submit.add_argument("--instruction", default="", help="Instruction for an ad-hoc job")
+    submit.add_argument("--todo", action="append", default=[], help="Todo for an ad-hoc job (repeatable)")
+    submit.add_argument("--job", default="", help="JSON file with the whole job")
+    submit.add_argument("--exp_name", default="", help="Output directory name under the daemon's save_dir")
+    submit.add_argument("--max_steps", type=int, default=0, help="Override the daemon's max steps per todo")
+    submit.add_argument("--resume", action="store_true", help="Skip todos completed by the last job with this exp_name")
+    submit.add_argument("--quiet", action="store_true", help="Only print the final result")
+
+    commands.add_parser("status", help="Print the daemon's status")
+    commands.add_parser("stop", help="Stop the daemon once the running job finishes")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        logging.basicConfig(level=logging.WARNING)
+        daemon = LuxDaemon(args, load_workflow_builders())
+        asyncio.run(daemon.serve())
+        return
+
+    if args.command == "submit":
+        try:
+            params = _parse_params(args.param)
+            if args.spec:
+                # Rendered here, so a bad parameter fails before the job reaches the daemon
+                job = WorkflowSpec.load(args.spec).job(params)
+            elif args.job:
+                with open(args.job, "r", encoding="utf-8") as f:
+                    job = json.load(f)
+                job.setdefault("params", {}).update(params)
+            else:
+                job = {"workflow": args.workflow, "instruction": args.instruction, "todos": args.todo, "params": params}
+        except ValueError as e:
+            parser.error(str(e))
+        for key in ("exp_name", "max_steps", "resume"):
+            if getattr(args, key):
+                job[key] = getattr(args, key)
+
+        def on_event(message):
+            line = format_event(message)
+            if line and (not args.quiet or message["event"] in ("done", "error")):
+                print(line, flush=True)
+
+        result = asyncio.run(submit_job(job, args.socket, on_event))
+        sys.exit(0 if result.get("success") else 1)
+
+    payload = {"op": "status" if args.command == "status" else "shutdown"}
+    print(json.dumps(asyncio.run(request(payload, args.socket)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
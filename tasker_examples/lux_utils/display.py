@@ -0,0 +1,118 @@
+import logging
+import os
+import shutil
+import subprocess
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class VirtualDisplay:
+    """An Xvfb server on its own display number, used as a context manager.
+
+    Entering sets ``DISPLAY`` for the current process so anything that talks to
+    X afterwards (pyautogui, PIL screen grabs, a browser we launch) lands on it.
+    Import pyautogui-backed oagi handlers only after entering.
+    """
+
+    def __init__(self, display: int, width: int = 1920, height: int = 1080, depth: int = 24):
+        self.display = display
+        self.width = width
+        self.height = height
+        self.depth = depth
+        self._process: subprocess.Popen | None = None
+        self._previous_display: str | None = None
+
+    @property
+    def name(self) -> str:
+        return f":{self.display}"
+
+    def start(self, timeout: float = 10.0) -> "VirtualDisplay":
+        if shutil.which("Xvfb") is None:
+            raise RuntimeError("Xvfb is not installed; install it (e.g. apt install xvfb) to use virtual displays")
+        self._process = subprocess.Popen(
+            ["Xvfb", self.name, "-screen", "0", f"{self.width}x{self.height}x{self.depth}", "-nolisten", "tcp"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        socket_path = f"/tmp/.X11-unix/X{self.display}"
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(socket_path):
+            if self._process.poll() is not None:
+                raise RuntimeError(f"Xvfb exited while starting display {self.name}")
+            if time.monotonic() > deadline:
+                self.stop()
+                raise RuntimeError(f"Timed out waiting for Xvfb display {self.name}")
+            time.sleep(0.05)
+        self._previous_display = os.environ.get("DISPLAY")
+        os.environ["DISPLAY"] = self.name
+        logger.info(f"Started Xvfb on {self.name} ({self.width}x{self.height})")
+        return self
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+        if self._previous_display is not None:
+            os.environ["DISPLAY"] = self._previous_display
+            self._previous_display = None
+
+    def __enter__(self) -> "VirtualDisplay":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+
+class ManagedProcess:
+    """A GUI application (browser, Nuclear, ...) started on the current DISPLAY and stopped on exit."""
+
+    def __init__(self, command: list[str], settle_s: float = 3.0, env: dict[str, str] | None = None):
+        self.command = command
+        self.settle_s = settle_s
+        # Pins the display for processes restarted after another `VirtualDisplay` took over ``DISPLAY``
+        self.env = env
+        self._process: subprocess.Popen | None = None
+
+    def start(self) -> "ManagedProcess":
+        self._process = subprocess.Popen(self.command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=self.env)
+        # Give the window time to map before the agent takes its first screenshot
+        time.sleep(self.settle_s)
+        if self._process.poll() is not None:
+            raise RuntimeError(f"{self.command[0]} exited during startup")
+        return self
+
+    def stop(self) -> None:
+        if self._process is None:
+            return
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+        self._process = None
+
+    def __enter__(self) -> "ManagedProcess":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+
+def browser_command(binary: str, width: int, height: int, profile_dir: str, url: str = "about:blank") -> list[str]:
+    """Chromium-family command line using its own profile directory, so sessions stay isolated."""
+    return [
+        binary,
+        f"--user-data-dir={profile_dir}",
+        "--no-first-run",
+        "--no-default-browser-check",
+        "--disable-session-crashed-bubble",
+        f"--window-size={width},{height}",
+        "--window-position=0,0",
+        "--start-maximized",
+        url,
+    ]
@@ -0,0 +1,263 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any
+
+from .imaging import PreprocessConfig, encode_image
+from .vlm_batch import FieldSpec, analyze_fields, validate_field
+from .vlm_cache import VLMAnswerCache
+
+logger = logging.getLogger(__name__)
+
+_SPACES = re.compile(r"\s+")
+_ARROW_TYPES = {"string": "string", "number": "float64", "integer": "int64", "boolean": "bool_", "array": "string"}
+
+
+def row_key(row: dict[str, Any], key_fields: list[str]) -> tuple:
+    """Identity of a row across viewports: its key fields, case- and whitespace-folded."""
+    parts = []
+    for name in key_fields:
+        value = row.get(name)
+        if isinstance(value, str):
+            value = _SPACES.sub(" ", value).strip().lower()
+        elif isinstance(value, float):
+            value = round(value, 2)
+        parts.append(value)
+    return tuple(parts)
+
+
+class RowSink:
+    """Append extracted rows to JSONL as they arrive, or to Parquet in row groups.
+
+    JSONL is line-buffered, so a crash loses nothing already extracted. Parquet
+    (a ``.parquet`` path) needs pyarrow and writes a row group every
+    `row_group_size` rows, with columns typed from the field specs.
+    """
+
+    def __init__(self, path: str, fields: dict[str, FieldSpec], row_group_size: int = 100):
+        self.path = path
+        self.fields = fields
+        self.row_group_size = row_group_size
+        self.count = 0
+        self._buffer: list[dict[str, Any]] = []
+        self._writer = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if path.endswith(".parquet"):
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise RuntimeError(f"Writing {path} needs pyarrow (pip install pyarrow); .jsonl output works without it")
+            self._pa = pa
+            columns = [("rank", pa.int64()), ("page", pa.int64()), ("viewport", pa.int64())]
+            columns += [(name, getattr(pa, _ARROW_TYPES.get(spec.type, "string"))()) for name, spec in fields.items()]
+            self._schema = pa.schema(columns + [("extracted_at", pa.string())])
+            self._writer = pq.ParquetWriter(path, self._schema)
+            self._file = None
+        else:
+            self._file = open(path, "w", encoding="utf-8", buffering=1)
+
+    def write(self, row: dict[str, Any]) -> None:
+        self.count += 1
+        if self._file is not None:
+            self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            return
+        # Parquet columns are flat; arrays are kept as their JSON text
+        self._buffer.append({
+            name: json.dumps(value, ensure_ascii=False) if isinstance(value, (list, dict)) else value
+            for name, value in row.items()
+        })
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._buffer:
+            self._writer.write_table(self._pa.Table.from_pylist(self._buffer, schema=self._schema))
+            self._buffer = []
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        elif self._writer is not None:
+            self._flush()
+            self._writer.close()
+            self._writer = None
+
+
+@dataclass
+class ExtractionStats:
+    viewports: int = 0
+    rows_seen: int = 0
+    rows_written: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    failed_viewports: int = 0
+    requests: int = 0
+    upload_bytes: int = 0
+    extract_s: float = 0.0
+    # Time navigation spent blocked on a full pipeline, and waiting for the last viewports at the end
+    stall_s: float = 0.0
+    drain_s: float = 0.0
+    wall_s: float = 0.0
+
+    @property
+    def products_per_minute(self) -> float:
+        return self.rows_written / self.wall_s * 60 if self.wall_s > 0 else 0.0
+
+    @property
+    def overlapped_s(self) -> float:
+        """Extraction time hidden behind navigation."""
+        return max(0.0, self.extract_s - self.stall_s - self.drain_s)
+
+    def as_dict(self) -> dict[str, Any]:
+        stats = asdict(self)
+        for name in ("extract_s", "stall_s", "drain_s", "wall_s"):
+            stats[name] = round(stats[name], 2)
+        stats["overlapped_s"] = round(self.overlapped_s, 2)
+        stats["products_per_minute"] = round(self.products_per_minute, 1)
+        return stats
+
+
+class ViewportExtractor:
+    """Turn viewport screenshots into deduplicated structured rows, off the navigation path.
+
+    `submit` encodes a viewport and starts its VLM extraction in a worker thread,
+    then returns so the caller can scroll or paginate to the next viewport while
+    the previous one is analyzed. At most `depth` viewports are in flight;
+    `submit` waits for the oldest beyond that. Results are merged in submit
+    order, so a row's ``rank`` is the order it first appeared on screen. Rows
+    whose `key_fields` match one already written (the overlap between adjacent
+    viewports) are dropped, and writing stops after `limit` rows.
+    """
+
+    def __init__(
+        self,
+        fields: dict[str, FieldSpec],
+        key_fields: list[str],
+        vlm,
+        sink: RowSink,
+        item_description: str = "Every item visible in the screenshot",
+        cache: VLMAnswerCache | None = None,
+        preprocess: PreprocessConfig | None = None,
+        depth: int = 2,
+        limit: int = 0,
+    ):
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        self.fields = fields
+        self.key_fields = key_fields
+        self.vlm = vlm
+        self.sink = sink
+        self.cache = cache
+        self.preprocess = preprocess
+        self.depth = depth
+        self.limit = limit
+        self.stats = ExtractionStats()
+        self._schema = {"items": FieldSpec(_item_prompt(item_description, fields), type="array")}
+        self._seen: set[tuple] = set()
+        self._pending: list[asyncio.Task] = []
+        self._start = time.perf_counter()
+
+    @property
+    def full(self) -> bool:
+        """Whether `limit` rows have been written; pending viewports may still add none."""
+        return bool(self.limit) and self.stats.rows_written >= self.limit
+
+    async def submit(self, image: Any, page: int, viewport: int) -> None:
+        while len(self._pending) >= self.depth:
+            start = time.perf_counter()
+            await self._merge_oldest()
+            self.stats.stall_s += time.perf_counter() - start
+        self.stats.viewports += 1
+        self._pending.append(asyncio.create_task(self._extract(image, page, viewport)))
+
+    def _encode_and_analyze(self, image: Any):
+        # Crop, downscale and encode in the worker thread too, so none of it holds up navigation
+        return analyze_fields(encode_image(image, preprocess=self.preprocess), self._schema, self.vlm, self.cache)
+
+    async def _extract(self, image: Any, page: int, viewport: int) -> tuple[int, int, Any, float]:
+        start = time.perf_counter()
+        try:
+            analysis = await asyncio.to_thread(self._encode_and_analyze, image)
+        except Exception as e:
+            logger.error(f"Extraction of page {page} viewport {viewport} failed: {e}")
+            analysis = None
+        return page, viewport, analysis, time.perf_counter() - start
+
+    async def _merge_oldest(self) -> None:
+        page, viewport, analysis, elapsed = await self._pending.pop(0)
+        self.stats.extract_s += elapsed
+        if analysis is None or analysis.errors:
+            self.stats.failed_viewports += 1
+            if analysis is not None:
+                logger.warning(f"Page {page} viewport {viewport}: {analysis.errors}")
+        if analysis is None:
+            return
+        self.stats.requests += analysis.requests
+        self.stats.upload_bytes += analysis.upload_bytes
+        for item in analysis.values.get("items") or []:
+            self._merge_row(item, page, viewport)
+
+    def _merge_row(self, item: Any, page: int, viewport: int) -> None:
+        self.stats.rows_seen += 1
+        if not isinstance(item, dict):
+            self.stats.invalid += 1
+            return
+        row = {}
+        for name, spec in self.fields.items():
+            ok, value, error = validate_field(spec, item.get(name))
+            if not ok:
+                logger.debug(f"Dropping row on page {page} viewport {viewport}: {name} {error}")
+                self.stats.invalid += 1
+                return
+            row[name] = value
+        key = row_key(row, self.key_fields)
+        if key in self._seen:
+            self.stats.duplicates += 1
+            return
+        self._seen.add(key)
+        if self.full:
+            return
+        self.stats.rows_written += 1
+        self.sink.write({
+            "rank": self.stats.rows_written,
+            "page": page,
+            "viewport": viewport,
+            **row,
+            "extracted_at": datetime.now().isoformat(),
+        })
+
+    async def finish(self) -> ExtractionStats:
+        """Merge every viewport still in flight and close the sink."""
+        start = time.perf_counter()
+        while self._pending:
+            await self._merge_oldest()
+        self.stats.drain_s = time.perf_counter() - start
+        self.stats.wall_s = time.perf_counter() - self._start
+        self.sink.close()
+        return self.stats
+
+
+def _item_prompt(item_description: str, fields: dict[str, FieldSpec]) -> str:
+    columns = ", ".join(
+        f"{name} ({spec.type}{'' if spec.required else ', null if not shown'}: {spec.description})"
+        for name, spec in fields.items()
+    )
+    return f"{item_description}, top to bottom and left to right, as objects with {columns}"
+
+
+def print_extraction_stats(stats: ExtractionStats, path: str) -> None:
+    print(
+        f"🛒 Extraction: {stats.rows_written} products from {stats.viewports} viewports "
+        f"({stats.duplicates} duplicates, {stats.invalid} invalid, {stats.failed_viewports} viewports failed) "
+        f"in {stats.wall_s:.1f}s, {stats.products_per_minute:.1f} products/min"
+    )
+    print(
+        f"   VLM {stats.extract_s:.1f}s over {stats.requests} requests, {stats.overlapped_s:.1f}s hidden behind navigation "
+        f"(stalled {stats.stall_s:.1f}s, drained {stats.drain_s:.1f}s); rows in {path}"
+    )
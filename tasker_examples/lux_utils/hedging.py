@@ -0,0 +1,217 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable
+
+from .async_engine import AsyncModelEngine, percentile, print_engine_stats
+
+logger = logging.getLogger(__name__)
+
+
+def is_valid_answer(answer: Any) -> bool:
+    return isinstance(answer, str) and bool(answer.strip())
+
+
+def provider_name(model_info_path: str) -> str:
+    """Short provider label from a model info path (``apis/gemini.json`` -> ``gemini``)."""
+    return os.path.splitext(os.path.basename(model_info_path))[0]
+
+
+class HedgedEngine:
+    """`ModelEngine`-style callable that hedges slow VLM requests across providers.
+
+    `providers` is an ordered list of ``(name, engine)`` pairs. A call goes to
+    the first provider; if it has not answered within the hedge delay, the
+    next provider is asked as well, and so on down the list, one delay apart.
+    The delay is the `hedge_percentile` of the primary's recent latencies
+    (`initial_delay_s` until `min_samples` have been seen, never below
+    `min_delay_s`), so only the slowest few percent of calls pay for a second
+    request. A failed or empty answer brings in the next provider at once.
+
+    The first valid answer wins and the rest are cancelled: `AsyncModelEngine`
+    requests are aborted, blocking engines finish in the background and their
+    answers are dropped. Drop-in for the ``vlm`` of `analyze_screenshot`.
+    """
+
+    def __init__(
+        self,
+        providers: list[tuple[str, Any]],
+        hedge_percentile: float = 95.0,
+        initial_delay_s: float = 5.0,
+        min_delay_s: float = 0.5,
+        min_samples: int = 10,
+        window: int = 200,
+        validate: Callable[[Any], bool] = is_valid_answer,
+        max_workers: int = 32,
+    ):
+        if not providers:
+            raise ValueError("HedgedEngine needs at least one provider")
+        self.providers = providers
+        self.hedge_percentile = hedge_percentile
+        self.initial_delay_s = initial_delay_s
+        self.min_delay_s = min_delay_s
+        self.min_samples = min_samples
+        self.validate = validate
+        # The primary's answers are cached and fingerprinted as if it answered every call
+        self.model_info = getattr(providers[0][1], "model_info", None)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vlm-hedge")
+        self._lock = threading.Lock()
+        self._primary_window: deque[float] = deque(maxlen=window)
+
+        self.calls = 0
+        self.hedged = 0
+        self.failures = 0
+        self.wins: Counter[str] = Counter()
+        self.latency_s: list[float] = []
+        # What each call would have taken without hedging; a primary cancelled
+        # after losing only tells us it would have taken at least that long
+        self.primary_latency_s: list[float] = []
+        self.primary_cancelled = 0
+
+    @classmethod
+    def from_args(cls, args, make_engine: Callable[[str], Any]) -> "HedgedEngine":
+        """Primary from ``--model_info_path``, backups from ``--vlm_hedge``; `make_engine` loads one path."""
+        paths = [args.model_info_path] + [path.strip() for path in args.vlm_hedge.split(",") if path.strip()]
+        return cls(
+            [(provider_name(path), make_engine(path)) for path in paths],
+            hedge_percentile=args.vlm_hedge_percentile,
+            initial_delay_s=args.vlm_hedge_initial_delay,
+            min_delay_s=args.vlm_hedge_min_delay,
+        )
+
+    def hedge_delay(self) -> float:
+        with self._lock:
+            samples = list(self._primary_window)
+        if len(samples) < self.min_samples:
+            return self.initial_delay_s
+        return max(self.min_delay_s, percentile(samples, self.hedge_percentile))
+
+    def _submit(self, engine: Any, system_messages: list, user_messages: list) -> Future:
+        if isinstance(engine, AsyncModelEngine):
+            return engine.submit(system_messages, user_messages)
+        return self._executor.submit(engine, system_messages, user_messages)
+
+    def __call__(self, system_messages: list, user_messages: list) -> Any:
+        start = time.perf_counter()
+        delay = self.hedge_delay()
+        pending: dict[Future, int] = {}
+        errors: list[str] = []
+
+        def launch() -> None:
+            index = len(pending) + len(errors)
+            future = self._submit(self.providers[index][1], system_messages, user_messages)
+            pending[future] = index
+            if index == 0:
+                future.add_done_callback(self._primary_done(start))
+
+        launch()
+        try:
+            while pending:
+                launched = len(pending) + len(errors)
+                timeout = None
+                if launched < len(self.providers):
+                    timeout = max(0.0, start + delay * launched - time.perf_counter())
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    launch()
+                    continue
+                for future in done:
+                    index = pending.pop(future)
+                    name = self.providers[index][0]
+                    try:
+                        answer = future.result()
+                    except Exception as e:
+                        answer, error = None, repr(e)
+                    else:
+                        error = None if self.validate(answer) else f"invalid answer {answer!r:.60}"
+                    if error is None:
+                        self._record(name, len(pending) + len(errors) + 1, time.perf_counter() - start)
+                        return answer
+                    logger.warning(f"VLM provider '{name}' failed: {error}")
+                    errors.append(f"{name}: {error}")
+                    # Bring in the next provider now rather than at its hedge time
+                    if len(pending) + len(errors) < len(self.providers):
+                        launch()
+            with self._lock:
+                self.calls += 1
+                self.failures += 1
+            raise RuntimeError(f"All VLM providers failed: {'; '.join(errors)}")
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _primary_done(self, start: float) -> Callable[[Future], None]:
+        def record(future: Future) -> None:
+            elapsed = time.perf_counter() - start
+            if future.cancelled():
+                # Only a lower bound, roughly the winner's time; it would drag the hedge delay along with the backups
+                with self._lock:
+                    self.primary_latency_s.append(elapsed)
+                    self.primary_cancelled += 1
+            elif future.exception() is None:
+                with self._lock:
+                    self.primary_latency_s.append(elapsed)
+                    self._primary_window.append(elapsed)
+
+        return record
+
+    def _record(self, winner: str, launched: int, elapsed: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self.hedged += launched > 1
+            self.wins[winner] += 1
+            self.latency_s.append(elapsed)
+        if launched > 1:
+            logger.info(f"VLM hedge: '{winner}' answered first after {elapsed:.2f}s ({launched} providers asked)")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            latency, primary = list(self.latency_s), list(self.primary_latency_s)
+            summary = {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_rate": round(self.hedged / self.calls, 3) if self.calls else 0.0,
+                "failures": self.failures,
+                "wins": dict(self.wins),
+                "primary_cancelled": self.primary_cancelled,
+            }
+        summary["hedge_delay_s"] = round(self.hedge_delay(), 3)
+        for q in (50, 95, 99):
+            summary[f"hedged_p{q}_s"] = round(percentile(latency, q), 3)
+            summary[f"unhedged_p{q}_s"] = round(percentile(primary, q), 3)
+        return summary
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for _, engine in self.providers:
+            if isinstance(engine, AsyncModelEngine):
+                engine.close()
+
+
+def add_hedge_arguments(parser) -> None:
+    parser.add_argument("--vlm_hedge", type=str, default="", help="Comma-separated backup model info JSONs to hedge slow VLM requests to (disabled if empty)")
+    parser.add_argument("--vlm_hedge_percentile", type=float, default=95.0, help="Primary latency percentile after which a backup request is sent")
+    parser.add_argument("--vlm_hedge_initial_delay", type=float, default=5.0, help="Hedge delay in seconds until enough primary latencies are known")
+    parser.add_argument("--vlm_hedge_min_delay", type=float, default=0.5, help="Never hedge sooner than this many seconds")
+
+
+def print_hedge_stats(engine) -> None:
+    if not isinstance(engine, HedgedEngine):
+        return
+    stats = engine.stats()
+    wins = ", ".join(f"{name} {count}" for name, count in stats["wins"].items())
+    print(
+        f"🏁 VLM hedging: {stats['calls']} calls, {stats['hedged']} hedged ({stats['hedge_rate']:.0%}) "
+        f"after {stats['hedge_delay_s']}s, won by {wins or 'none'}, {stats['failures']} failed"
+    )
+    # Cancelled primaries are counted at the time they were cancelled, so unhedged figures are a lower bound
+    print(
+        f"   latency p50/p95/p99 hedged {stats['hedged_p50_s']}/{stats['hedged_p95_s']}/{stats['hedged_p99_s']}s, "
+        f"unhedged {stats['unhedged_p50_s']}/{stats['unhedged_p95_s']}/{stats['unhedged_p99_s']}s "
+        f"({stats['primary_cancelled']} primaries cancelled)"
+    )
+    for _, provider in engine.providers:
+        print_engine_stats(provider)
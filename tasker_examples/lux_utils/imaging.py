@@ -0,0 +1,302 @@
+import base64
+import io
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any
+
+from PIL import Image as PILImageLib
+
+_MIME_BY_FORMAT = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+_EXTENSION_BY_MIME = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/webp": ".webp",
+}
+
+# One scratch buffer per thread, reused across encodes instead of allocating a new BytesIO
+_scratch = threading.local()
+
+
+@dataclass
+class EncodedImage:
+    """Screenshot bytes encoded once and shared by the VLM request and the on-disk artifact."""
+
+    data: bytes
+    mime: str
+    size: tuple[int, int]
+    encode_s: float = 0.0
+    # What the screenshot looked like before preprocessing, for upload-size logging
+    original_size: tuple[int, int] | None = None
+    original_bytes: int | None = None
+    _b64: str | None = field(default=None, repr=False)
+
+    @property
+    def extension(self) -> str:
+        return _EXTENSION_BY_MIME.get(self.mime, ".bin")
+
+    @property
+    def b64(self) -> str:
+        if self._b64 is None:
+            self._b64 = base64.b64encode(self.data).decode("ascii")
+        return self._b64
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.mime};base64,{self.b64}"
+
+    def save(self, path: str) -> None:
+        """Write the already-encoded bytes to `path` without re-compressing."""
+        with open(path, "wb") as f:
+            f.write(self.data)
+
+    def describe(self) -> str:
+        if self.original_size is None:
+            original = f"{self.size[0]}x{self.size[1]} {len(self.data)} B"
+        elif self.original_bytes is None:
+            original = f"{self.original_size[0]}x{self.original_size[1]} (not encoded)"
+        else:
+            original = f"{self.original_size[0]}x{self.original_size[1]} {self.original_bytes} B"
+        return (
+            f"{original} -> "
+            f"{self.size[0]}x{self.size[1]} {self.mime} {len(self.data)} B, "
+            f"encode {self.encode_s * 1000:.1f} ms"
+        )
+
+
+class UploadedFrame(str):
+    """Download URL of a screenshot already uploaded to Lux, still carrying the screenshot itself.
+
+    The SDK sends any ``str`` screenshot to the planner and actor as a URL
+    instead of uploading it again; the helpers in this module treat it as the
+    wrapped screenshot.
+    """
+
+    def __new__(cls, url: str, screenshot: Any, uuid: str | None = None):
+        frame = super().__new__(cls, url)
+        frame.screenshot = screenshot
+        frame.uuid = uuid
+        return frame
+
+    def read(self) -> bytes:
+        return self.screenshot.read()
+
+    @property
+    def image(self):
+        return getattr(self.screenshot, "image", None)
+
+
+@dataclass(frozen=True)
+class PreprocessConfig:
+    """How to shrink a screenshot before it is uploaded to the VLM.
+
+    `crop` is a region of interest as ``(left, top, right, bottom)`` fractions of
+    the frame, applied before the `max_dim` downscale. `format=None` re-encodes
+    as JPEG once any transform is applied and sends lossless PNG otherwise.
+    """
+
+    max_dim: int | None = None
+    crop: tuple[float, float, float, float] | None = None
+    format: str | None = None
+    quality: int = 80
+
+    @property
+    def is_noop(self) -> bool:
+        return self.max_dim is None and self.crop is None and self.format is None
+
+
+def parse_crop(value: str | None, presets: dict[str, tuple[float, float, float, float]] | None = None):
+    """Parse a `--vlm_crop` value: a preset name or ``left,top,right,bottom`` fractions."""
+    if not value:
+        return None
+    if presets and value in presets:
+        return presets[value]
+    parts = tuple(float(part) for part in value.split(","))
+    if len(parts) != 4 or not all(0.0 <= part <= 1.0 for part in parts) or parts[0] >= parts[2] or parts[1] >= parts[3]:
+        raise ValueError(f"Invalid crop '{value}': expected a preset or left,top,right,bottom fractions in [0, 1]")
+    return parts
+
+
+def _sniff_mime(data: bytes) -> str:
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def _scratch_buffer() -> io.BytesIO:
+    buffer = getattr(_scratch, "buffer", None)
+    if buffer is None:
+        buffer = _scratch.buffer = io.BytesIO()
+    buffer.seek(0)
+    buffer.truncate()
+    return buffer
+
+
+def encode_pil(image: PILImageLib.Image, format: str = "PNG", **save_kwargs) -> EncodedImage:
+    """Encode a PIL image in memory using this thread's reusable scratch buffer."""
+    format = format.upper()
+    start = time.perf_counter()
+    if format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffer = _scratch_buffer()
+    image.save(buffer, format=format, **save_kwargs)
+    data = buffer.getvalue()
+    return EncodedImage(
+        data=data,
+        mime=_MIME_BY_FORMAT[format],
+        size=image.size,
+        encode_s=time.perf_counter() - start,
+    )
+
+
+def _preprocess(image: Any, config: PreprocessConfig) -> EncodedImage:
+    start = time.perf_counter()
+    pil = to_pil(image)
+    original_size = pil.size
+    # Size the unprocessed upload would have had. An oagi image's `read()` is cached, but a raw
+    # PIL image has no encoded form, and encoding the full frame just to log its size would defeat the point
+    if isinstance(image, EncodedImage):
+        original_bytes = len(image.data)
+    elif isinstance(image, str):
+        original_bytes = os.path.getsize(image)
+    elif hasattr(image, "read"):
+        original_bytes = len(image.read())
+    else:
+        original_bytes = None
+
+    if config.crop:
+        left, top, right, bottom = config.crop
+        width, height = pil.size
+        pil = pil.crop((round(left * width), round(top * height), round(right * width), round(bottom * height)))
+    if config.max_dim and max(pil.size) > config.max_dim:
+        scale = config.max_dim / max(pil.size)
+        target = (max(1, round(pil.width * scale)), max(1, round(pil.height * scale)))
+        pil = pil.resize(target, PILImageLib.BILINEAR, reducing_gap=2.0)
+
+    format = (config.format or "JPEG").upper()
+    save_kwargs = {} if format == "PNG" else {"quality": config.quality}
+    encoded = encode_pil(pil, format, **save_kwargs)
+    encoded.encode_s = time.perf_counter() - start
+    encoded.original_size = original_size
+    encoded.original_bytes = original_bytes
+    return encoded
+
+
+def encode_image(image: Any, format: str | None = None, preprocess: PreprocessConfig | None = None) -> EncodedImage:
+    """Encode a screenshot for a VLM request.
+
+    Accepts an `EncodedImage` (returned as is), an oagi `Image` such as the
+    `PILImage` returned by `AsyncScreenshotMaker`, a raw PIL image, or a file path.
+    With `format=None` the frame is encoded as lossless PNG at its own
+    resolution. ``format="native"`` instead reuses the bytes an oagi image
+    already encoded for Lux (`read()` is cached, typically a downscaled JPEG),
+    so no extra compression is paid. A non-trivial `preprocess` config crops,
+    downscales and re-encodes first.
+    """
+    if isinstance(image, UploadedFrame):
+        image = image.screenshot
+    if preprocess is not None and not preprocess.is_noop:
+        if preprocess.format is None and format not in (None, "native"):
+            preprocess = replace(preprocess, format=format)
+        return _preprocess(image, preprocess)
+    if isinstance(image, EncodedImage):
+        return image
+    if isinstance(image, str):
+        start = time.perf_counter()
+        with open(image, "rb") as f:
+            data = f.read()
+        with PILImageLib.open(io.BytesIO(data)) as probe:
+            size = probe.size
+        return EncodedImage(data=data, mime=_sniff_mime(data), size=size, encode_s=time.perf_counter() - start)
+
+    pil = getattr(image, "image", image)
+    if format == "native" and hasattr(image, "read"):
+        start = time.perf_counter()
+        data = image.read()
+        size = getattr(pil, "size", (0, 0))
+        return EncodedImage(data=data, mime=_sniff_mime(data), size=size, encode_s=time.perf_counter() - start)
+    if not isinstance(pil, PILImageLib.Image):
+        pil = to_pil(image)
+    return encode_pil(pil, "PNG" if format in (None, "native") else format)
+
+
+def to_pil(image: Any) -> PILImageLib.Image:
+    """Return the PIL image behind a screenshot, decoding encoded bytes only when needed."""
+    if isinstance(image, UploadedFrame):
+        image = image.screenshot
+    if isinstance(image, PILImageLib.Image):
+        return image
+    if isinstance(image, EncodedImage):
+        return PILImageLib.open(io.BytesIO(image.data))
+    if isinstance(image, str):
+        return PILImageLib.open(image)
+    pil = getattr(image, "image", None)
+    if isinstance(pil, PILImageLib.Image):
+        return pil
+    return PILImageLib.open(io.BytesIO(image.read()))
+
+
+def perceptual_hash(image: Any, hash_size: int = 16) -> int:
+    """Difference hash (dHash) of a screenshot as a `hash_size * hash_size`-bit integer.
+
+    Pixel-identical and visually near-identical frames get hashes within a few
+    bits of each other, while a page change flips a large share of the bits.
+    """
+    small = to_pil(image).convert("L").resize((hash_size + 1, hash_size), PILImageLib.BILINEAR)
+    pixels = small.tobytes()
+    width = hash_size + 1
+    value = 0
+    for row in range(hash_size):
+        offset = row * width
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def structural_similarity(a: PILImageLib.Image, b: PILImageLib.Image, block: int = 8) -> float:
+    """Mean SSIM of two same-size grayscale images over non-overlapping `block` x `block` windows.
+
+    Meant for small thumbnails: it runs in pure Python, so a 128x72 pair costs
+    a few milliseconds.
+    """
+    if a.size != b.size:
+        raise ValueError(f"Image sizes differ: {a.size} vs {b.size}")
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    width, height = a.size
+    pa, pb = a.tobytes(), b.tobytes()
+    n = block * block
+    total = 0.0
+    windows = 0
+    for top in range(0, height - block + 1, block):
+        for left in range(0, width - block + 1, block):
+            sa = sb = saa = sbb = sab = 0
+            for row in range(top, top + block):
+                offset = row * width + left
+                for x, y in zip(pa[offset:offset + block], pb[offset:offset + block]):
+                    sa += x
+                    sb += y
+                    saa += x * x
+                    sbb += y * y
+                    sab += x * y
+            mean_a, mean_b = sa / n, sb / n
+            var_a = saa / n - mean_a * mean_a
+            var_b = sbb / n - mean_b * mean_b
+            cov = sab / n - mean_a * mean_b
+            total += ((2 * mean_a * mean_b + c1) * (2 * cov + c2)) / (
+                (mean_a * mean_a + mean_b * mean_b + c1) * (var_a + var_b + c2)
+            )
+            windows += 1
+    return total / windows if windows else 1.0
@@ -0,0 +1,311 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from oagi.client import AsyncClient
+from oagi.types import PlanEvent, SplitEvent, StepEvent
+
+from .async_engine import percentile
+from .imaging import UploadedFrame
+from .settle import StabilityActionHandler, changed_fraction, thumbnail
+from .tracing import trace_span
+from .wrappers import ActionHandlerWrapper, ImageProviderWrapper
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    """How `PipelinedImageProvider` prepares the next frame while the agent is busy.
+
+    `lead_s` before the post-action delay ends, a frame is captured, encoded and
+    uploaded in the background. When the delay is over, a check frame is
+    captured; if its `thumb_size` thumbnail matches the early one (at most
+    `diff_threshold` of the pixels differ by more than `pixel_threshold`
+    levels), the agent gets the already uploaded frame. A frame handed out is
+    handed out again for `max_age_s` as long as no action ran in between.
+    """
+
+    lead_s: float = 0.4
+    max_age_s: float = 1.5
+    diff_threshold: float = 0.002
+    pixel_threshold: int = 12
+    thumb_size: tuple[int, int] = (160, 90)
+
+
+@dataclass
+class PipelineStats:
+    frames: int = 0
+    uploads: int = 0
+    upload_s: float = 0.0
+    upload_errors: int = 0
+    # Speculative frames the check frame confirmed, and ones uploaded for nothing
+    speculative_hits: int = 0
+    speculative_misses: int = 0
+    reused: int = 0
+    stale: int = 0
+
+
+class PipelinedImageProvider(ImageProviderWrapper):
+    """Image provider that hands the agent screenshots it has already encoded and uploaded.
+
+    Every frame is encoded once (the bytes are cached on the screenshot, so the
+    history reuses them) and uploaded to Lux; the agent gets an
+    `UploadedFrame`, which the SDK sends as a URL instead of uploading again.
+    `PipelinedActionHandler` calls `prefetch` as soon as an action batch has
+    run, so the post-action wait, the capture and the upload overlap with the
+    agent's own bookkeeping; under a fixed post-action delay the upload starts
+    `PipelineConfig.lead_s` before the delay ends.
+    """
+
+    def __init__(self, provider, api_key: str | None = None, base_url: str | None = None, config: PipelineConfig | None = None):
+        super().__init__(provider)
+        self.pipeline = config or PipelineConfig()
+        self.stats = PipelineStats()
+        self.api_key = api_key
+        self.base_url = base_url
+        self._client: AsyncClient | None = None
+        self._next: asyncio.Task | None = None
+        self._settling: asyncio.Task | None = None
+        self._last: Any = None
+        self._last_at = 0.0
+        self._acted = True
+        # Recently handed-out frames by URL, so observers can swap the URL back for the bytes
+        self._by_url: OrderedDict[str, UploadedFrame] = OrderedDict()
+
+    def _ensure_client(self) -> AsyncClient:
+        if self._client is None:
+            self._client = AsyncClient(base_url=self.base_url, api_key=self.api_key)
+        return self._client
+
+    async def _upload(self, image) -> Any:
+        """Encode and upload `image`; on failure the raw screenshot goes back and the agent uploads it itself."""
+        start = time.perf_counter()
+        try:
+            with trace_span("upload", "capture"):
+                data = await asyncio.to_thread(image.read)
+                response = await self._ensure_client().put_s3_presigned_url(data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats.upload_errors += 1
+            logger.warning(f"Screenshot pre-upload failed, the agent will upload it: {e}")
+            return image
+        self.stats.uploads += 1
+        self.stats.upload_s += time.perf_counter() - start
+        return UploadedFrame(response.download_url, image, response.uuid)
+
+    async def _fresh(self) -> tuple[Any, float]:
+        image = await self.provider()
+        captured_at = time.perf_counter()
+        return await self._upload(image), captured_at
+
+    def _same(self, a, b) -> bool:
+        config = self.pipeline
+        fraction = changed_fraction(thumbnail(a, config.thumb_size), thumbnail(b, config.thumb_size), config.pixel_threshold)
+        return fraction <= config.diff_threshold
+
+    async def _speculate(self, settle, delay_s: float) -> tuple[Any, float]:
+        self._settling = asyncio.create_task(settle)
+        lead_s = min(self.pipeline.lead_s, delay_s)
+        await asyncio.wait({self._settling}, timeout=delay_s - lead_s)
+        if self._settling.done() or lead_s <= 0:
+            # Settled early (e.g. a browser that reports idle): nothing left to overlap
+            await self._settling
+            return await self._fresh()
+
+        early = await self.provider()
+        upload = asyncio.create_task(self._upload(early))
+        try:
+            await self._settling
+            check = await self.provider()
+            captured_at = time.perf_counter()
+            same = await asyncio.to_thread(self._same, early, check)
+        except BaseException:
+            upload.cancel()
+            raise
+        if same:
+            self.stats.speculative_hits += 1
+            return await upload, captured_at
+        self.stats.speculative_misses += 1
+        upload.cancel()
+        return await self._upload(check), captured_at
+
+    def prefetch(self, settle=None, delay_s: float = 0.0) -> None:
+        """Start preparing the frame the agent will ask for next, after `settle` (a coroutine) if given."""
+        self._next = asyncio.create_task(self._speculate(settle, delay_s) if settle is not None else self._fresh())
+
+    async def action_started(self) -> None:
+        """Wait out the previous batch's settle and drop frames captured before this batch."""
+        if self._settling is not None:
+            await asyncio.gather(self._settling, return_exceptions=True)
+            self._settling = None
+        if self._next is not None:
+            self._next.cancel()
+            await asyncio.gather(self._next, return_exceptions=True)
+            self._next = None
+        self._acted = True
+
+    async def __call__(self):
+        self.stats.frames += 1
+        now = time.perf_counter()
+        if self._next is not None:
+            task, self._next = self._next, None
+            frame, captured_at = await task
+            self._settling = None
+            if time.perf_counter() - captured_at > self.pipeline.max_age_s:
+                self.stats.stale += 1
+                frame, captured_at = await self._fresh()
+        elif not self._acted and self._last is not None and now - self._last_at <= self.pipeline.max_age_s:
+            self.stats.reused += 1
+            return self._last
+        else:
+            frame, captured_at = await self._fresh()
+        self._last, self._last_at, self._acted = frame, captured_at, False
+        if isinstance(frame, UploadedFrame):
+            self._by_url[str(frame)] = frame
+            while len(self._by_url) > 8:
+                self._by_url.popitem(last=False)
+        return frame
+
+    def lookup(self, url: str) -> UploadedFrame | None:
+        return self._by_url.get(url)
+
+    async def aclose(self) -> None:
+        for task in (self._settling, self._next):
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(t for t in (self._settling, self._next) if t is not None), return_exceptions=True)
+        self._settling = self._next = None
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+class PipelinedActionHandler(ActionHandlerWrapper):
+    """Runs each action batch, then lets `PipelinedImageProvider` settle and capture in the background.
+
+    Like other wrappers it owns the post-action delay, except over a
+    `StabilityActionHandler`, which keeps it; the stable-screen polling then
+    runs inside the prefetch instead.
+    """
+
+    def __init__(self, handler, provider: PipelinedImageProvider):
+        self.provider = provider
+        self.detects_settle = isinstance(handler, StabilityActionHandler)
+        if self.detects_settle:
+            self.handler = handler
+            self.config = handler.config
+        else:
+            super().__init__(handler)
+
+    async def __call__(self, actions) -> None:
+        await self.provider.action_started()
+        if self.detects_settle:
+            await self.handler(actions)
+            self.provider.prefetch()
+        else:
+            await self.execute(actions)
+            self.provider.prefetch(self.settle(actions), self.config.post_batch_delay)
+
+
+@dataclass
+class StepLatency:
+    # Seconds between consecutive actor steps of a todo: capture, upload, inference, actions and settle
+    step_s: list[float] = field(default_factory=list)
+
+    def summary(self) -> dict[str, float]:
+        if not self.step_s:
+            return {}
+        return {
+            "steps": len(self.step_s),
+            "mean_s": round(sum(self.step_s) / len(self.step_s), 3),
+            "p50_s": round(percentile(self.step_s, 50), 3),
+            "p95_s": round(percentile(self.step_s, 95), 3),
+        }
+
+
+class PipelineObserver:
+    """Observer that times each step and swaps pre-uploaded frame URLs back for their bytes.
+
+    Installed with or without pipelining, so both modes report the same
+    per-step latency. Intervals broken by planning (a todo start or a
+    reflection) are not counted.
+    """
+
+    def __init__(self, inner=None, provider: PipelinedImageProvider | None = None):
+        self.inner = inner
+        self.provider = provider
+        self.latency = StepLatency()
+        self._last_step: float | None = None
+
+    async def on_event(self, event) -> None:
+        if isinstance(event, StepEvent):
+            now = time.perf_counter()
+            if self._last_step is not None:
+                self.latency.step_s.append(now - self._last_step)
+            self._last_step = now
+        elif isinstance(event, (SplitEvent, PlanEvent)):
+            self._last_step = None
+        image = getattr(event, "image", None)
+        if self.provider is not None and isinstance(image, str):
+            frame = self.provider.lookup(image)
+            if frame is not None:
+                event = event.model_copy(update={"image": await asyncio.to_thread(frame.read)})
+        if self.inner is not None:
+            await self.inner.on_event(event)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+def pipeline(config: PipelineConfig | None, observer, image_provider, action_handler, api_key: str | None = None, base_url: str | None = None):
+    """Wrap the trio for pipelined steps; with `config` None only the step timing is added.
+
+    Apply last, after `instrument` and `stabilize`.
+    """
+    if config is None:
+        return PipelineObserver(observer), image_provider, action_handler
+    provider = PipelinedImageProvider(image_provider, api_key, base_url, config)
+    return PipelineObserver(observer, provider), provider, PipelinedActionHandler(action_handler, provider)
+
+
+def add_pipeline_arguments(parser) -> None:
+    parser.add_argument("--pipeline", action="store_true", help="Capture, encode and upload the next screenshot while the last action settles")
+    parser.add_argument("--pipeline_lead", type=float, default=0.4, help="Seconds before the post-action delay ends to start the early capture")
+    parser.add_argument("--pipeline_max_age", type=float, default=1.5, help="Seconds a frame may be handed out again while no action runs")
+
+
+def pipeline_config(args) -> PipelineConfig | None:
+    """`PipelineConfig` from `add_pipeline_arguments` options, or None without ``--pipeline``."""
+    if not args.pipeline:
+        return None
+    return PipelineConfig(lead_s=args.pipeline_lead, max_age_s=args.pipeline_max_age)
+
+
+async def close_pipeline(image_provider) -> None:
+    if isinstance(image_provider, PipelinedImageProvider):
+        await image_provider.aclose()
+
+
+def print_pipeline_stats(observer) -> None:
+    if not isinstance(observer, PipelineObserver):
+        return
+    latency = observer.latency.summary()
+    mode = "pipelined" if observer.provider is not None else "sequential"
+    if latency:
+        print(
+            f"🚀 Step latency ({mode}): {latency['steps']} steps, mean {latency['mean_s'] * 1000:.0f} ms, "
+            f"p50 {latency['p50_s'] * 1000:.0f} ms, p95 {latency['p95_s'] * 1000:.0f} ms"
+        )
+    if observer.provider is None:
+        return
+    stats = observer.provider.stats
+    uploads = f"{stats.uploads} uploads in {stats.upload_s:.1f}s" + (f", {stats.upload_errors} failed" if stats.upload_errors else "")
+    print(
+        f"   Pipeline: {stats.frames} frames, {uploads}; early frames used {stats.speculative_hits}, "
+        f"discarded {stats.speculative_misses}; {stats.reused} frames reused, {stats.stale} prefetched frames too old"
+    )
@@ -0,0 +1,69 @@
+import asyncio
+import multiprocessing
+import time
+
+from .wrappers import ImageProviderWrapper
+
+
+class SharedTokenBucket:
+    """Token bucket whose state lives in shared memory, so one limit covers many worker processes.
+
+    Create it in the parent with the multiprocessing context used to start the
+    workers and pass it to them as a process argument.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0, ctx=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        ctx = ctx or multiprocessing.get_context()
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._lock = ctx.Lock()
+        self._tokens = ctx.Value("d", self.burst, lock=False)
+        # CLOCK_MONOTONIC is system-wide on Linux, so timestamps compare across processes
+        self._updated = ctx.Value("d", time.monotonic(), lock=False)
+
+    def _try_take(self) -> float:
+        """Take a token if one is available; otherwise return how long to wait for one."""
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self.burst, self._tokens.value + (now - self._updated.value) * self.rate)
+            self._updated.value = now
+            if tokens >= 1.0:
+                self._tokens.value = tokens - 1.0
+                return 0.0
+            self._tokens.value = tokens
+            return (1.0 - tokens) / self.rate
+
+    def acquire(self) -> float:
+        """Block until a token is available; returns the seconds spent waiting."""
+        waited = 0.0
+        while (delay := self._try_take()) > 0:
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    async def acquire_async(self) -> float:
+        waited = 0.0
+        while (delay := self._try_take()) > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+        return waited
+
+
+class RateLimitedImageProvider(ImageProviderWrapper):
+    """Wrap an image provider so every capture first takes a token from `bucket`.
+
+    Each tasker step, plan and reflection starts with a screenshot and is followed
+    by a Lux request, so throttling captures throttles Lux traffic without
+    touching the agent's HTTP client.
+    """
+
+    def __init__(self, provider, bucket: SharedTokenBucket):
+        super().__init__(provider)
+        self.bucket = bucket
+        self.waited_s = 0.0
+
+    async def __call__(self):
+        self.waited_s += await self.bucket.acquire_async()
+        return await self.provider()
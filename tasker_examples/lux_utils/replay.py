@@ -0,0 +1,507 @@
+import asyncio
+import glob
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any
+
+import httpx
+from oagi.constants import DEFAULT_STEP_DELAY
+from PIL import Image as PILImageLib
+
+from .imaging import encode_image
+from .wrappers import ActionHandlerWrapper, ImageProviderWrapper
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LUX_URL = "https://api.agiopen.org"
+
+# Endpoints the tasker talks to; everything else gets a 404 from the stand-in
+_UPLOAD = "/v1/file/upload"
+_GENERATE = "/v1/generate"
+_CHAT = "/v1/chat/completions"
+_BLOBS = "/blobs/"
+
+
+def exchange_key(path: str, body: dict) -> str:
+    """Which response stream a request belongs to: one per planner worker, one for actor steps."""
+    if path == _GENERATE:
+        return f"generate:{body.get('external_worker_id')}"
+    return "chat"
+
+
+def request_signature(path: str, body: dict) -> dict[str, Any]:
+    """The parts of a request that should match between a recording and its replay."""
+    if path == _GENERATE:
+        return {"todo": body.get("overall_todo"), "todo_index": body.get("current_todo_index")}
+    return {"messages": len(body.get("messages", []))}
+
+
+class Recording:
+    """A recorded run on disk: screenshots, Lux request/response pairs and executed actions.
+
+    Layout under `path`::
+
+        frames/000000.jpg ...   every screenshot, in capture order
+        exchanges.jsonl         one Lux request/response pair per line
+        actions.jsonl           one executed action batch per line
+
+    Files are appended as the run goes, so a crashed run still leaves a usable prefix.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.frames_dir = os.path.join(path, "frames")
+        self._lock = threading.Lock()
+        self._frame_count = 0
+
+    def create(self) -> "Recording":
+        os.makedirs(self.frames_dir, exist_ok=True)
+        for name in ("exchanges.jsonl", "actions.jsonl"):
+            open(os.path.join(self.path, name), "w").close()
+        for stale in glob.glob(os.path.join(self.frames_dir, "*")):
+            os.remove(stale)
+        return self
+
+    def _append(self, name: str, record: dict) -> None:
+        with self._lock, open(os.path.join(self.path, name), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def add_frame(self, image) -> str:
+        encoded = encode_image(image, format="native")
+        with self._lock:
+            index = self._frame_count
+            self._frame_count += 1
+        path = os.path.join(self.frames_dir, f"{index:06d}{encoded.extension}")
+        encoded.save(path)
+        return path
+
+    def add_exchange(self, key: str, path: str, request: dict, status: int, response: Any, latency_s: float) -> None:
+        self._append("exchanges.jsonl", {
+            "key": key,
+            "path": path,
+            "signature": request_signature(path, request),
+            "request": request,
+            "status": status,
+            "response": response,
+            "latency_s": round(latency_s, 4),
+        })
+
+    def add_actions(self, actions) -> None:
+        self._append("actions.jsonl", {"actions": [action.model_dump(mode="json") for action in actions]})
+
+    def _read_jsonl(self, name: str) -> list[dict]:
+        path = os.path.join(self.path, name)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def frames(self) -> list[str]:
+        return sorted(glob.glob(os.path.join(self.frames_dir, "*")))
+
+    def exchanges(self) -> list[dict]:
+        return self._read_jsonl("exchanges.jsonl")
+
+    def actions(self) -> list[dict]:
+        return self._read_jsonl("actions.jsonl")
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, delayed ACKs add ~40 ms per response
+    disable_nagle_algorithm = True
+    server: "_StandInServer"
+
+    def log_message(self, format, *args) -> None:
+        logger.debug(format % args)
+
+    def _send_json(self, status: int, payload: Any, request_id: str | None = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Request-ID", request_id or f"replay-{uuid.uuid4().hex[:12]}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self) -> None:
+        stand_in = self.server.stand_in
+        if self.path.split("?")[0] == _UPLOAD:
+            if stand_in.recording_mode:
+                stand_in.forward(self, "GET", _UPLOAD, None)
+            else:
+                self._send_json(200, stand_in.fake_upload())
+            return
+        self._send_json(404, {"error": {"code": "not_found", "message": self.path}})
+
+    def do_PUT(self) -> None:
+        # Screenshot uploads to the fake presigned URL; the bytes are already in the recording
+        self._read_body()
+        if self.path.startswith(_BLOBS):
+            if self.server.stand_in.upload_latency_s > 0:
+                time.sleep(self.server.stand_in.upload_latency_s)
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._send_json(404, {"error": {"code": "not_found", "message": self.path}})
+
+    def do_POST(self) -> None:
+        stand_in = self.server.stand_in
+        path = self.path.split("?")[0]
+        body = self._read_body()
+        if path not in (_GENERATE, _CHAT):
+            self._send_json(404, {"error": {"code": "not_found", "message": self.path}})
+            return
+        request = json.loads(body or b"{}")
+        if stand_in.recording_mode:
+            stand_in.forward(self, "POST", path, request)
+            return
+        status, response = stand_in.next_response(path, request)
+        self._send_json(status, response)
+
+
+class _StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, stand_in: "LuxStandIn"):
+        super().__init__(address, _StandInHandler)
+        self.stand_in = stand_in
+
+
+class LuxStandIn:
+    """Local HTTP server that speaks the subset of the Lux API `TaskerAgent` uses.
+
+    In record mode it proxies planner (``/v1/generate``) and actor
+    (``/v1/chat/completions``) calls to `upstream` and appends each
+    request/response pair to `recording`. In replay mode it answers them from the
+    recording instead, one stream per planner worker and one for actor steps, and
+    accepts screenshot uploads without storing them. `latency_scale` sleeps for
+    that fraction of each recorded model latency (0 replays as fast as possible);
+    `upload_latency_s` is slept on every screenshot upload.
+    """
+
+    def __init__(
+        self,
+        recording: Recording,
+        upstream: str | None = None,
+        latency_scale: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        upload_latency_s: float = 0.0,
+    ):
+        self.recording = recording
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.latency_scale = latency_scale
+        self.upload_latency_s = upload_latency_s
+        self.served = 0
+        self.divergences = 0
+        self.exhausted = 0
+        self._queues: dict[str, list[dict]] = {}
+        self._queue_lock = threading.Lock()
+        self._server = _StandInServer((host, port), self)
+        self._thread: threading.Thread | None = None
+        self._http: httpx.Client | None = None
+
+    @property
+    def recording_mode(self) -> bool:
+        return self.upstream is not None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "LuxStandIn":
+        if self.recording_mode:
+            self._http = httpx.Client(timeout=120.0)
+        else:
+            self.rewind()
+        self._thread = threading.Thread(target=self._server.serve_forever, name="lux-stand-in", daemon=True)
+        self._thread.start()
+        logger.info(f"Lux stand-in ({'record' if self.recording_mode else 'replay'}) listening on {self.base_url}")
+        return self
+
+    def rewind(self) -> None:
+        """Serve the recording again from its first response."""
+        queues: dict[str, list[dict]] = {}
+        for exchange in self.recording.exchanges():
+            queues.setdefault(exchange["key"], []).append(exchange)
+        with self._queue_lock:
+            self._queues = queues
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+
+    def __enter__(self) -> "LuxStandIn":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def fake_upload(self) -> dict[str, Any]:
+        file_id = str(uuid.uuid4())
+        expires_at = int(time.time()) + 3600
+        return {
+            "url": f"{self.base_url}{_BLOBS}{file_id}?upload=1",
+            "uuid": file_id,
+            "expires_at": expires_at,
+            "file_expires_at": expires_at,
+            "download_url": f"{self.base_url}{_BLOBS}{file_id}.jpg",
+        }
+
+    def next_response(self, path: str, request: dict) -> tuple[int, Any]:
+        key = exchange_key(path, request)
+        with self._queue_lock:
+            queue = self._queues.get(key)
+            exchange = queue.pop(0) if queue else None
+            if exchange is None:
+                self.exhausted += 1
+            else:
+                self.served += 1
+                if exchange["signature"] != request_signature(path, request):
+                    self.divergences += 1
+                    logger.warning(f"Replay diverged on {key}: recorded {exchange['signature']}, got {request_signature(path, request)}")
+        if exchange is None:
+            return 404, {"error": {"code": "replay_exhausted", "message": f"No recorded response left for {key}"}}
+        if self.latency_scale > 0:
+            time.sleep(exchange["latency_s"] * self.latency_scale)
+        return exchange["status"], exchange["response"]
+
+    def forward(self, handler: _StandInHandler, method: str, path: str, request: dict | None) -> None:
+        headers = {
+            name: value
+            for name, value in handler.headers.items()
+            if name.lower() in ("authorization", "x-api-key", "x-api-version", "content-type") or name.lower().startswith("x-sdk")
+        }
+        start = time.perf_counter()
+        try:
+            response = self._http.request(method, f"{self.upstream}{path}", json=request, headers=headers)
+        except httpx.HTTPError as e:
+            handler._send_json(502, {"error": {"code": "upstream_error", "message": str(e)}})
+            return
+        latency_s = time.perf_counter() - start
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {"error": {"code": "invalid_upstream_response", "message": response.text[:200]}}
+        if request is not None:
+            self.recording.add_exchange(exchange_key(path, request), path, request, response.status_code, payload, latency_s)
+        handler._send_json(response.status_code, payload, response.headers.get("x-request-id"))
+
+
+class RecordingImageProvider(ImageProviderWrapper):
+    """Save every screenshot the agent captures into a `Recording`."""
+
+    def __init__(self, provider, recording: Recording):
+        super().__init__(provider)
+        self.recording = recording
+
+    async def __call__(self):
+        image = await self.provider()
+        # `read()` is cached on the image, so the agent's own upload reuses these bytes
+        await asyncio.to_thread(self.recording.add_frame, image)
+        return image
+
+
+class RecordingActionHandler(ActionHandlerWrapper):
+    """Append every executed action batch to a `Recording`."""
+
+    def __init__(self, handler, recording: Recording):
+        super().__init__(handler)
+        self.recording = recording
+
+    async def execute(self, actions) -> None:
+        self.recording.add_actions(actions)
+        await super().execute(actions)
+
+
+class RecordedFrame:
+    """A recorded screenshot; `read()` returns the bytes the agent originally uploaded."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self._image: PILImageLib.Image | None = None
+
+    def read(self) -> bytes:
+        return self.data
+
+    @property
+    def image(self) -> PILImageLib.Image:
+        if self._image is None:
+            self._image = PILImageLib.open(io.BytesIO(self.data))
+        return self._image
+
+
+class ReplayImageProvider:
+    """Serve recorded screenshots in capture order, repeating the last one once they run out."""
+
+    def __init__(self, recording: Recording):
+        self.paths = recording.frames()
+        if not self.paths:
+            raise ValueError(f"Recording at {recording.path} has no frames")
+        self.index = 0
+        self._last: RecordedFrame | None = None
+
+    def _load(self, path: str) -> RecordedFrame:
+        with open(path, "rb") as f:
+            return RecordedFrame(f.read())
+
+    async def __call__(self) -> RecordedFrame:
+        path = self.paths[min(self.index, len(self.paths) - 1)]
+        self.index += 1
+        self._last = await asyncio.to_thread(self._load, path)
+        return self._last
+
+    async def last_image(self) -> RecordedFrame:
+        return self._last if self._last is not None else await self()
+
+    def set_target_screen(self, screen) -> None:
+        pass
+
+
+class ReplayActionHandler:
+    """No-op action handler that checks each batch against the recorded actions.
+
+    Nothing is executed; the post-action delay is still honoured, and
+    `LuxSession.agent_kwargs` scales it with the replay latency.
+    """
+
+    def __init__(self, recording: Recording):
+        self.expected = [[action["type"] for action in batch["actions"]] for batch in recording.actions()]
+        self.config = SimpleNamespace(post_batch_delay=0.0)
+        self.calls = 0
+        self.mismatches = 0
+
+    async def __call__(self, actions) -> None:
+        types = [action.type.value for action in actions]
+        expected = self.expected[self.calls] if self.calls < len(self.expected) else None
+        if types != expected:
+            self.mismatches += 1
+            logger.warning(f"Replayed action batch {self.calls} was {types}, recorded {expected}")
+        self.calls += 1
+        if self.config.post_batch_delay > 0:
+            await asyncio.sleep(self.config.post_batch_delay)
+
+    def reset(self) -> None:
+        pass
+
+    def set_target_screen(self, screen) -> None:
+        pass
+
+
+class LuxSession:
+    """Live, record or replay mode for an example script, chosen by `--record` / `--replay`.
+
+    Live mode changes nothing. Record mode starts a recording proxy in front of
+    the real Lux API and wraps the desktop image provider and action handler.
+    Replay mode starts the stand-in server on a recording and swaps the desktop
+    for `ReplayImageProvider` / `ReplayActionHandler`, so no network, display or
+    API key is needed.
+    """
+
+    def __init__(self, record_dir: str = "", replay_dir: str = "", latency_scale: float = 0.0):
+        if record_dir and replay_dir:
+            raise ValueError("--record and --replay are mutually exclusive")
+        self.replaying = bool(replay_dir)
+        self.recording = Recording(record_dir or replay_dir) if (record_dir or replay_dir) else None
+        self.stand_in: LuxStandIn | None = None
+        self.image_provider: ReplayImageProvider | None = None
+        self.action_handler: ReplayActionHandler | None = None
+        if record_dir:
+            self.recording.create()
+            self.stand_in = LuxStandIn(self.recording, upstream=os.getenv("OAGI_BASE_URL", DEFAULT_LUX_URL))
+        elif replay_dir:
+            self.stand_in = LuxStandIn(self.recording, latency_scale=latency_scale)
+
+    @classmethod
+    def from_args(cls, args) -> "LuxSession":
+        return cls(args.record, args.replay, args.replay_latency)
+
+    @property
+    def base_url(self) -> str:
+        if self.stand_in is not None:
+            return self.stand_in.base_url
+        return os.getenv("OAGI_BASE_URL", DEFAULT_LUX_URL)
+
+    @property
+    def api_key(self) -> str | None:
+        # The stand-in ignores the key, but the oagi client refuses to start without one
+        return os.getenv("OAGI_API_KEY") or ("replay" if self.replaying else None)
+
+    def agent_kwargs(self) -> dict[str, Any]:
+        """Connection arguments for `TaskerAgent`; replays also scale the post-action delay."""
+        kwargs = {"api_key": self.api_key, "base_url": self.base_url}
+        if self.replaying:
+            kwargs["step_delay"] = DEFAULT_STEP_DELAY * self.stand_in.latency_scale
+        return kwargs
+
+    def start(self) -> "LuxSession":
+        if self.stand_in is not None:
+            self.stand_in.start()
+        return self
+
+    def stop(self) -> None:
+        if self.stand_in is not None:
+            self.stand_in.stop()
+
+    def io(self, make_image_provider, make_action_handler):
+        """Return the (image_provider, action_handler) pair for this mode.
+
+        The factories are only called outside replay, so desktop handlers (and
+        pyautogui, which needs a display at import time) stay unloaded in replay.
+        """
+        if self.replaying:
+            self.image_provider = ReplayImageProvider(self.recording)
+            self.action_handler = ReplayActionHandler(self.recording)
+            return self.image_provider, self.action_handler
+        image_provider, action_handler = make_image_provider(), make_action_handler()
+        if self.recording is not None:
+            return RecordingImageProvider(image_provider, self.recording), RecordingActionHandler(action_handler, self.recording)
+        return image_provider, action_handler
+
+    def rewind(self) -> None:
+        """Start the replay over, so a long-lived process can run the recording once per job."""
+        if not self.replaying:
+            return
+        self.stand_in.rewind()
+        if self.image_provider is not None:
+            self.image_provider.index = 0
+        if self.action_handler is not None:
+            self.action_handler.calls = 0
+
+    def report(self) -> None:
+        if self.recording is None:
+            return
+        if not self.replaying:
+            print(f"📼 Recorded run to: {self.recording.path}")
+            return
+        print(
+            f"📼 Replayed {self.stand_in.served} Lux responses from {self.recording.path} "
+            f"({self.stand_in.divergences} diverged, {self.stand_in.exhausted} missing, "
+            f"{self.action_handler.mismatches if self.action_handler else 0} action mismatches)"
+        )
+
+
+def add_replay_arguments(parser) -> None:
+    parser.add_argument("--record", type=str, default="", help="Record screenshots, Lux exchanges and actions to this directory")
+    parser.add_argument("--replay", type=str, default="", help="Replay a recording offline through a local stand-in Lux server")
+    parser.add_argument(
+        "--replay_latency", type=float, default=0.0,
+        help="Fraction of each recorded Lux latency to sleep during replay (0 = as fast as possible)",
+    )
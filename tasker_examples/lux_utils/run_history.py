@@ -0,0 +1,492 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Iterator
+
+from .artifacts import read_manifest
+from .async_engine import percentile
+from .checkpoint import CHECKPOINT_FILE
+
+logger = logging.getLogger(__name__)
+
+RUN_RECORD = "run.json"
+# History entries that are the planner talking (or a cached replay), not a model step acting on the screen
+_PLANNER_ACTIONS = {"plan", "reflect", "summary", "error", "trajectory_replay"}
+_ARTIFACT_EXTENSIONS = {".html", ".png", ".jpg", ".jpeg", ".webp", ".json", ".jsonl", ".parquet"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    workflow TEXT NOT NULL,
+    exp_name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    wall_s REAL,
+    success INTEGER NOT NULL,
+    error TEXT,
+    todos INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    pending INTEGER NOT NULL,
+    in_progress INTEGER NOT NULL,
+    skipped INTEGER NOT NULL,
+    params TEXT NOT NULL,
+    record_mtime REAL NOT NULL,
+    ingested_at REAL NOT NULL,
+    partial INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_runs_workflow ON runs (workflow, started_at);
+CREATE TABLE IF NOT EXISTS todos (
+    run_id TEXT NOT NULL,
+    todo_index INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    status TEXT NOT NULL,
+    steps INTEGER NOT NULL,
+    actions INTEGER NOT NULL,
+    duration_s REAL,
+    PRIMARY KEY (run_id, todo_index)
+);
+CREATE INDEX IF NOT EXISTS idx_todos_description ON todos (description);
+CREATE TABLE IF NOT EXISTS steps (
+    run_id TEXT NOT NULL,
+    todo_index INTEGER NOT NULL,
+    step INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    duration_s REAL,
+    actions TEXT NOT NULL,
+    PRIMARY KEY (run_id, todo_index, step)
+);
+CREATE TABLE IF NOT EXISTS vlm_results (
+    run_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    answer TEXT,
+    stage TEXT,
+    duration_s REAL,
+    PRIMARY KEY (run_id, name)
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    run_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    PRIMARY KEY (run_id, name)
+);
+"""
+
+
+def _timestamp(value: str) -> float:
+    return datetime.fromisoformat(value).timestamp()
+
+
+def summarize_history(memory_state: dict[str, Any]) -> list[dict[str, Any]]:
+    """Per-todo step counts and step timings from a serialized `PlannerMemory`.
+
+    A step is one model call: the actions it returned share a screenshot. A
+    step lasts until the next history entry (step, reflection or summary), so
+    its time covers executing and settling its actions, the next capture and
+    the next model call. Todo time runs from the plan to the summary.
+    """
+    histories: dict[int, list[dict[str, Any]]] = {}
+    for history in memory_state.get("history", []):
+        histories.setdefault(history["todo_index"], []).extend(history["actions"])
+    todos = []
+    for index, todo in enumerate(memory_state.get("todos", [])):
+        entries = histories.get(index, [])
+        times = [_timestamp(entry["timestamp"]) for entry in entries]
+        steps: list[dict[str, Any]] = []
+        for entry, at in zip(entries, times):
+            if entry["action_type"] in _PLANNER_ACTIONS:
+                steps.append({"boundary": True, "started_at": at})
+                continue
+            last = steps[-1] if steps else None
+            if last and not last.get("boundary") and entry.get("screenshot_uuid") and entry.get("screenshot_uuid") == last["uuid"]:
+                last["actions"].append(entry["action_type"])
+                continue
+            steps.append({"uuid": entry.get("screenshot_uuid"), "started_at": at, "actions": [entry["action_type"]]})
+        timed = []
+        for current, following in zip(steps, steps[1:] + [None]):
+            if current.get("boundary"):
+                continue
+            duration = following["started_at"] - current["started_at"] if following else None
+            timed.append({"started_at": current["started_at"], "duration_s": duration, "actions": current["actions"]})
+        todos.append({
+            "index": index,
+            "description": todo["description"],
+            "status": todo["status"],
+            "steps": timed,
+            "actions": sum(len(step["actions"]) for step in timed),
+            "duration_s": times[-1] - times[0] if len(times) > 1 else None,
+        })
+    return todos
+
+
+def write_run_record(
+    save_dir: str,
+    workflow: str,
+    memory,
+    success: bool,
+    started_at: datetime,
+    wall_s: float,
+    error: str | None = None,
+    vlm_results: dict[str, Any] | None = None,
+    vlm_timings: dict[str, dict[str, Any]] | None = None,
+    params: dict[str, Any] | None = None,
+    exp_name: str | None = None,
+    partial: bool = False,
+) -> str:
+    """Write ``run.json`` to `save_dir`: what `ingest` indexes. Returns its path.
+
+    `exp_name` defaults to the directory name. A `partial` run covers only part
+    of its workflow (one shard of a suite): its todos count towards the
+    per-todo stats, but it is left out of the workflow-level ones.
+    """
+    state = {
+        "todos": [todo.model_dump(mode="json") for todo in memory.todos],
+        "history": [history.model_dump(mode="json") for history in memory.history],
+    }
+    record = {
+        "workflow": workflow,
+        "exp_name": exp_name or os.path.basename(os.path.normpath(save_dir)),
+        "partial": bool(partial),
+        "started_at": started_at.isoformat(),
+        "wall_s": round(wall_s, 3),
+        "success": bool(success),
+        "error": error,
+        "todo_status": {status.value: count for status, count in memory.get_todo_status_summary().items()},
+        "todos": summarize_history(state),
+        "vlm_results": {
+            name: {"answer": answer, **(vlm_timings or {}).get(name, {})}
+            for name, answer in (vlm_results or {}).items()
+        },
+        "params": params or {},
+    }
+    os.makedirs(save_dir, exist_ok=True)
+    path = os.path.join(save_dir, RUN_RECORD)
+    fd, tmp_path = tempfile.mkstemp(dir=save_dir, prefix=".tmp-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _record_from_checkpoint(run_dir: str) -> dict[str, Any]:
+    """A run record for a directory from before ``run.json``, rebuilt from its checkpoint.
+
+    Checkpoints are saved after completed todos only, so a todo that failed is
+    missing its steps, and the run's wall time is unknown.
+    """
+    with open(os.path.join(run_dir, CHECKPOINT_FILE), "r", encoding="utf-8") as f:
+        state = json.load(f)
+    memory = state["memory"]
+    todos = summarize_history(memory)
+    status: dict[str, int] = {}
+    for todo in todos:
+        status[todo["status"]] = status.get(todo["status"], 0) + 1
+    extra = state.get("extra") or {}
+    first = min((step["started_at"] for todo in todos for step in todo["steps"]), default=state["saved_at"])
+    exp_name = os.path.basename(os.path.normpath(run_dir))
+    return {
+        "workflow": exp_name,
+        "exp_name": exp_name,
+        "started_at": datetime.fromtimestamp(first).isoformat(),
+        "wall_s": None,
+        "success": status.get("completed", 0) == len(todos),
+        "error": None,
+        "todo_status": status,
+        "todos": todos,
+        "vlm_results": {
+            name: {"answer": answer, **extra.get("qa_timings", {}).get(name, {})}
+            for name, answer in extra.get("qa_result", {}).items()
+        },
+        "params": {},
+    }
+
+
+def _artifacts(run_dir: str) -> list[tuple[str, str, int]]:
+    """(name, path, bytes) for the files a run left next to its record, and its store manifest entries."""
+    found = []
+    for name in sorted(os.listdir(run_dir)):
+        path = os.path.join(run_dir, name)
+        if os.path.isfile(path) and os.path.splitext(name)[1].lower() in _ARTIFACT_EXTENSIONS and name != RUN_RECORD:
+            found.append((name, os.path.abspath(path), os.path.getsize(path)))
+    manifest = read_manifest(run_dir)
+    for name, entry in manifest["artifacts"].items():
+        found.append((name, os.path.join(manifest["store"], entry["blob"]), entry["bytes"]))
+    return found
+
+
+def iter_run_dirs(root: str) -> Iterator[str]:
+    """Directories under `root` holding a run record or, for older runs, a checkpoint."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        # A streamed history holds one file per event; runs never nest inside it
+        dirnames[:] = [name for name in dirnames if name not in ("history", "blobs")]
+        if RUN_RECORD in filenames or CHECKPOINT_FILE in filenames:
+            yield dirpath
+
+
+class RunHistory:
+    """SQLite index of finished runs: per-run outcome, per-todo steps and time, per-step timings,
+    VLM results and artifact paths.
+
+    Runs are identified by directory and start time, so a directory reused by
+    the next run of the same ``exp_name`` becomes a new run; re-ingesting an
+    unchanged record is a no-op.
+    """
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(_SCHEMA)
+        # Indexes created before runs were marked partial
+        if "partial" not in {row[1] for row in self._conn.execute("PRAGMA table_info(runs)")}:
+            self._conn.execute("ALTER TABLE runs ADD COLUMN partial INTEGER NOT NULL DEFAULT 0")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def ingest_dir(self, run_dir: str) -> bool:
+        """Index the run in `run_dir`; returns False if it was already indexed unchanged."""
+        record_path = os.path.join(run_dir, RUN_RECORD)
+        if not os.path.exists(record_path):
+            record_path = os.path.join(run_dir, CHECKPOINT_FILE)
+        mtime = os.path.getmtime(record_path)
+        if record_path.endswith(RUN_RECORD):
+            with open(record_path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        else:
+            record = _record_from_checkpoint(run_dir)
+        path = os.path.abspath(run_dir)
+        started_at = _timestamp(record["started_at"])
+        run_id = hashlib.sha1(f"{path}|{record['started_at']}".encode("utf-8")).hexdigest()[:16]
+        row = self._conn.execute("SELECT record_mtime FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is not None and row[0] == mtime:
+            return False
+
+        status = record["todo_status"]
+        with self._conn:
+            for table in ("runs", "todos", "steps", "vlm_results", "artifacts"):
+                self._conn.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+            self._conn.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id, record["workflow"], record["exp_name"], path, started_at, record["wall_s"],
+                    int(record["success"]), record["error"], len(record["todos"]),
+                    status.get("completed", 0), status.get("pending", 0), status.get("in_progress", 0), status.get("skipped", 0),
+                    json.dumps(record["params"], ensure_ascii=False, default=str), mtime, time.time(),
+                    int(record.get("partial", False)),
+                ),
+            )
+            for todo in record["todos"]:
+                self._conn.execute(
+                    "INSERT INTO todos VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, todo["index"], todo["description"], todo["status"], len(todo["steps"]), todo["actions"], todo["duration_s"]),
+                )
+                self._conn.executemany(
+                    "INSERT INTO steps VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (run_id, todo["index"], step_number, step["started_at"], step["duration_s"], ",".join(step["actions"]))
+                        for step_number, step in enumerate(todo["steps"], 1)
+                    ],
+                )
+            self._conn.executemany(
+                "INSERT INTO vlm_results VALUES (?, ?, ?, ?, ?)",
+                [
+                    (run_id, name, json.dumps(result.get("answer"), ensure_ascii=False, default=str), result.get("stage"), result.get("vlm_s"))
+                    for name, result in record["vlm_results"].items()
+                ],
+            )
+            self._conn.executemany("INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?)", [(run_id, *artifact) for artifact in _artifacts(run_dir)])
+        return True
+
+    def ingest(self, root: str) -> dict[str, int]:
+        indexed, unchanged, failed = 0, 0, 0
+        for run_dir in iter_run_dirs(root):
+            try:
+                if self.ingest_dir(run_dir):
+                    indexed += 1
+                else:
+                    unchanged += 1
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping {run_dir}: {e}")
+                failed += 1
+        return {"indexed": indexed, "unchanged": unchanged, "failed": failed}
+
+    def _run_filter(self, workflow: str = "", since: float | None = None, until: float | None = None, exp_glob: str = "") -> tuple[str, list[Any]]:
+        clauses, values = ["1 = 1"], []
+        if workflow:
+            clauses.append("r.workflow = ?")
+            values.append(workflow)
+        if since is not None:
+            clauses.append("r.started_at >= ?")
+            values.append(since)
+        if until is not None:
+            clauses.append("r.started_at < ?")
+            values.append(until)
+        if exp_glob:
+            clauses.append("r.exp_name GLOB ?")
+            values.append(exp_glob)
+        return " AND ".join(clauses), values
+
+    def workflow_stats(self, **selector) -> dict[str, dict[str, Any]]:
+        where, values = self._run_filter(**selector)
+        rows = self._conn.execute(
+            f"SELECT r.workflow, r.success, r.wall_s, (SELECT SUM(t.steps) FROM todos t WHERE t.run_id = r.run_id) "
+            f"FROM runs r WHERE {where} AND r.partial = 0",
+            values,
+        ).fetchall()
+        grouped: dict[str, list[tuple]] = {}
+        for workflow, *rest in rows:
+            grouped.setdefault(workflow, []).append(tuple(rest))
+        return {workflow: _stats([(success, wall, steps) for success, wall, steps in runs]) for workflow, runs in sorted(grouped.items())}
+
+    def todo_stats(self, **selector) -> dict[tuple[str, str], dict[str, Any]]:
+        where, values = self._run_filter(**selector)
+        rows = self._conn.execute(
+            f"SELECT r.workflow, t.description, t.status = 'completed', t.duration_s, t.steps "
+            f"FROM todos t JOIN runs r ON r.run_id = t.run_id WHERE {where} AND t.status != 'pending' "
+            f"ORDER BY r.workflow, t.todo_index",
+            values,
+        ).fetchall()
+        grouped: dict[tuple[str, str], list[tuple]] = {}
+        for workflow, description, *rest in rows:
+            grouped.setdefault((workflow, description), []).append(tuple(rest))
+        return {key: _stats(samples) for key, samples in grouped.items()}
+
+
+def _stats(samples: list[tuple[Any, float | None, int | None]]) -> dict[str, Any]:
+    """Success rate and latency/step percentiles of (success, seconds, steps) samples."""
+    seconds = [s for _, s, _ in samples if s is not None]
+    steps = [n for _, _, n in samples if n is not None]
+    return {
+        "runs": len(samples),
+        "success_rate": sum(bool(ok) for ok, _, _ in samples) / len(samples),
+        "p50_s": percentile(seconds, 50) if seconds else None,
+        "p95_s": percentile(seconds, 95) if seconds else None,
+        "p50_steps": percentile(steps, 50) if steps else None,
+        "p95_steps": percentile(steps, 95) if steps else None,
+    }
+
+
+def find_regressions(
+    baseline: dict[Any, dict[str, Any]],
+    candidate: dict[Any, dict[str, Any]],
+    min_runs: int = 3,
+    latency_ratio: float = 1.2,
+    success_drop: float = 0.1,
+) -> list[dict[str, Any]]:
+    """Keys whose candidate runs are slower, take more steps or succeed less than baseline runs.
+
+    Only keys with at least `min_runs` runs on both sides are compared.
+    Latency and steps regress when the candidate p50 or p95 exceeds
+    `latency_ratio` times the baseline; success when its rate falls by more
+    than `success_drop`.
+    """
+    flagged = []
+    for key, new in candidate.items():
+        old = baseline.get(key)
+        if old is None or old["runs"] < min_runs or new["runs"] < min_runs:
+            continue
+        reasons = []
+        for metric in ("p50_s", "p95_s", "p50_steps", "p95_steps"):
+            if old[metric] and new[metric] is not None and new[metric] > old[metric] * latency_ratio:
+                reasons.append(f"{metric} {old[metric]:.1f} -> {new[metric]:.1f}")
+        if old["success_rate"] - new["success_rate"] > success_drop:
+            reasons.append(f"success {old['success_rate']:.0%} -> {new['success_rate']:.0%}")
+        if reasons:
+            flagged.append({"key": key, "reasons": reasons, "baseline": old, "candidate": new})
+    return flagged
+
+
+def _format(value: float | None, suffix: str = "") -> str:
+    return "-" if value is None else f"{value:.1f}{suffix}"
+
+
+def _print_table(title: str, stats: dict[Any, dict[str, Any]]) -> None:
+    print(f"\n{title}")
+    print(f"{'runs':>6}{'success':>9}{'p50 s':>9}{'p95 s':>9}{'p50 steps':>11}{'p95 steps':>11}  name")
+    for key, s in stats.items():
+        name = " / ".join(key) if isinstance(key, tuple) else key
+        print(
+            f"{s['runs']:>6}{s['success_rate']:>9.0%}{_format(s['p50_s']):>9}{_format(s['p95_s']):>9}"
+            f"{_format(s['p50_steps']):>11}{_format(s['p95_steps']):>11}  {name[:90]}"
+        )
+
+
+def _parse_date(text: str) -> float:
+    return datetime.fromisoformat(text).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index finished runs into SQLite and report latency, success and regressions")
+    parser.add_argument("--db", default="results/run_history.db", help="SQLite index file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Index every run directory (run.json or checkpoint.json) under the given roots")
+    ingest_parser.add_argument("roots", nargs="+")
+    report_parser = subparsers.add_parser("report", help="Success and latency percentiles per workflow and per todo")
+    report_parser.add_argument("--workflow", default="", help="Only this workflow")
+    report_parser.add_argument("--days", type=float, default=0, help="Only runs started in the last N days (0 = all)")
+    report_parser.add_argument("--no_todos", action="store_true", help="Workflow table only")
+    compare_parser = subparsers.add_parser("compare", help="Flag workflows and todos that regressed between two sets of runs")
+    compare_parser.add_argument("--workflow", default="", help="Only this workflow")
+    compare_parser.add_argument("--split", default="", help="ISO date: baseline runs started before it, candidate runs on or after")
+    compare_parser.add_argument("--days", type=float, default=7, help="Without --split: candidate = last N days, baseline = the N days before")
+    compare_parser.add_argument("--baseline_exp", default="", help="Instead of dates, baseline runs whose exp_name matches this glob")
+    compare_parser.add_argument("--candidate_exp", default="", help="Candidate runs whose exp_name matches this glob")
+    compare_parser.add_argument("--min_runs", type=int, default=3, help="Runs needed on each side to compare")
+    compare_parser.add_argument("--latency_ratio", type=float, default=1.2, help="Flag p50/p95 time or steps above this multiple of the baseline")
+    compare_parser.add_argument("--success_drop", type=float, default=0.1, help="Flag success-rate drops larger than this")
+    compare_parser.add_argument("--fail_on_regression", action="store_true", help="Exit with status 1 if anything is flagged")
+    args = parser.parse_args()
+
+    history = RunHistory(args.db)
+    try:
+        if args.command == "ingest":
+            for root in args.roots:
+                counts = history.ingest(root)
+                print(f"{root}: {counts['indexed']} runs indexed, {counts['unchanged']} unchanged, {counts['failed']} failed")
+        elif args.command == "report":
+            since = (datetime.now() - timedelta(days=args.days)).timestamp() if args.days else None
+            _print_table("Workflows", history.workflow_stats(workflow=args.workflow, since=since))
+            if not args.no_todos:
+                _print_table("Todos (time from plan to summary; pending todos excluded)", history.todo_stats(workflow=args.workflow, since=since))
+        else:
+            if args.baseline_exp or args.candidate_exp:
+                baseline_sel = {"exp_glob": args.baseline_exp or "*"}
+                candidate_sel = {"exp_glob": args.candidate_exp or "*"}
+            else:
+                split = _parse_date(args.split) if args.split else time.time() - args.days * 86400
+                baseline_sel = {"until": split, "since": None if args.split else split - args.days * 86400}
+                candidate_sel = {"since": split}
+            flagged = []
+            for level, method in (("workflow", history.workflow_stats), ("todo", history.todo_stats)):
+                flagged += [
+                    {"level": level, **item}
+                    for item in find_regressions(
+                        method(workflow=args.workflow, **baseline_sel),
+                        method(workflow=args.workflow, **candidate_sel),
+                        args.min_runs, args.latency_ratio, args.success_drop,
+                    )
+                ]
+            for item in flagged:
+                name = " / ".join(item["key"]) if isinstance(item["key"], tuple) else item["key"]
+                print(
+                    f"⚠️  {item['level']} {name[:90]}: {'; '.join(item['reasons'])} "
+                    f"({item['baseline']['runs']} vs {item['candidate']['runs']} runs)"
+                )
+            print(f"{len(flagged)} regressions flagged")
+            if flagged and args.fail_on_regression:
+                sys.exit(1)
+    finally:
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import asyncio
+import time
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from oagi.types import ActionType
+from PIL import Image as PILImageLib
+from PIL import ImageChops
+
+from .imaging import to_pil
+from .tracing import trace_span
+from .wrappers import ActionHandlerWrapper, ImageProviderWrapper
+
+
+@dataclass(frozen=True)
+class StabilityConfig:
+    """How `StableScreenProvider` decides the screen has settled after an action.
+
+    Frames are compared as `thumb_size` grayscale thumbnails; two frames are the
+    same when at most `diff_threshold` of the thumbnail pixels differ by more
+    than `pixel_threshold` levels. `stable_frames` identical frames in a row
+    count as settled.
+    """
+
+    min_wait_s: float = 0.2
+    poll_interval_s: float = 0.1
+    stable_frames: int = 2
+    timeout_s: float = 5.0
+    # After a batch of only `wait` actions, keep polling this long for the screen to change
+    unchanged_timeout_s: float = 3.0
+    diff_threshold: float = 0.002
+    pixel_threshold: int = 12
+    thumb_size: tuple[int, int] = (160, 90)
+
+
+@dataclass
+class StabilityStats:
+    settles: int = 0
+    polls: int = 0
+    timeouts: int = 0
+    settle_s: float = 0.0
+    # What the fixed post-action delay and `wait` actions would have cost
+    blind_wait_s: float = 0.0
+    unchanged_waits: int = 0
+    steps_skipped: int = 0
+
+    @property
+    def wait_saved_s(self) -> float:
+        return self.blind_wait_s - self.settle_s
+
+    def as_dict(self) -> dict[str, Any]:
+        stats = asdict(self)
+        stats["settle_s"] = round(self.settle_s, 2)
+        stats["blind_wait_s"] = round(self.blind_wait_s, 2)
+        stats["wait_saved_s"] = round(self.wait_saved_s, 2)
+        return stats
+
+
+def thumbnail(image: Any, size: tuple[int, int]) -> PILImageLib.Image:
+    return to_pil(image).convert("L").resize(size, PILImageLib.BILINEAR)
+
+
+def changed_fraction(a: PILImageLib.Image, b: PILImageLib.Image, pixel_threshold: int) -> float:
+    """Fraction of pixels that differ by more than `pixel_threshold` grey levels."""
+    histogram = ImageChops.difference(a, b).histogram()
+    return sum(histogram[pixel_threshold + 1:]) / (a.width * a.height)
+
+
+class StableScreenProvider(ImageProviderWrapper):
+    """Image provider that, after an action, polls until the screen stops changing.
+
+    `StabilityActionHandler` calls `action_done` instead of sleeping a fixed
+    delay; the next capture then polls frames every `poll_interval_s` and hands
+    the agent the first frame of a stable run (or the latest one at
+    `timeout_s`). Screenshots are only encoded when the agent uploads them, so
+    discarded polls cost a capture and a thumbnail, not a JPEG encode.
+
+    If the action batch was only `wait` and the settled screen is the one the
+    agent already saw, asking the model again would just produce another wait,
+    so polling continues until the screen changes or `unchanged_timeout_s`.
+    """
+
+    def __init__(self, provider, config: StabilityConfig | None = None):
+        super().__init__(provider)
+        self.stability = config or StabilityConfig()
+        self.stats = StabilityStats()
+        self._pending_wait_s: float | None = None
+        self._expect_change = False
+        self._last_thumb: PILImageLib.Image | None = None
+
+    def action_done(self, blind_wait_s: float, expect_change: bool = False) -> None:
+        self._pending_wait_s = blind_wait_s
+        self._expect_change = expect_change
+
+    def _same(self, a: PILImageLib.Image, b: PILImageLib.Image) -> bool:
+        return changed_fraction(a, b, self.stability.pixel_threshold) <= self.stability.diff_threshold
+
+    async def _capture(self):
+        image = await self.provider()
+        self.stats.polls += 1
+        return image, await asyncio.to_thread(thumbnail, image, self.stability.thumb_size)
+
+    async def _wait_until_stable(self, deadline: float):
+        image, thumb = await self._capture()
+        stable = 1
+        while stable < self.stability.stable_frames:
+            if time.perf_counter() >= deadline:
+                self.stats.timeouts += 1
+                break
+            await asyncio.sleep(self.stability.poll_interval_s)
+            image, next_thumb = await self._capture()
+            stable = stable + 1 if self._same(thumb, next_thumb) else 1
+            thumb = next_thumb
+        return image, thumb
+
+    async def __call__(self):
+        if self._pending_wait_s is None:
+            image = await self.provider()
+            self._last_thumb = await asyncio.to_thread(thumbnail, image, self.stability.thumb_size)
+            return image
+
+        start = time.perf_counter()
+        with trace_span("settle", "settle", mode="detect"):
+            await asyncio.sleep(self.stability.min_wait_s)
+            image, thumb = await self._wait_until_stable(start + self.stability.timeout_s)
+            if self._expect_change and self._last_thumb is not None and self._same(thumb, self._last_thumb):
+                self.stats.unchanged_waits += 1
+                deadline = time.perf_counter() + self.stability.unchanged_timeout_s
+                while time.perf_counter() < deadline and self._same(thumb, self._last_thumb):
+                    await asyncio.sleep(self.stability.poll_interval_s)
+                    image, thumb = await self._capture()
+                if not self._same(thumb, self._last_thumb):
+                    # The model would have been asked about an unchanged screen at least once
+                    self.stats.steps_skipped += 1
+                    image, thumb = await self._wait_until_stable(time.perf_counter() + self.stability.timeout_s)
+
+        self.stats.settles += 1
+        self.stats.settle_s += time.perf_counter() - start
+        self.stats.blind_wait_s += self._pending_wait_s
+        self._pending_wait_s = None
+        self._last_thumb = thumb
+        return image
+
+
+class StabilityActionHandler(ActionHandlerWrapper):
+    """Hands the post-action wait to a `StableScreenProvider` instead of sleeping.
+
+    The fixed post-action delay and the handler's own `wait` actions are both
+    skipped; the provider waits for the screen to settle before the next
+    capture. Wrap this outermost (after `instrument`) so it owns the
+    post-action delay the agent configures.
+    """
+
+    def __init__(self, handler, provider: StableScreenProvider):
+        super().__init__(handler)
+        self.provider = provider
+        self._skipped_wait_s = 0.0
+
+    async def execute(self, actions) -> None:
+        waits = [action for action in actions if action.type == ActionType.WAIT]
+        self._skipped_wait_s = len(waits) * getattr(self.config, "wait_duration", 1.0)
+        others = [action for action in actions if action.type != ActionType.WAIT]
+        if others:
+            await self.handler(others)
+
+    async def settle(self, actions) -> None:
+        only_waits = bool(actions) and all(action.type == ActionType.WAIT for action in actions)
+        self.provider.action_done(self.config.post_batch_delay + self._skipped_wait_s, expect_change=only_waits)
+
+
+def stabilize(config: StabilityConfig | None, image_provider, action_handler):
+    """Wrap the pair for screen-stability settling; no-op when `config` is None."""
+    if config is None:
+        return image_provider, action_handler
+    provider = StableScreenProvider(image_provider, config)
+    return provider, StabilityActionHandler(action_handler, provider)
+
+
+def print_stability_stats(image_provider) -> None:
+    # Wrappers applied after `stabilize` (e.g. `lux_utils.pipeline`) sit on top of it
+    while isinstance(image_provider, ImageProviderWrapper) and not isinstance(image_provider, StableScreenProvider):
+        image_provider = image_provider.provider
+    if not isinstance(image_provider, StableScreenProvider):
+        return
+    stats = image_provider.stats
+    print(
+        f"⏱️  Screen settle: {stats.settles} settles in {stats.settle_s:.1f}s vs {stats.blind_wait_s:.1f}s of fixed waits "
+        f"(saved {stats.wait_saved_s:.1f}s), {stats.timeouts} timeouts, {stats.steps_skipped} unchanged-screen steps skipped"
+    )
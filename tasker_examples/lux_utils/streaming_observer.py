@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import logging
+import os
+from typing import Iterator
+
+from oagi.agent.observer.exporters import _convert_events_for_html
+from oagi.types import LogEvent, ObserverEvent, SplitEvent
+from pydantic import TypeAdapter
+
+from .imaging import _sniff_mime, _EXTENSION_BY_MIME
+
+logger = logging.getLogger(__name__)
+
+_EVENT_ADAPTER = TypeAdapter(ObserverEvent)
+_TEMPLATE_PATH = os.path.join(os.path.dirname(_convert_events_for_html.__code__.co_filename), "report_template.html")
+# The stock template treats any image that is not a data:/http URL as inline base64;
+# teach it that ./ and ../ paths are files next to the report
+_TEMPLATE_IMAGE_CHECK = "event.image.startsWith('http')"
+_TEMPLATE_IMAGE_CHECK_PATCHED = "event.image.startsWith('http') || event.image.startsWith('./') || event.image.startsWith('../')"
+
+
+class StreamingObserver:
+    """Observer that streams events to disk instead of holding them in memory.
+
+    Each event is appended to ``<log_dir>/events.jsonl`` as it arrives, and its
+    screenshot bytes are written to ``<log_dir>/screenshots/`` first and replaced
+    by a relative path, so memory stays flat however long the run is. `export`
+    renders the report from the log, and `render_report` does the same for a
+    log left behind by a crashed run. Same `on_event` / `add_log` / `add_split`
+    / `export` surface as `AsyncAgentObserver`.
+    """
+
+    def __init__(self, log_dir: str, resume: bool = False):
+        self.log_dir = log_dir
+        self.screenshots_dir = os.path.join(log_dir, "screenshots")
+        self.events_path = os.path.join(log_dir, "events.jsonl")
+        os.makedirs(self.screenshots_dir, exist_ok=True)
+        self.count = 0
+        if resume and os.path.exists(self.events_path):
+            self.count = sum(1 for _ in iter_events(log_dir))
+        # Line-buffered, so every event reaches the OS as soon as it is written
+        self._log = open(self.events_path, "a" if resume else "w", encoding="utf-8", buffering=1)
+
+    def _write_image(self, data: bytes, name: str) -> str:
+        filename = name + _EXTENSION_BY_MIME.get(_sniff_mime(data), ".bin")
+        with open(os.path.join(self.screenshots_dir, filename), "wb") as f:
+            f.write(data)
+        return f"screenshots/{filename}"
+
+    async def on_event(self, event: ObserverEvent) -> None:
+        image = getattr(event, "image", None)
+        if isinstance(image, bytes):
+            name = f"{self.count:06d}_{event.type}"
+            event = event.model_copy(update={"image": await asyncio.to_thread(self._write_image, image, name)})
+        self._append(event)
+
+    def _append(self, event: ObserverEvent) -> None:
+        self._log.write(event.model_dump_json() + "\n")
+        self.count += 1
+
+    def add_log(self, message: str) -> None:
+        self._append(LogEvent(message=message))
+
+    def add_split(self, label: str = "") -> None:
+        self._append(SplitEvent(label=label))
+
+    def close(self) -> None:
+        if not self._log.closed:
+            self._log.close()
+
+    def export(self, format: str, path: str) -> None:
+        """Render the log as ``html`` (screenshots linked, not embedded) or copy it as ``jsonl``."""
+        self._log.flush()
+        format = format.lower()
+        if format == "html":
+            render_report(self.log_dir, path)
+        elif format == "jsonl":
+            with open(self.events_path, "r", encoding="utf-8") as src, open(path, "w", encoding="utf-8") as dst:
+                for line in src:
+                    dst.write(line)
+        else:
+            raise ValueError(f"StreamingObserver cannot export {format!r}; use html or jsonl")
+
+
+def iter_events(log_dir: str) -> Iterator[ObserverEvent]:
+    """Yield events from ``events.jsonl``, stopping at a line cut short by a crash."""
+    with open(os.path.join(log_dir, "events.jsonl"), "r", encoding="utf-8") as f:
+        for line_num, line in enumerate(f, start=1):
+            try:
+                yield _EVENT_ADAPTER.validate_json(line)
+            except ValueError:
+                logger.warning(f"Stopping at unreadable line {line_num} of {log_dir}/events.jsonl")
+                return
+
+
+def render_report(log_dir: str, path: str) -> int:
+    """Write the HTML report for a streamed log one event at a time; returns the number of events."""
+    return render_combined_report([("", log_dir)], path)
+
+
+def render_combined_report(sections: list[tuple[str, str]], path: str) -> int:
+    """Write one HTML report from several streamed logs, given as ``(label, log_dir)`` pairs.
+
+    Each non-empty label is shown as a split before its log's events.
+    """
+    with open(_TEMPLATE_PATH, "r", encoding="utf-8") as f:
+        template = f.read()
+    link_images = _TEMPLATE_IMAGE_CHECK in template
+    if link_images:
+        template = template.replace(_TEMPLATE_IMAGE_CHECK, _TEMPLATE_IMAGE_CHECK_PATCHED)
+    else:
+        logger.warning("Unrecognised report template; embedding screenshots instead of linking them")
+    head, tail = template.split("{EVENTS_DATA}", 1)
+
+    report_dir = os.path.dirname(os.path.abspath(path))
+    os.makedirs(report_dir, exist_ok=True)
+    count = 0
+    with open(path, "w", encoding="utf-8") as out:
+        out.write(head)
+        out.write("[")
+        for label, log_dir in sections:
+            events = iter_events(log_dir)
+            if label:
+                events = itertools.chain([SplitEvent(label=label)], events)
+            for event in events:
+                image = getattr(event, "image", None)
+                # Validation reads the stored path back as bytes, since the image fields accept both
+                if isinstance(image, bytes) and image.startswith(b"screenshots/"):
+                    path_ref = _image_ref(os.path.join(log_dir, image.decode("utf-8")), report_dir, link_images)
+                    event = event.model_copy(update={"image": path_ref})
+                for item in _convert_events_for_html([event]):
+                    out.write(("," if count else "") + json.dumps(item))
+                    count += 1
+        out.write("]")
+        out.write(tail)
+    return count
+
+
+def _image_ref(image_path: str, report_dir: str, link: bool) -> str:
+    if not link:
+        with open(image_path, "rb") as f:
+            data = f.read()
+        return f"data:{_sniff_mime(data)};base64,{base64.b64encode(data).decode('ascii')}"
+    relative = os.path.relpath(os.path.abspath(image_path), report_dir)
+    return relative if relative.startswith("..") else f"./{relative}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the HTML report for a streamed (possibly crashed) run")
+    parser.add_argument("log_dir", help="Directory holding events.jsonl and screenshots/")
+    parser.add_argument("output", nargs="?", default=None, help="Report path (default: <log_dir>/execution_history.html)")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(args.log_dir, "execution_history.html")
+    count = render_report(args.log_dir, output)
+    print(f"Rendered {count} events to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import json
+import os
+import re
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any
+
+from oagi.types import ActionEvent, PlanEvent, SplitEvent, StepEvent
+
+from .wrappers import ActionHandlerWrapper, ImageProviderWrapper
+
+_TODO_LABEL = re.compile(r"^(Start|End) of todo (\d+)")
+
+# One Chrome-trace row per phase so overlapping spans from different phases do not collide
+_LANES = {"todo": 1, "capture": 2, "lux": 3, "action": 4, "settle": 5, "vlm": 6}
+
+_active_tracer: "Tracer | None" = None
+
+
+class Tracer:
+    """Collects timed spans for a run and exports them as Chrome trace JSON and JSONL.
+
+    Spans carry the current todo index and step number so the summary can break
+    time down per todo and per phase (capture, lux, action, settle, vlm).
+    """
+
+    def __init__(self):
+        self.spans: list[dict[str, Any]] = []
+        self.todo_index: int | None = None
+        self.step: int = 0
+        self.last_mark: float | None = None
+        self._t0 = time.perf_counter()
+        self._todo_start: float | None = None
+        self._lock = threading.Lock()
+
+    def add(self, name: str, cat: str, start: float, end: float, **args) -> None:
+        span = {
+            "name": name,
+            "cat": cat,
+            "start_s": start - self._t0,
+            "dur_s": end - start,
+            "todo": self.todo_index,
+            "step": self.step,
+            "thread": threading.current_thread().name,
+            "args": args,
+        }
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, cat: str, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.add(name, cat, start, end, **args)
+            # Background VLM work must not move the marker the agent-loop phases are measured from
+            if cat != "vlm":
+                self.last_mark = end
+
+    def begin_todo(self, todo_index: int) -> None:
+        self.todo_index = todo_index
+        self.step = 0
+        self._todo_start = self.last_mark = time.perf_counter()
+
+    def end_todo(self) -> None:
+        if self._todo_start is not None:
+            self.add(f"todo {self.todo_index}", "todo", self._todo_start, time.perf_counter())
+        self._todo_start = None
+
+    def _chrome_events(self) -> list[dict[str, Any]]:
+        pid = os.getpid()
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": lane}}
+            for lane, tid in _LANES.items()
+        ]
+        vlm_threads: dict[str, int] = {}
+        for span in self.spans:
+            tid = _LANES.get(span["cat"], 0)
+            if span["cat"] == "vlm":
+                # Background VLM checks overlap each other; give every worker thread its own row
+                if span["thread"] not in vlm_threads:
+                    vlm_threads[span["thread"]] = 100 + len(vlm_threads)
+                    events.append({
+                        "name": "thread_name", "ph": "M", "pid": pid, "tid": vlm_threads[span["thread"]],
+                        "args": {"name": f"vlm {span['thread']}"},
+                    })
+                tid = vlm_threads[span["thread"]]
+            events.append({
+                "name": span["name"],
+                "cat": span["cat"],
+                "ph": "X",
+                "ts": round(span["start_s"] * 1e6),
+                "dur": round(span["dur_s"] * 1e6),
+                "pid": pid,
+                "tid": tid,
+                "args": {"todo": span["todo"], "step": span["step"], **span["args"]},
+            })
+        return events
+
+    def export_chrome(self, path: str) -> None:
+        """Write a trace loadable in chrome://tracing or Perfetto."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self._chrome_events(), "displayTimeUnit": "ms"}, f)
+
+    def export_jsonl(self, path: str) -> None:
+        """Write one span per line, followed by one summary line per phase."""
+        with open(path, "w", encoding="utf-8") as f:
+            for span in self.spans:
+                f.write(json.dumps({"type": "span", **span}, default=str) + "\n")
+            for cat, stats in self.summary().items():
+                f.write(json.dumps({"type": "summary", "cat": cat, **stats}) + "\n")
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        by_cat: dict[str, list[float]] = {}
+        for span in self.spans:
+            by_cat.setdefault(span["cat"], []).append(span["dur_s"])
+        result = {}
+        for cat, durations in sorted(by_cat.items()):
+            durations.sort()
+            result[cat] = {
+                "count": len(durations),
+                "total_s": round(sum(durations), 3),
+                "mean_s": round(statistics.mean(durations), 3),
+                "p50_s": round(durations[len(durations) // 2], 3),
+                "p95_s": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 3),
+            }
+        return result
+
+
+def set_tracer(tracer: Tracer | None) -> None:
+    """Make `tracer` the one `trace_span` records into (e.g. from `analyze_screenshot`)."""
+    global _active_tracer
+    _active_tracer = tracer
+
+
+def get_tracer() -> Tracer | None:
+    return _active_tracer
+
+
+@contextmanager
+def trace_span(name: str, cat: str, **args):
+    """Record a span on the active tracer, or do nothing when tracing is off."""
+    if _active_tracer is None:
+        yield
+        return
+    with _active_tracer.span(name, cat, **args):
+        yield
+
+
+class TracedImageProvider(ImageProviderWrapper):
+    def __init__(self, provider, tracer: Tracer):
+        super().__init__(provider)
+        self.tracer = tracer
+
+    async def __call__(self):
+        with self.tracer.span("screenshot", "capture"):
+            return await self.provider()
+
+
+class TracedActionHandler(ActionHandlerWrapper):
+    def __init__(self, handler, tracer: Tracer):
+        super().__init__(handler)
+        self.tracer = tracer
+
+    async def execute(self, actions) -> None:
+        types = ",".join(action.type.value for action in actions)
+        with self.tracer.span("actions", "action", actions=types, count=len(actions)):
+            await super().execute(actions)
+
+    async def settle(self, actions) -> None:
+        with self.tracer.span("settle", "settle", delay_s=self.config.post_batch_delay):
+            await super().settle(actions)
+
+
+class TracingObserver:
+    """Observer that turns agent events into Lux inference spans, then forwards them.
+
+    Planner and actor calls are not exposed by `TaskerAgent`, so a Lux span runs
+    from the previous traced phase (usually the screenshot capture) to the event
+    the agent emits once the model has answered.
+    """
+
+    def __init__(self, tracer: Tracer, inner=None):
+        self.tracer = tracer
+        self.inner = inner
+
+    async def on_event(self, event) -> None:
+        now = time.perf_counter()
+        start = self.tracer.last_mark if self.tracer.last_mark is not None else now
+        if isinstance(event, SplitEvent):
+            match = _TODO_LABEL.match(event.label)
+            if match and match.group(1) == "Start":
+                self.tracer.begin_todo(int(match.group(2)) - 1)
+            elif match:
+                self.tracer.end_todo()
+        elif isinstance(event, StepEvent):
+            self.tracer.step = event.step_num
+            actions = ",".join(action.type.value for action in event.step.actions)
+            self.tracer.add("lux step", "lux", start, now, actions=actions, stop=event.step.stop)
+            self.tracer.last_mark = now
+        elif isinstance(event, PlanEvent):
+            self.tracer.add(f"plan {event.phase}", "lux", start, now)
+            self.tracer.last_mark = now
+        elif isinstance(event, ActionEvent) and event.error:
+            self.tracer.add("action error", "action", now, now, error=event.error)
+        if self.inner is not None:
+            await self.inner.on_event(event)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+def instrument(tracer: Tracer | None, observer, image_provider, action_handler):
+    """Wrap the observer, image provider and action handler for tracing; no-op when `tracer` is None."""
+    if tracer is None:
+        return observer, image_provider, action_handler
+    set_tracer(tracer)
+    return (
+        TracingObserver(tracer, observer),
+        TracedImageProvider(image_provider, tracer),
+        TracedActionHandler(action_handler, tracer),
+    )
+
+
+def export_trace(tracer: Tracer | None, save_dir: str, prefix: str) -> None:
+    """Write `<prefix>_trace.json` (Chrome trace) and `<prefix>_trace.jsonl` and print the phase summary."""
+    if tracer is None:
+        return
+    chrome_path = os.path.join(save_dir, f"{prefix}_trace.json")
+    jsonl_path = os.path.join(save_dir, f"{prefix}_trace.jsonl")
+    tracer.export_chrome(chrome_path)
+    tracer.export_jsonl(jsonl_path)
+    print("\nLatency by phase:")
+    for cat, stats in tracer.summary().items():
+        print(
+            f"  {cat:<8} n={stats['count']:<4} total={stats['total_s']:.2f}s "
+            f"mean={stats['mean_s']:.3f}s p95={stats['p95_s']:.3f}s"
+        )
+    print(f"📄 Trace exported to: {chrome_path}")
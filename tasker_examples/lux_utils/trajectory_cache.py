@@ -0,0 +1,310 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from oagi.agent.tasker import TaskerAgent
+from oagi.agent.tasker.models import Action as HistoryAction
+from oagi.agent.tasker.models import ExecutionResult
+from oagi.handler.utils import configure_handler_delay, reset_handler
+from oagi.types import Action, ActionEvent, ActionType
+
+from .imaging import hamming_distance, perceptual_hash
+from .wrappers import ImageProviderWrapper
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trajectories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    todo_key TEXT NOT NULL,
+    todo TEXT NOT NULL,
+    start_hash TEXT NOT NULL,
+    steps TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    model_calls INTEGER NOT NULL,
+    model_s REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    replays INTEGER NOT NULL DEFAULT 0,
+    divergences INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_trajectories_todo ON trajectories (todo_key);
+"""
+
+# Batches with nothing to execute; storing them would only add a redundant screen check
+_NO_OP_ACTIONS = {ActionType.FINISH, ActionType.FAIL}
+
+
+@dataclass
+class TrajectoryStep:
+    """One action batch and the fingerprint of the screen it should leave behind."""
+
+    actions: list[dict]
+    fingerprint: int | None = None
+
+
+@dataclass
+class Trajectory:
+    id: int
+    steps: list[TrajectoryStep]
+    summary: str
+    model_calls: int
+    model_s: float
+
+
+class TrajectoryCache:
+    """Persistent store of known-good action sequences, keyed by todo text and starting screen.
+
+    A trajectory matches when the todo text is identical and the perceptual hash
+    of the screen at the start of the todo is within `max_distance` bits of the
+    stored one. The same distance decides whether a replayed step left the
+    screen where the recorded run did. Trajectories that diverge
+    `max_divergences` times are dropped and re-learned from the model.
+    """
+
+    def __init__(self, path: str, max_distance: int = 6, max_divergences: int = 3, hash_size: int = 16):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_distance = max_distance
+        self.max_divergences = max_divergences
+        self.hash_size = hash_size
+        self.hits = 0
+        self.misses = 0
+        self.divergences = 0
+        self.model_calls_saved = 0
+        self.saved_s = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def _todo_key(todo: str) -> str:
+        return hashlib.sha256(todo.encode("utf-8")).hexdigest()
+
+    def fingerprint(self, image: Any) -> int:
+        return perceptual_hash(image, self.hash_size)
+
+    def matches(self, expected: int | None, actual: int) -> bool:
+        return expected is None or hamming_distance(expected, actual) <= self.max_distance
+
+    def lookup(self, todo: str, start_hash: int) -> Trajectory | None:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, start_hash, steps, summary, model_calls, model_s FROM trajectories WHERE todo_key = ?",
+                (self._todo_key(todo),),
+            ).fetchall()
+        best = None
+        for row_id, row_hash, steps, summary, model_calls, model_s in rows:
+            distance = hamming_distance(start_hash, int(row_hash, 16))
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, Trajectory(row_id, self._load_steps(steps), summary, model_calls, model_s))
+        if best is None:
+            self.misses += 1
+            return None
+        logger.debug(f"Trajectory cache match (distance {best[0]}) for todo: {todo[:60]}")
+        return best[1]
+
+    @staticmethod
+    def _load_steps(raw: str) -> list[TrajectoryStep]:
+        return [
+            TrajectoryStep(step["actions"], int(step["fingerprint"], 16) if step["fingerprint"] else None)
+            for step in json.loads(raw)
+        ]
+
+    def store(self, todo: str, start_hash: int, steps: list[TrajectoryStep], summary: str, model_calls: int, model_s: float) -> None:
+        """Save a successful model-driven run, replacing any trajectory for the same todo and start screen."""
+        steps = [step for step in steps if any(ActionType(a["type"]) not in _NO_OP_ACTIONS for a in step.actions)]
+        if not steps:
+            return
+        raw_steps = json.dumps([
+            {"actions": step.actions, "fingerprint": format(step.fingerprint, "x") if step.fingerprint is not None else None}
+            for step in steps
+        ])
+        now = time.time()
+        with self._lock:
+            for row_id, row_hash in self._conn.execute(
+                "SELECT id, start_hash FROM trajectories WHERE todo_key = ?", (self._todo_key(todo),)
+            ).fetchall():
+                if hamming_distance(start_hash, int(row_hash, 16)) <= self.max_distance:
+                    self._conn.execute("DELETE FROM trajectories WHERE id = ?", (row_id,))
+            self._conn.execute(
+                "INSERT INTO trajectories (todo_key, todo, start_hash, steps, summary, model_calls, model_s, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._todo_key(todo), todo, format(start_hash, "x"), raw_steps, summary, model_calls, model_s, now, now),
+            )
+            self._conn.commit()
+
+    def record_replay(self, trajectory: Trajectory, replay_s: float) -> None:
+        self.hits += 1
+        self.model_calls_saved += trajectory.model_calls
+        self.saved_s += max(trajectory.model_s - replay_s, 0.0)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE trajectories SET replays = replays + 1, last_used = ? WHERE id = ?", (time.time(), trajectory.id)
+            )
+            self._conn.commit()
+
+    def record_divergence(self, trajectory: Trajectory) -> None:
+        self.divergences += 1
+        with self._lock:
+            self._conn.execute("UPDATE trajectories SET divergences = divergences + 1 WHERE id = ?", (trajectory.id,))
+            self._conn.execute(
+                "DELETE FROM trajectories WHERE id = ? AND divergences >= ?", (trajectory.id, self.max_divergences)
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses + self.divergences
+        return {
+            "replayed": self.hits,
+            "misses": self.misses,
+            "divergences": self.divergences,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "model_calls_saved": self.model_calls_saved,
+            "model_seconds_saved": round(self.saved_s, 2),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class _RecordingImageProvider(ImageProviderWrapper):
+    """Counts captures and fingerprints the first screen after each recorded action batch."""
+
+    def __init__(self, provider, cache: TrajectoryCache, steps: list[TrajectoryStep]):
+        super().__init__(provider)
+        self.cache = cache
+        self.steps = steps
+        self.captures = 0
+
+    async def __call__(self):
+        image = await self.provider()
+        self.captures += 1
+        if self.steps and self.steps[-1].fingerprint is None:
+            self.steps[-1].fingerprint = await asyncio.to_thread(self.cache.fingerprint, image)
+        return image
+
+
+class _RecordingActionHandler:
+    """Pass-through proxy that notes each executed batch; the wrapped handler keeps its own settle delay."""
+
+    def __init__(self, handler, steps: list[TrajectoryStep]):
+        self.handler = handler
+        self.steps = steps
+
+    @property
+    def config(self):
+        return self.handler.config
+
+    def reset(self) -> None:
+        reset_handler(self.handler)
+
+    async def __call__(self, actions) -> None:
+        self.steps.append(TrajectoryStep([action.model_dump(mode="json") for action in actions]))
+        await self.handler(actions)
+
+    def __getattr__(self, name):
+        return getattr(self.handler, name)
+
+
+class TrajectoryCacheMixin:
+    """Adds trajectory caching to `TaskerAgent` (or a subclass such as `QATaskerAgent`).
+
+    Before a todo runs, the current screen is fingerprinted and looked up with
+    the todo text. A hit replays the stored action batches straight through the
+    action handler, checking the screen after each one; any divergence hands the
+    todo to the model from wherever the replay stopped. Model-driven todos that
+    succeed are recorded for next time. Mix in ahead of `TaskerAgent`.
+    """
+
+    def __init__(self, *args, trajectory_cache: TrajectoryCache | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.trajectory_cache = trajectory_cache
+
+    async def _execute_todo(self, todo_index: int, action_handler, image_provider) -> bool:
+        cache = self.trajectory_cache
+        if cache is None:
+            return await super()._execute_todo(todo_index, action_handler, image_provider)
+
+        todo = self.memory.todos[todo_index].description
+        start_hash = await asyncio.to_thread(cache.fingerprint, await image_provider())
+        trajectory = await asyncio.to_thread(cache.lookup, todo, start_hash)
+        if trajectory is not None:
+            start = time.perf_counter()
+            try:
+                replayed = await self._replay_trajectory(trajectory, action_handler, image_provider)
+            except Exception as e:
+                logger.warning(f"Trajectory replay of todo {todo_index} failed ({e}); falling back to the model")
+                replayed = False
+            if replayed:
+                cache.record_replay(trajectory, time.perf_counter() - start)
+                self._update_memory_from_execution(todo_index, self._replay_result(trajectory), True)
+                logger.info(f"Replayed todo {todo_index} from the trajectory cache ({len(trajectory.steps)} steps)")
+                return True
+            cache.record_divergence(trajectory)
+            # The model picks up from the diverged screen, so what it does next is not a clean trajectory
+            return await super()._execute_todo(todo_index, action_handler, image_provider)
+
+        steps: list[TrajectoryStep] = []
+        recording_provider = _RecordingImageProvider(image_provider, cache, steps)
+        start = time.perf_counter()
+        success = await super()._execute_todo(todo_index, _RecordingActionHandler(action_handler, steps), recording_provider)
+        model_s = time.perf_counter() - start
+        if success and steps:
+            if steps[-1].fingerprint is None:
+                steps[-1].fingerprint = await asyncio.to_thread(cache.fingerprint, await image_provider())
+            summary = self.current_taskee_agent.return_execution_results().summary
+            # Every plan, step and reflection starts with a capture; the summary call does not
+            model_calls = recording_provider.captures + 1
+            await asyncio.to_thread(cache.store, todo, start_hash, steps, summary, model_calls, model_s)
+        return success
+
+    async def _replay_trajectory(self, trajectory: Trajectory, action_handler, image_provider) -> bool:
+        cache = self.trajectory_cache
+        reset_handler(action_handler)
+        configure_handler_delay(action_handler, self.step_delay)
+        for step_num, step in enumerate(trajectory.steps, start=1):
+            actions = [Action.model_validate(action) for action in step.actions]
+            await action_handler(actions)
+            if self.step_observer:
+                await self.step_observer.on_event(ActionEvent(step_num=step_num, actions=actions))
+            actual = await asyncio.to_thread(cache.fingerprint, await image_provider())
+            if not cache.matches(step.fingerprint, actual):
+                logger.info(f"Trajectory replay diverged at step {step_num}/{len(trajectory.steps)}; falling back to the model")
+                return False
+        return True
+
+    @staticmethod
+    def _replay_result(trajectory: Trajectory) -> ExecutionResult:
+        action = HistoryAction(
+            timestamp=datetime.now().isoformat(),
+            action_type="trajectory_replay",
+            target=None,
+            reasoning=f"Replayed {len(trajectory.steps)} cached action batches",
+        )
+        return ExecutionResult(success=True, actions=[action], summary=trajectory.summary, total_steps=len(trajectory.steps))
+
+
+class CachedTaskerAgent(TrajectoryCacheMixin, TaskerAgent):
+    """`TaskerAgent` that takes a ``trajectory_cache=`` keyword."""
+
+
+def print_trajectory_stats(cache: TrajectoryCache | None) -> None:
+    if cache is None:
+        return
+    stats = cache.stats()
+    print(
+        f"🧭 Trajectory cache: {stats['replayed']} todos replayed, {stats['misses']} misses, "
+        f"{stats['divergences']} diverged; avoided {stats['model_calls_saved']} model calls "
+        f"and {stats['model_seconds_saved']}s"
+    )
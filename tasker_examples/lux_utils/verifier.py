@@ -0,0 +1,240 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from PIL import Image as PILImageLib
+
+from .imaging import encode_image, structural_similarity, to_pil
+
+logger = logging.getLogger(__name__)
+
+_AFFIRMATIVE = re.compile(r"^\W*yes\b", re.IGNORECASE)
+
+
+def is_affirmative(answer: Any) -> bool:
+    return isinstance(answer, str) and bool(_AFFIRMATIVE.match(answer))
+
+
+def _slug(key: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", key.lower()).strip("_") or "page"
+
+
+@dataclass
+class Verdict:
+    """One stage's opinion on a check; ``answer=None`` means the stage cannot tell."""
+
+    answer: str | None
+    confidence: float = 0.0
+    detail: str = ""
+
+
+@dataclass
+class CheckDecision:
+    """Final answer for a check, the stage that gave it, and how long each stage that ran took."""
+
+    answer: Any
+    stage: str
+    confidence: float
+    detail: str = ""
+    stage_s: dict[str, float] = field(default_factory=dict)
+
+
+class ReferenceVerifier:
+    """Compare a screenshot against known-good reference screenshots of every page.
+
+    References are ``<reference_dir>/<page>.png``. A check for page P answers
+    yes when the screenshot matches P's reference with structural similarity of
+    at least `match_threshold` and beats every other page's reference by
+    `margin`; it answers no when another page's reference wins by that margin.
+    Confidence is the winning similarity. References can be seeded by hand or
+    learned from screenshots the VLM confirmed (see `VerifierChain`).
+    """
+
+    name = "reference"
+
+    def __init__(self, reference_dir: str, match_threshold: float = 0.85, margin: float = 0.05, thumb_size: tuple[int, int] = (128, 72)):
+        os.makedirs(reference_dir, exist_ok=True)
+        self.reference_dir = reference_dir
+        self.match_threshold = match_threshold
+        self.margin = margin
+        self.thumb_size = thumb_size
+        self._lock = threading.Lock()
+        self._thumbs: dict[str, PILImageLib.Image] = {}
+        for filename in sorted(os.listdir(reference_dir)):
+            stem, ext = os.path.splitext(filename)
+            if ext.lower() in (".png", ".jpg", ".jpeg", ".webp"):
+                with PILImageLib.open(os.path.join(reference_dir, filename)) as image:
+                    self._thumbs[stem] = self._thumbnail(image)
+
+    def _thumbnail(self, image: Any) -> PILImageLib.Image:
+        return to_pil(image).convert("L").resize(self.thumb_size, PILImageLib.BILINEAR)
+
+    def has_reference(self, key: str) -> bool:
+        return _slug(key) in self._thumbs
+
+    def learn(self, key: str, image: Any) -> None:
+        """Store `image` as the reference for `key` unless one exists already."""
+        slug = _slug(key)
+        with self._lock:
+            if slug in self._thumbs:
+                return
+            encoded = encode_image(image)
+            path = os.path.join(self.reference_dir, slug + encoded.extension)
+            encoded.save(path)
+            self._thumbs[slug] = self._thumbnail(encoded)
+        logger.info(f"Learned reference screenshot for '{key}' at {path}")
+
+    def __call__(self, image: Any, key: str) -> Verdict:
+        with self._lock:
+            references = dict(self._thumbs)
+        if not references:
+            return Verdict(None, 0.0, "no references")
+        thumb = self._thumbnail(image)
+        scores = {slug: structural_similarity(thumb, reference) for slug, reference in references.items()}
+        slug = _slug(key)
+        own = scores.pop(slug, None)
+        best_other, other_score = max(scores.items(), key=lambda item: item[1], default=(None, None))
+        if own is not None and own >= self.match_threshold and (other_score is None or own - other_score >= self.margin):
+            return Verdict("yes", own, f"matches reference (ssim {own:.3f})")
+        if other_score is not None and other_score >= self.match_threshold and (own is None or other_score - own >= self.margin):
+            return Verdict("no", other_score, f"looks like '{best_other}' (ssim {other_score:.3f})")
+        detail = f"ssim {own:.3f}" if own is not None else "no reference for this page"
+        return Verdict(None, 0.0, detail)
+
+
+class OCRVerifier:
+    """Look for the page name in the OCR'd header region (optional; needs pytesseract and tesseract).
+
+    Finding the name is strong evidence; not finding it says nothing, since
+    OCR misses text, so that case is left to the next stage.
+    """
+
+    name = "ocr"
+
+    def __init__(self, crop: tuple[float, float, float, float] | None = None, confidence: float = 0.95):
+        self.crop = crop
+        self.confidence = confidence
+        try:
+            import pytesseract
+        except ImportError:
+            pytesseract = None
+        self._pytesseract = pytesseract
+        self.available = pytesseract is not None and shutil.which("tesseract") is not None
+        if not self.available:
+            logger.warning("OCR verifier disabled: install pytesseract and the tesseract binary to enable it")
+
+    def __call__(self, image: Any, key: str) -> Verdict:
+        if not self.available:
+            return Verdict(None, 0.0, "ocr unavailable")
+        pil = to_pil(image).convert("L")
+        if self.crop:
+            left, top, right, bottom = self.crop
+            pil = pil.crop((round(left * pil.width), round(top * pil.height), round(right * pil.width), round(bottom * pil.height)))
+        # Tesseract reads UI-sized text far better at 2x
+        pil = pil.resize((pil.width * 2, pil.height * 2), PILImageLib.BILINEAR)
+        text = " ".join(self._pytesseract.image_to_string(pil).split())
+        if key.lower() in text.lower():
+            return Verdict("yes", self.confidence, f"header text contains '{key}'")
+        return Verdict(None, 0.0, f"header text: {text[:60]!r}")
+
+
+class VerifierChain:
+    """Answer QA checks with cheap local stages first and the VLM only when they are unsure.
+
+    Each stage is called as ``stage(image, key) -> Verdict`` in order; the first
+    verdict with ``confidence >= threshold`` decides. Otherwise `fallback`
+    (an ``analyze(image, question)`` callable, usually `analyze_screenshot`)
+    answers. When the VLM confirms a page that `reference` has no screenshot
+    for yet, the screenshot becomes its reference, so later runs skip the VLM.
+    Use as the ``analyze`` of a ``keyed`` `VLMWorkerPool`.
+    """
+
+    def __init__(
+        self,
+        stages: list[Callable[[Any, str], Verdict]],
+        fallback: Callable[[Any, str], Any],
+        threshold: float = 0.9,
+        reference: ReferenceVerifier | None = None,
+    ):
+        self.stages = stages
+        self.fallback = fallback
+        self.threshold = threshold
+        self.reference = reference
+        self.decided_by: Counter[str] = Counter()
+        self.stage_s: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, image: Any, question: str, key: str) -> CheckDecision:
+        stage_s: dict[str, float] = {}
+        details = []
+        for stage in self.stages:
+            start = time.perf_counter()
+            try:
+                verdict = stage(image, key)
+            except Exception as e:
+                logger.warning(f"Verifier stage '{stage.name}' failed for '{key}': {e}")
+                verdict = Verdict(None, 0.0, f"error: {e}")
+            stage_s[stage.name] = round(time.perf_counter() - start, 4)
+            details.append(f"{stage.name}: {verdict.detail}")
+            if verdict.answer is not None and verdict.confidence >= self.threshold:
+                return self._decide(CheckDecision(verdict.answer, stage.name, verdict.confidence, verdict.detail, stage_s))
+
+        start = time.perf_counter()
+        answer = self.fallback(image, question)
+        stage_s["vlm"] = round(time.perf_counter() - start, 4)
+        if self.reference is not None and is_affirmative(answer) and not self.reference.has_reference(key):
+            self.reference.learn(key, image)
+        return self._decide(CheckDecision(answer, "vlm", 1.0, "; ".join(details), stage_s))
+
+    def _decide(self, decision: CheckDecision) -> CheckDecision:
+        with self._lock:
+            self.decided_by[decision.stage] += 1
+            for name, seconds in decision.stage_s.items():
+                self.stage_s[name] += seconds
+        return decision
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            total = sum(self.decided_by.values())
+            return {
+                "checks": total,
+                "decided_by": dict(self.decided_by),
+                "local_rate": round((total - self.decided_by["vlm"]) / total, 3) if total else 0.0,
+                "stage_s": {name: round(seconds, 3) for name, seconds in self.stage_s.items()},
+            }
+
+
+def build_verifier_chain(
+    fallback: Callable[[Any, str], Any],
+    reference_dir: str = "",
+    ocr_crop: tuple[float, float, float, float] | None = None,
+    use_ocr: bool = False,
+    threshold: float = 0.9,
+) -> VerifierChain | None:
+    """OCR then reference stages as configured; None when neither is enabled."""
+    stages = []
+    if use_ocr:
+        ocr = OCRVerifier(ocr_crop)
+        if ocr.available:
+            stages.append(ocr)
+    reference = ReferenceVerifier(reference_dir) if reference_dir else None
+    if reference is not None:
+        stages.append(reference)
+    if not stages:
+        return None
+    return VerifierChain(stages, fallback, threshold=threshold, reference=reference)
+
+
+def print_verifier_stats(chain: VerifierChain | None) -> None:
+    if chain is None:
+        return
+    stats = chain.stats()
+    decided = ", ".join(f"{stage} {count}" for stage, count in stats["decided_by"].items())
+    stage_s = ", ".join(f"{stage} {seconds}s" for stage, seconds in stats["stage_s"].items())
+    print(f"🔎 Verifier: {stats['checks']} checks decided by {decided or 'none'} ({stats['local_rate']:.0%} local); time by stage: {stage_s}")
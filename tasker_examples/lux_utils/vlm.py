@@ -0,0 +1,49 @@
+import logging
+import time
+from typing import Any
+
+from .imaging import encode_image
+from .tracing import trace_span
+from .vlm_cache import VLMAnswerCache, model_identity
+
+logger = logging.getLogger(__name__)
+
+
+def analyze_screenshot(image: Any, question: str, vlm, cache: VLMAnswerCache | None = None):
+    """Ask the model to answer `question` about a screenshot.
+
+    `image` is the object returned by `AsyncScreenshotMaker` (or any input accepted
+    by `encode_image`); it is encoded in memory and never round-trips through disk.
+    With a `cache`, a stored answer for a perceptually matching screenshot is
+    returned without calling the model.
+    """
+    return analyze_screenshot_with_hit(image, question, vlm, cache)[0]
+
+
+def analyze_screenshot_with_hit(image: Any, question: str, vlm, cache: VLMAnswerCache | None = None) -> tuple[Any, bool]:
+    """`analyze_screenshot`, also returning whether the answer came from `cache` instead of a VLM request."""
+    with trace_span("analyze_screenshot", "vlm", question=question[:80]):
+        return _analyze_screenshot(image, question, vlm, cache)
+
+
+def _analyze_screenshot(image: Any, question: str, vlm, cache: VLMAnswerCache | None) -> tuple[Any, bool]:
+    if cache is not None:
+        model_id = model_identity(vlm)
+        hit, answer, phash = cache.lookup(image, question, model_id)
+        if hit:
+            return answer, True
+
+    encoded = encode_image(image)
+    logger.info(f"VLM upload: {encoded.describe()}")
+
+    user_messages = [
+        {"type": "text", "content": question},
+        {"type": "image_url", "image_url": {"url": encoded.data_url}},
+    ]
+
+    # No special system prompt needed; keep it empty to let the model focus on the question.
+    start = time.perf_counter()
+    answer = vlm([], user_messages)
+    if cache is not None:
+        cache.store(phash, question, model_id, answer, time.perf_counter() - start)
+    return answer, False
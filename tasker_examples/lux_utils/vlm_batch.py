@@ -0,0 +1,174 @@
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+from .imaging import encode_image
+from .vlm import analyze_screenshot_with_hit
+from .vlm_cache import VLMAnswerCache
+
+logger = logging.getLogger(__name__)
+
+_JSON_BLOCK = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+@dataclass
+class FieldSpec:
+    """One value to extract from a screenshot.
+
+    `type` is one of "string", "number", "integer", "boolean" or "array".
+    Optional fields accept null (not visible on screen) as a valid answer.
+    """
+
+    description: str
+    type: str = "string"
+    required: bool = True
+    pattern: str | None = None
+
+
+@dataclass
+class BatchAnalysis:
+    """Validated field values plus what it cost to get them."""
+
+    values: dict[str, Any]
+    errors: dict[str, str] = field(default_factory=dict)
+    requests: int = 0
+    upload_bytes: int = 0
+    reasked: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def normalize_fields(fields: list[str] | dict[str, FieldSpec | str]) -> dict[str, FieldSpec]:
+    """Accept a plain list of questions or a schema and return a schema."""
+    if isinstance(fields, list):
+        return {f"q{i + 1}": FieldSpec(description=question) for i, question in enumerate(fields)}
+    return {
+        name: spec if isinstance(spec, FieldSpec) else FieldSpec(description=spec)
+        for name, spec in fields.items()
+    }
+
+
+def parse_json_answer(answer: Any) -> Any:
+    """Pull a JSON value out of a model answer, tolerating code fences and surrounding prose."""
+    if not isinstance(answer, str):
+        return answer
+    match = _JSON_BLOCK.search(answer)
+    text = match.group(1) if match else answer
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        return json.loads(text)
+    closing = "}" if text[start] == "{" else "]"
+    return json.loads(text[start : text.rfind(closing) + 1])
+
+
+def validate_field(spec: FieldSpec, value: Any) -> tuple[bool, Any, str]:
+    """Check and coerce one value against its spec; returns ``(ok, value, error)``."""
+    if value is None or value == "":
+        if spec.required:
+            return False, None, "missing"
+        return True, None, ""
+
+    if spec.type in ("number", "integer"):
+        if isinstance(value, bool):
+            return False, value, f"expected {spec.type}"
+        if isinstance(value, str):
+            # Accept "$1,299.00", "4.5 out of 5" and similar renderings
+            match = _NUMBER.search(value.replace(",", ""))
+            if not match:
+                return False, value, f"expected {spec.type}"
+            value = float(match.group())
+        if not isinstance(value, (int, float)):
+            return False, value, f"expected {spec.type}"
+        if spec.type == "integer":
+            if value != int(value):
+                return False, value, "expected integer"
+            value = int(value)
+    elif spec.type == "boolean":
+        if isinstance(value, str) and value.strip().lower() in ("yes", "true", "no", "false"):
+            value = value.strip().lower() in ("yes", "true")
+        if not isinstance(value, bool):
+            return False, value, "expected boolean"
+    elif spec.type == "array":
+        if not isinstance(value, list):
+            return False, value, "expected array"
+    else:
+        if not isinstance(value, str):
+            value = json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else str(value)
+
+    if spec.pattern and not re.fullmatch(spec.pattern, str(value)):
+        return False, value, f"does not match {spec.pattern}"
+    return True, value, ""
+
+
+def build_batch_prompt(fields: dict[str, FieldSpec]) -> str:
+    lines = [
+        "Answer the following about the screenshot. Respond with a single JSON object "
+        "and nothing else, using exactly these keys:",
+    ]
+    for name, spec in fields.items():
+        optional = " (use null if not visible)" if not spec.required else ""
+        lines.append(f'- "{name}" ({spec.type}): {spec.description}{optional}')
+    return "\n".join(lines)
+
+
+def _build_field_prompt(name: str, spec: FieldSpec) -> str:
+    return (
+        f"{spec.description}\n"
+        f'Respond with a JSON object of the form {{"{name}": <{spec.type}>}} and nothing else.'
+    )
+
+
+def analyze_fields(
+    image: Any,
+    fields: list[str] | dict[str, FieldSpec | str],
+    vlm,
+    cache: VLMAnswerCache | None = None,
+    reask: bool = True,
+) -> BatchAnalysis:
+    """Answer several questions about one screenshot with a single VLM request.
+
+    The screenshot is encoded once and every field is requested in one JSON
+    answer. Fields that are missing or fail validation are re-asked one at a
+    time (when `reask` is set) against the same encoded image.
+    """
+    schema = normalize_fields(fields)
+    encoded = encode_image(image)
+    result = BatchAnalysis(values={})
+
+    def ask(prompt: str) -> dict[str, Any]:
+        answer, cached = analyze_screenshot_with_hit(encoded, prompt, vlm, cache)
+        if not cached:
+            result.requests += 1
+            result.upload_bytes += len(encoded.b64)
+        try:
+            parsed = parse_json_answer(answer)
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.warning(f"VLM answer is not valid JSON: {e}")
+            return {}
+        return parsed if isinstance(parsed, dict) else {}
+
+    answers = ask(build_batch_prompt(schema))
+    failed = {}
+    for name, spec in schema.items():
+        ok, value, error = validate_field(spec, answers.get(name))
+        result.values[name] = value
+        if not ok:
+            failed[name] = error
+
+    for name, error in failed.items():
+        if not reask:
+            result.errors[name] = error
+            continue
+        logger.info(f"Re-asking field '{name}' ({error})")
+        result.reasked.append(name)
+        ok, value, error = validate_field(schema[name], ask(_build_field_prompt(name, schema[name])).get(name))
+        result.values[name] = value
+        if not ok:
+            result.errors[name] = error
+
+    return result
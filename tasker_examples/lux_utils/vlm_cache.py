@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from .imaging import hamming_distance, perceptual_hash
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vlm_answers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    query_key TEXT NOT NULL,
+    phash TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    vlm_s REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_vlm_answers_query ON vlm_answers (query_key, phash);
+CREATE INDEX IF NOT EXISTS idx_vlm_answers_lru ON vlm_answers (last_used);
+"""
+
+
+def model_identity(vlm) -> str:
+    """Best-effort stable name for the model behind a `ModelEngine`-style callable."""
+    info = getattr(vlm, "model_info", None)
+    for source in (info, vlm):
+        if source is None:
+            continue
+        for attr in ("model", "model_name", "name"):
+            value = getattr(source, attr, None)
+            if isinstance(value, str) and value:
+                return value
+    return type(vlm).__name__
+
+
+class VLMAnswerCache:
+    """Persistent VLM answer cache keyed by a perceptual screenshot hash.
+
+    Entries match when the question and model identity are identical and the
+    screenshot hashes differ by at most `max_distance` bits. Entries older than
+    `ttl_s` are ignored and the least recently used rows are evicted once the
+    cache grows past `max_entries`. Safe to share across VLM worker threads.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_distance: int = 4,
+        ttl_s: float = 24 * 3600,
+        max_entries: int = 5000,
+        hash_size: int = 16,
+    ):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_distance = max_distance
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hash_size = hash_size
+        self.hits = 0
+        self.misses = 0
+        self.saved_s = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def _query_key(question: str, model_id: str) -> str:
+        return hashlib.sha256(f"{model_id}\0{question}".encode("utf-8")).hexdigest()
+
+    def lookup(self, image: Any, question: str, model_id: str) -> tuple[bool, Any, int]:
+        """Return ``(hit, answer, phash)``; the hash is handed back so `store` can reuse it."""
+        phash = perceptual_hash(image, self.hash_size)
+        query_key = self._query_key(question, model_id)
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, phash, answer, vlm_s FROM vlm_answers WHERE query_key = ? AND created_at >= ?",
+                (query_key, now - self.ttl_s),
+            ).fetchall()
+            best = None
+            for row_id, row_hash, answer, vlm_s in rows:
+                distance = hamming_distance(phash, int(row_hash, 16))
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, row_id, answer, vlm_s)
+            if best is None:
+                self.misses += 1
+                return False, None, phash
+            distance, row_id, answer, vlm_s = best
+            self._conn.execute("UPDATE vlm_answers SET last_used = ? WHERE id = ?", (now, row_id))
+            self._conn.commit()
+            self.hits += 1
+            self.saved_s += vlm_s
+        logger.debug(f"VLM cache hit (distance {distance}) for question: {question[:60]}")
+        return True, json.loads(answer), phash
+
+    def store(self, phash: int, question: str, model_id: str, answer: Any, vlm_s: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO vlm_answers (query_key, phash, answer, vlm_s, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self._query_key(question, model_id),
+                    format(phash, "x"),
+                    json.dumps(answer, ensure_ascii=False, default=str),
+                    vlm_s,
+                    now,
+                    now,
+                ),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM vlm_answers WHERE created_at < ?", (now - self.ttl_s,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM vlm_answers").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM vlm_answers WHERE id IN "
+                "(SELECT id FROM vlm_answers ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "vlm_calls_saved": self.hits,
+            "vlm_seconds_saved": round(self.saved_s, 2),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,128 @@
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class VLMCheck:
+    """A single queued VLM question about one screenshot, plus its timing."""
+
+    index: int
+    key: str
+    question: str
+    screenshot: Any
+    answer: Any = None
+    error: str | None = None
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    @property
+    def queue_wait(self) -> float:
+        """Seconds the check sat in the queue before a worker picked it up."""
+        if self.started_at is None:
+            return 0.0
+        return self.started_at - self.enqueued_at
+
+    @property
+    def duration(self) -> float:
+        """Seconds spent inside the VLM call."""
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    def timing(self) -> dict[str, float]:
+        return {
+            "queue_wait_s": round(self.queue_wait, 3),
+            "vlm_s": round(self.duration, 3),
+        }
+
+
+class VLMWorkerPool:
+    """Drain VLM checks from an asyncio queue with a bounded number of workers.
+
+    `analyze` is the blocking `analyze_screenshot`-style callable
+    ``analyze(screenshot, question) -> answer``, or with ``keyed=True``
+    ``analyze(screenshot, question, key)``; each call runs in a worker thread so
+    the event loop keeps driving the agent while checks are in flight.
+    `on_result` is called on the event loop as each check finishes and may be
+    a coroutine function.
+    """
+
+    def __init__(
+        self,
+        analyze: Callable[[Any, str], Any],
+        num_workers: int = 4,
+        on_result: Callable[[VLMCheck], Awaitable[None] | None] | None = None,
+        keyed: bool = False,
+    ):
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
+        self.analyze = analyze
+        self.num_workers = num_workers
+        self.on_result = on_result
+        self.keyed = keyed
+        self.checks: list[VLMCheck] = []
+        self._queue: asyncio.Queue[VLMCheck | None] = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"vlm-worker-{i}")
+            for i in range(self.num_workers)
+        ]
+
+    def submit(self, key: str, question: str, screenshot: Any) -> VLMCheck:
+        """Queue a check and return immediately."""
+        self.start()
+        check = VLMCheck(index=len(self.checks), key=key, question=question, screenshot=screenshot)
+        self.checks.append(check)
+        self._queue.put_nowait(check)
+        return check
+
+    async def join(self) -> list[VLMCheck]:
+        """Wait for every queued check, stop the workers and return checks in submit order."""
+        for _ in self._workers:
+            self._queue.put_nowait(None)
+        if self._workers:
+            await asyncio.gather(*self._workers)
+        self._workers = []
+        return list(self.checks)
+
+    async def cancel(self) -> None:
+        """Stop the workers without waiting for outstanding checks."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            check = await self._queue.get()
+            if check is None:
+                return
+            check.started_at = time.perf_counter()
+            try:
+                args = (check.screenshot, check.question, check.key) if self.keyed else (check.screenshot, check.question)
+                check.answer = await asyncio.to_thread(self.analyze, *args)
+            except Exception as e:
+                logger.error(f"VLM check '{check.key}' failed on worker {worker_id}: {e}")
+                check.error = str(e)
+            check.finished_at = time.perf_counter()
+            # Drop the screenshot reference so finished checks do not pin image memory
+            check.screenshot = None
+            if self.on_result:
+                # A failing callback must not take the worker, and with it `join`, down
+                try:
+                    result = self.on_result(check)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    logger.error(f"on_result for VLM check '{check.key}' failed on worker {worker_id}: {e}")
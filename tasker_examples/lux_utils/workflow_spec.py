@@ -0,0 +1,143 @@
+import json
+import os
+import string
+from dataclasses import dataclass, field
+from typing import Any
+
+_FORMATTER = string.Formatter()
+
+
+def _fields(template: str) -> set[str]:
+    """Top-level placeholder names in a ``str.format`` template (``{a.b}`` and ``{a[0]}`` count as ``a``)."""
+    names = set()
+    for _, name, _, _ in _FORMATTER.parse(template):
+        if name:
+            names.add(name.split(".", 1)[0].split("[", 1)[0])
+    return names
+
+
+def _as_list(value: Any) -> list[str]:
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value]
+    return [item.strip() for item in str(value).split(",") if item.strip()]
+
+
+@dataclass
+class WorkflowSpec:
+    """An instruction and todo list with ``{param}`` placeholders, loaded from YAML or JSON.
+
+    The file looks like::
+
+        name: cvs_booking
+        instruction: "Schedule an appointment at CVS for {first_name} {last_name}"
+        params:                  # defaults; null marks a required parameter
+          first_name: null
+          zip_code: "94404"
+        derive:                  # parameters computed from others
+          month: {from: birthday, split: "-", index: 0}
+        todos:
+          - "Enter the first name '{first_name}' ..."
+          - for_each: pages      # one todo per item of a list (or comma-separated) parameter
+            as: page
+            todo: "Click on '{page}' in the left sidebar"
+        agent:                   # per-job overrides
+          max_steps: 16
+
+    Placeholders use ``str.format`` syntax, as the scripts' f-strings do.
+    """
+
+    name: str
+    instruction: str
+    todos: list[Any]
+    params: dict[str, Any] = field(default_factory=dict)
+    derive: dict[str, dict[str, Any]] = field(default_factory=dict)
+    agent: dict[str, Any] = field(default_factory=dict)
+    path: str = ""
+
+    @classmethod
+    def load(cls, path: str) -> "WorkflowSpec":
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith((".yaml", ".yml")):
+                try:
+                    import yaml
+                except ImportError:
+                    raise RuntimeError(f"Reading {path} needs PyYAML (pip install pyyaml); JSON specs work without it")
+                raw = yaml.safe_load(f)
+            else:
+                raw = json.load(f)
+        if not isinstance(raw, dict) or not raw.get("todos"):
+            raise ValueError(f"{path}: a workflow spec needs a 'todos' list")
+        unknown = set(raw) - {"name", "instruction", "todos", "params", "derive", "agent"}
+        if unknown:
+            raise ValueError(f"{path}: unknown keys {', '.join(sorted(unknown))}")
+        spec = cls(
+            name=raw.get("name") or os.path.splitext(os.path.basename(path))[0],
+            instruction=raw.get("instruction", ""),
+            todos=list(raw["todos"]),
+            params=dict(raw.get("params") or {}),
+            derive=dict(raw.get("derive") or {}),
+            agent=dict(raw.get("agent") or {}),
+            path=path,
+        )
+        spec.validate()
+        return spec
+
+    def placeholders(self) -> set[str]:
+        names = _fields(self.instruction)
+        for todo in self.todos:
+            if isinstance(todo, dict):
+                names |= _fields(todo["todo"]) - {todo.get("as", "item")}
+                names.add(todo["for_each"])
+            else:
+                names |= _fields(todo)
+        return names
+
+    def validate(self) -> None:
+        """Fail at load time on placeholders no parameter or derivation provides."""
+        for todo in self.todos:
+            if isinstance(todo, dict) and not {"for_each", "todo"} <= set(todo):
+                raise ValueError(f"{self.path}: a for_each todo needs 'for_each' and 'todo', got {todo}")
+        for name, rule in self.derive.items():
+            if rule.get("from") not in self.params:
+                raise ValueError(f"{self.path}: derived parameter '{name}' needs 'from' naming a declared parameter")
+        if set(self.agent) - {"max_steps"}:
+            raise ValueError(f"{self.path}: only max_steps can be set under agent")
+        undeclared = self.placeholders() - set(self.params) - set(self.derive)
+        if undeclared:
+            raise ValueError(f"{self.path}: placeholders {', '.join(sorted(undeclared))} are not declared under params or derive")
+
+    def resolve_params(self, row: dict[str, Any]) -> dict[str, Any]:
+        """Spec defaults overlaid with `row`, plus derived parameters; raises on missing required ones."""
+        params = {name: value for name, value in self.params.items() if value is not None}
+        params.update({name: value for name, value in row.items() if value not in (None, "") and name in self.params})
+        missing = [name for name in self.params if name not in params]
+        if missing:
+            raise ValueError(f"workflow '{self.name}' is missing parameters: {', '.join(missing)}")
+        for name, rule in self.derive.items():
+            parts = str(params[rule["from"]]).split(rule.get("split", ","))
+            index = rule.get("index", 0)
+            if index >= len(parts):
+                raise ValueError(f"cannot derive '{name}': '{params[rule['from']]}' has no part {index}")
+            params[name] = parts[index].strip()
+        return params
+
+    def render(self, row: dict[str, Any]) -> tuple[str, list[str]]:
+        """Instruction and todos with every placeholder filled from `row`."""
+        params = self.resolve_params(row)
+        todos = []
+        for todo in self.todos:
+            if isinstance(todo, dict):
+                alias = todo.get("as", "item")
+                todos += [todo["todo"].format(**{**params, alias: item}) for item in _as_list(params[todo["for_each"]])]
+            else:
+                todos.append(todo.format(**params))
+        return self.instruction.format(**params), todos
+
+    def job(self, row: dict[str, Any], exp_name: str = "") -> dict[str, Any]:
+        """A rendered job for `LuxDaemon`, with the spec's agent overrides."""
+        instruction, todos = self.render(row)
+        # The label names the run in the run-history index, as a builder-backed job's workflow does
+        job = {"instruction": instruction, "todos": todos, "exp_name": exp_name or self.name, "label": self.name}
+        if self.agent.get("max_steps"):
+            job["max_steps"] = self.agent["max_steps"]
+        return job
@@ -0,0 +1,79 @@
+import asyncio
+
+from oagi.handler.utils import reset_handler
+
+
+class SettleConfig:
+    """Stands in for a handler's config so the wrapper, not the handler, owns the post-action delay.
+
+    `TaskeeAgent` writes `step_delay` into ``handler.config.post_batch_delay``
+    (see `configure_handler_delay`); the wrapped handler's own delay is zeroed so
+    the wait happens exactly once, in `ActionHandlerWrapper.settle`. Every other
+    attribute is read from the wrapped handler's config.
+    """
+
+    def __init__(self, handler):
+        inner = getattr(handler, "config", None)
+        self.__dict__["_inner"] = inner
+        self.__dict__["post_batch_delay"] = getattr(inner, "post_batch_delay", 0.0)
+        if inner is not None and hasattr(inner, "post_batch_delay"):
+            inner.post_batch_delay = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+class ActionHandlerWrapper:
+    """Base class for decorators around an `AsyncActionHandler`.
+
+    Subclasses override `execute` and/or `settle`; `reset`, `config` and any
+    other attribute behave like the wrapped handler's, so wrappers stack freely.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.config = SettleConfig(handler)
+
+    def reset(self) -> None:
+        reset_handler(self.handler)
+
+    def set_target_screen(self, screen) -> None:
+        self.handler.set_target_screen(screen)
+
+    async def __call__(self, actions) -> None:
+        await self.execute(actions)
+        await self.settle(actions)
+
+    async def execute(self, actions) -> None:
+        await self.handler(actions)
+
+    async def settle(self, actions) -> None:
+        if self.config.post_batch_delay > 0:
+            # Handlers that can tell when their target is idle (the CDP browser handler) wait for that instead
+            wait_until_settled = getattr(self.handler, "wait_until_settled", None)
+            if wait_until_settled is not None:
+                await wait_until_settled(self.config.post_batch_delay)
+            else:
+                await asyncio.sleep(self.config.post_batch_delay)
+
+    def __getattr__(self, name):
+        return getattr(self.handler, name)
+
+
+class ImageProviderWrapper:
+    """Base class for decorators around an `AsyncImageProvider`."""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    async def __call__(self):
+        return await self.provider()
+
+    async def last_image(self):
+        return await self.provider.last_image()
+
+    def set_target_screen(self, screen) -> None:
+        self.provider.set_target_screen(screen)
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
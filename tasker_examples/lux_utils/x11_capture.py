@@ -0,0 +1,283 @@
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from oagi.handler.pil_image import PILImage
+from oagi.handler.screen_manager import Screen
+from oagi.types import ImageConfig
+from PIL import Image as PILImageLib
+
+logger = logging.getLogger(__name__)
+
+_Z_PIXMAP = 2
+_ALL_PLANES = 0xFFFFFFFF
+_IPC_PRIVATE = 0
+_IPC_CREAT = 0o1000
+_IPC_RMID = 0
+
+
+class _XImage(ctypes.Structure):
+    # Leading fields of Xlib's XImage; only these are read or written here
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+        ("red_mask", ctypes.c_ulong),
+        ("green_mask", ctypes.c_ulong),
+        ("blue_mask", ctypes.c_ulong),
+    ]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+def _load_library(name: str) -> ctypes.CDLL:
+    path = ctypes.util.find_library(name)
+    if path is None:
+        raise RuntimeError(f"lib{name} is not installed; X11 shared-memory capture needs libX11 and libXext")
+    return ctypes.CDLL(path, use_errno=True)
+
+
+def _bind_libraries() -> tuple[ctypes.CDLL, ctypes.CDLL, ctypes.CDLL]:
+    x11, xext, libc = _load_library("X11"), _load_library("Xext"), _load_library("c")
+    x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    x11.XOpenDisplay.restype = ctypes.c_void_p
+    x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+    for name in ("XDefaultScreen",):
+        getattr(x11, name).argtypes = [ctypes.c_void_p]
+        getattr(x11, name).restype = ctypes.c_int
+    for name in ("XDisplayWidth", "XDisplayHeight", "XDefaultDepth"):
+        getattr(x11, name).argtypes = [ctypes.c_void_p, ctypes.c_int]
+        getattr(x11, name).restype = ctypes.c_int
+    x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XRootWindow.restype = ctypes.c_ulong
+    x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDefaultVisual.restype = ctypes.c_void_p
+    x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDestroyImage.argtypes = [ctypes.POINTER(_XImage)]
+
+    xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+    xext.XShmQueryExtension.restype = ctypes.c_int
+    xext.XShmCreateImage.argtypes = [
+        ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_char_p,
+        ctypes.POINTER(_XShmSegmentInfo), ctypes.c_uint, ctypes.c_uint,
+    ]
+    xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+    xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+    xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+    xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XImage), ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+    xext.XShmGetImage.restype = ctypes.c_int
+
+    libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+    libc.shmget.restype = ctypes.c_int
+    libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+    libc.shmat.restype = ctypes.c_void_p
+    libc.shmdt.argtypes = [ctypes.c_void_p]
+    libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+    return x11, xext, libc
+
+
+class XShmCapture:
+    """Grab the screen, or a region of it, through the X MIT-SHM extension into one reused buffer.
+
+    The X server copies pixels straight into a shared-memory segment that is
+    allocated once, and every `grab` decodes them into the same PIL image, so
+    a capture allocates nothing per frame. Not thread-safe: use it from one
+    thread (`XShmScreenshotMaker` gives it its own).
+    """
+
+    def __init__(self, region: tuple[int, int, int, int] | None = None, display: str | None = None):
+        self._x11, self._xext, self._libc = _bind_libraries()
+        self._display = self._x11.XOpenDisplay(display.encode() if display else None)
+        if not self._display:
+            raise RuntimeError(f"Cannot open X display {display or os.environ.get('DISPLAY', '(DISPLAY unset)')}")
+        self._image = None
+        self._shminfo = None
+        try:
+            if not self._xext.XShmQueryExtension(self._display):
+                raise RuntimeError("The X server does not support the MIT-SHM extension")
+            screen = self._x11.XDefaultScreen(self._display)
+            self.screen_size = (self._x11.XDisplayWidth(self._display, screen), self._x11.XDisplayHeight(self._display, screen))
+            self._root = self._x11.XRootWindow(self._display, screen)
+            self._visual = self._x11.XDefaultVisual(self._display, screen)
+            self._depth = self._x11.XDefaultDepth(self._display, screen)
+            self.set_region(region)
+        except Exception:
+            self.close()
+            raise
+
+    def set_region(self, region: tuple[int, int, int, int] | None) -> None:
+        """Capture ``(x, y, width, height)`` from now on, or the whole screen for None."""
+        x, y, width, height = region or (0, 0, *self.screen_size)
+        # XShmGetImage outside the screen is a BadMatch, which Xlib's default handler turns into exit()
+        if x < 0 or y < 0 or width <= 0 or height <= 0 or x + width > self.screen_size[0] or y + height > self.screen_size[1]:
+            raise ValueError(f"Capture region {region} does not fit the {self.screen_size[0]}x{self.screen_size[1]} screen")
+        self._release()
+        self.region = (x, y, width, height)
+
+        shminfo = _XShmSegmentInfo()
+        image = self._xext.XShmCreateImage(self._display, self._visual, self._depth, _Z_PIXMAP, None, ctypes.byref(shminfo), width, height)
+        if not image:
+            raise RuntimeError("XShmCreateImage failed")
+        self._image, self._shminfo = image, shminfo
+        if image.contents.bits_per_pixel != 32:
+            raise RuntimeError(f"Only 24/32-bit visuals are supported, got {image.contents.bits_per_pixel} bits per pixel")
+        size = image.contents.bytes_per_line * height
+        shminfo.shmid = self._libc.shmget(_IPC_PRIVATE, size, _IPC_CREAT | 0o600)
+        if shminfo.shmid < 0:
+            raise OSError(ctypes.get_errno(), f"shmget of {size} bytes failed")
+        address = self._libc.shmat(shminfo.shmid, None, 0)
+        if address in (None, ctypes.c_void_p(-1).value):
+            self._libc.shmctl(shminfo.shmid, _IPC_RMID, None)
+            raise OSError(ctypes.get_errno(), "shmat failed")
+        shminfo.shmaddr = address
+        image.contents.data = shminfo.shmaddr
+        shminfo.readOnly = 0
+        self._xext.XShmAttach(self._display, ctypes.byref(shminfo))
+        self._x11.XSync(self._display, 0)
+        # Marked for removal now, so the segment goes away with the process however it exits
+        self._libc.shmctl(shminfo.shmid, _IPC_RMID, None)
+
+        self._stride = image.contents.bytes_per_line
+        self._buffer = (ctypes.c_char * size).from_address(shminfo.shmaddr)
+        self._frame = PILImageLib.new("RGB", (width, height))
+
+    def grab(self) -> PILImageLib.Image:
+        """The current screen contents, in an image that the next `grab` overwrites."""
+        x, y, _, _ = self.region
+        if not self._xext.XShmGetImage(self._display, self._root, self._image, x, y, _ALL_PLANES):
+            raise RuntimeError("XShmGetImage failed")
+        self._frame.frombytes(self._buffer, "raw", "BGRX", self._stride)
+        return self._frame
+
+    def _release(self) -> None:
+        if self._shminfo is not None and self._shminfo.shmaddr:
+            self._xext.XShmDetach(self._display, ctypes.byref(self._shminfo))
+            self._x11.XSync(self._display, 0)
+            self._libc.shmdt(self._shminfo.shmaddr)
+        if self._image:
+            # The data is the shared segment, which XDestroyImage must not free()
+            self._image.contents.data = None
+            self._x11.XDestroyImage(self._image)
+        self._image = None
+        self._shminfo = None
+
+    def close(self) -> None:
+        if self._display:
+            self._release()
+            self._x11.XCloseDisplay(self._display)
+            self._display = None
+
+
+class XShmScreenshotMaker:
+    """Drop-in for `AsyncScreenshotMaker` built on `XShmCapture`.
+
+    Frames get the same `ImageConfig` transform as the stock provider, so Lux
+    sees identical images; only the grab is faster. Captures run on one
+    dedicated thread that owns the X connection, opened on first use (after
+    `VirtualDisplay` has set ``DISPLAY``). `set_target_screen` limits capture to
+    a region; give the action handler the same `Screen` so clicks map back to it.
+    """
+
+    def __init__(self, config: ImageConfig | None = None, region: tuple[int, int, int, int] | None = None, display: str | None = None):
+        self.config = config or ImageConfig()
+        self.region = region
+        self.display = display
+        self.captures = 0
+        self.grab_s = 0.0
+        self._capture: XShmCapture | None = None
+        self._last_image: PILImage | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="xshm-capture")
+
+    def set_target_screen(self, screen: Screen) -> None:
+        self.region = (screen.x, screen.y, screen.width, screen.height)
+        if self._capture is not None:
+            self._executor.submit(self._capture.set_region, self.region).result()
+
+    def capture(self) -> PILImage:
+        if self._capture is None:
+            self._capture = XShmCapture(self.region, self.display)
+        start = time.perf_counter()
+        frame = self._capture.grab()
+        self.grab_s += time.perf_counter() - start
+        self.captures += 1
+        image = PILImage(frame).transform(self.config)
+        if image.image is frame:
+            # No resize configured; hand out a copy, as the frame is overwritten by the next grab
+            image = PILImage(frame.copy(), self.config)
+        self._last_image = image
+        return image
+
+    async def __call__(self) -> PILImage:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.capture)
+
+    async def last_image(self) -> PILImage:
+        if self._last_image is None:
+            return await self()
+        return self._last_image
+
+    def close(self) -> None:
+        if self._capture is not None:
+            self._executor.submit(self._capture.close).result()
+            self._capture = None
+        self._executor.shutdown(wait=False)
+
+
+def parse_region(text: str) -> tuple[int, int, int, int] | None:
+    """``"x,y,width,height"`` in screen pixels, or None for an empty string."""
+    if not text:
+        return None
+    parts = [part.strip() for part in text.split(",")]
+    if len(parts) != 4 or not all(part.isdigit() for part in parts):
+        raise ValueError(f"Capture region must be x,y,width,height in pixels, got '{text}'")
+    return tuple(int(part) for part in parts)
+
+
+def add_capture_arguments(parser) -> None:
+    parser.add_argument("--capture", type=str, default="pyautogui", choices=["pyautogui", "xshm"], help="Screenshot backend; xshm grabs through X11 shared memory (Linux/Xvfb)")
+    parser.add_argument("--capture_region", type=str, default="", help="Capture only x,y,width,height of the screen, e.g. the browser viewport (clicks are mapped back)")
+
+
+def make_image_provider(args):
+    """The `--capture` image provider; pass it to `apply_capture_region` with the action handler."""
+    if args.capture == "xshm":
+        return XShmScreenshotMaker()
+    from oagi import AsyncScreenshotMaker
+
+    return AsyncScreenshotMaker()
+
+
+def apply_capture_region(args, image_provider, action_handler) -> None:
+    """Point both at ``--capture_region``, so the model sees the region and its clicks land inside it."""
+    region = parse_region(args.capture_region)
+    if region is None:
+        return
+    screen = Screen(name="capture_region", x=region[0], y=region[1], width=region[2], height=region[3])
+    image_provider.set_target_screen(screen)
+    action_handler.set_target_screen(screen)
+
+
+def print_capture_stats(image_provider) -> None:
+    if not isinstance(image_provider, XShmScreenshotMaker) or not image_provider.captures:
+        return
+    mean_ms = image_provider.grab_s / image_provider.captures * 1000
+    print(f"📸 XShm capture: {image_provider.captures} grabs of {image_provider.region or 'the full screen'}, {mean_ms:.1f} ms each")
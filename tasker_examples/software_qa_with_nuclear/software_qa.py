@@ -1,13 +1,31 @@
 import argparse
 import asyncio
 import os
+import sys
+import time
 import traceback
 from datetime import datetime
 
 from oagi import AsyncScreenshotMaker
 from oagi.agent.observer import AsyncAgentObserver
-from oagi.agent.tasker import TaskerAgent
-from oagi.handler import AsyncPyautoguiActionHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lux_utils.budget import add_budget_arguments, budget_kwargs, print_budget_stats  # noqa: E402
+from lux_utils.checkpoint import ResumableTaskerAgent, TodoCheckpoint, print_checkpoint_stats  # noqa: E402
+from lux_utils.pipeline import add_pipeline_arguments, close_pipeline, pipeline, pipeline_config, print_pipeline_stats  # noqa: E402
+from lux_utils.replay import LuxSession, add_replay_arguments  # noqa: E402
+from lux_utils.run_history import write_run_record  # noqa: E402
+from lux_utils.settle import StabilityConfig, print_stability_stats, stabilize  # noqa: E402
+from lux_utils.streaming_observer import StreamingObserver  # noqa: E402
+from lux_utils.tracing import Tracer, export_trace, instrument  # noqa: E402
+from lux_utils.trajectory_cache import TrajectoryCache, print_trajectory_stats  # noqa: E402
+
+
+def make_action_handler():
+    # pyautogui needs a display at import time, so it is only imported for live and recorded runs
+    from oagi.handler import AsyncPyautoguiActionHandler
+
+    return AsyncPyautoguiActionHandler()
 
 
 async def main():
@@ -17,6 +35,18 @@ async def main():
     parser.add_argument('--model_name', type=str, default='lux-actor-1')
     parser.add_argument('--max_steps', type=int, default=24)
     parser.add_argument('--temperature', type=float, default=0.0)
+    parser.add_argument('--trace', action='store_true', help='Record per-phase latency spans (Chrome trace + JSONL)')
+    parser.add_argument('--stream_history', action='store_true', help='Write events and screenshots to <save_dir>/history as they arrive instead of holding them in memory')
+    parser.add_argument('--trajectory_cache', type=str, default='', help='SQLite file of known-good action sequences to replay (disabled if empty)')
+    parser.add_argument('--trajectory_distance', type=int, default=6, help='Max perceptual-hash bit distance for a screen to match')
+    parser.add_argument('--settle_detect', action='store_true', help='Wait for the screen to stop changing instead of fixed post-action delays')
+    parser.add_argument('--settle_timeout', type=float, default=5.0, help='Max seconds to wait for the screen to settle')
+    parser.add_argument('--settle_threshold', type=float, default=0.002, help='Fraction of changed thumbnail pixels still counted as the same screen')
+    parser.add_argument('--resume', action='store_true', help='Skip todos completed by the last run of this exp_name')
+    parser.add_argument('--resume_check', action='store_true', help='With --resume, start over unless the screen still matches the checkpoint')
+    add_replay_arguments(parser)
+    add_budget_arguments(parser)
+    add_pipeline_arguments(parser)
 
     args = parser.parse_args()
 
@@ -41,13 +71,28 @@ async def main():
         "Click on 'Playlists' in the left sidebar",
     ]
 
-    observer = AsyncAgentObserver()
-    image_provider = AsyncScreenshotMaker()
-    action_handler = AsyncPyautoguiActionHandler()
+    session = LuxSession.from_args(args).start()
+    observer = StreamingObserver(os.path.join(save_dir, "history"), resume=args.resume) if args.stream_history else AsyncAgentObserver()
+    image_provider, action_handler = session.io(AsyncScreenshotMaker, make_action_handler)
+
+    tracer = Tracer() if args.trace else None
+    observer, image_provider, action_handler = instrument(tracer, observer, image_provider, action_handler)
+    stability = StabilityConfig(timeout_s=args.settle_timeout, diff_threshold=args.settle_threshold) if args.settle_detect else None
+    image_provider, action_handler = stabilize(stability, image_provider, action_handler)
+    observer, image_provider, action_handler = pipeline(
+        pipeline_config(args), observer, image_provider, action_handler, api_key=session.api_key, base_url=session.base_url
+    )
+
+    trajectory_cache = None
+    if args.trajectory_cache:
+        trajectory_cache = TrajectoryCache(args.trajectory_cache, max_distance=args.trajectory_distance)
 
-    tasker = TaskerAgent(
-        api_key=os.getenv("OAGI_API_KEY"),
-        base_url=os.getenv("OAGI_BASE_URL", "https://api.agiopen.org"),
+    checkpoint = TodoCheckpoint(save_dir)
+    tasker = ResumableTaskerAgent(
+        **session.agent_kwargs(),
+        checkpoint=checkpoint,
+        **budget_kwargs(args),
+        trajectory_cache=trajectory_cache,
         model=args.model_name,
         max_steps=args.max_steps,
         temperature=args.temperature,
@@ -55,12 +100,17 @@ async def main():
     )
 
     tasker.set_task(task=instruction, todos=todos)
+    if args.resume:
+        await tasker.restore_checkpoint(image_provider, check_screen=args.resume_check)
 
-    print(f"Starting task execution at {datetime.now()}")
+    started_at = datetime.now()
+    print(f"Starting task execution at {started_at}")
     print(f"Task: {instruction}")
     print(f"Number of todos: {len(todos)}")
     print("=" * 60)
 
+    start = time.perf_counter()
+    success, error = False, None
     try:
         success = await tasker.execute(
             instruction="",
@@ -96,9 +146,20 @@ async def main():
     except Exception as e:
         print(f"\n❌ Error during execution: {e}")
         traceback.print_exc()
+        error = repr(e)
+    write_run_record(save_dir, "nuclear_qa", tasker.get_memory(), success, started_at, time.perf_counter() - start, error)
 
     output_file = os.path.join(save_dir, "nuclear_qa_execution_history.html")
     observer.export("html", output_file)
+    export_trace(tracer, save_dir, "nuclear_qa")
+    await close_pipeline(image_provider)
+    session.stop()
+    session.report()
+    print_stability_stats(image_provider)
+    print_trajectory_stats(trajectory_cache)
+    print_checkpoint_stats(checkpoint)
+    print_budget_stats(tasker)
+    print_pipeline_stats(observer)
     print(f"\n📄 Execution history exported to: {output_file}")
 
 
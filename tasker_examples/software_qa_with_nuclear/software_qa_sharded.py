@@ -0,0 +1,319 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lux_utils.async_engine import add_engine_arguments  # noqa: E402
+from lux_utils.budget import add_budget_arguments, budget_kwargs, print_budget_stats  # noqa: E402
+from lux_utils.hedging import add_hedge_arguments  # noqa: E402
+from lux_utils.display import ManagedProcess, VirtualDisplay  # noqa: E402
+from lux_utils.rate_limit import RateLimitedImageProvider, SharedTokenBucket  # noqa: E402
+from lux_utils.streaming_observer import StreamingObserver, render_combined_report  # noqa: E402
+from lux_utils.x11_capture import add_capture_arguments  # noqa: E402
+from lux_utils.tracing import Tracer, export_trace, instrument  # noqa: E402
+
+# pyautogui binds to $DISPLAY when it is imported, so the QA agent and the
+# oagi handlers are imported inside each shard after its Xvfb display is up.
+
+
+def shard_pages(pages: list[str], num_shards: int) -> list[list[str]]:
+    """Deal `pages` round-robin into `num_shards` non-empty shards."""
+    num_shards = max(1, min(num_shards, len(pages)))
+    return [pages[i::num_shards] for i in range(num_shards)]
+
+
+def nuclear_command(binary: str, profile_dir: str) -> list[str]:
+    """Nuclear (Electron) command line with its own user-data directory, so instances do not share state."""
+    return [binary, f"--user-data-dir={profile_dir}", "--no-sandbox"]
+
+
+async def run_shard(pages: list[str], args, shard_dir: str, bucket) -> dict:
+    """Run the QA agent over `pages` on the current display."""
+
+    from model_engine import ModelEngine, ModelInfo
+    from lux_utils.artifacts import ArtifactStore
+    from lux_utils.async_engine import AsyncModelEngine, print_engine_stats
+    from lux_utils.hedging import HedgedEngine, print_hedge_stats
+    from lux_utils.imaging import PreprocessConfig, parse_crop
+    from lux_utils.run_history import write_run_record
+    from lux_utils.verifier import build_verifier_chain, print_verifier_stats
+    from lux_utils.x11_capture import apply_capture_region, make_image_provider, print_capture_stats
+    from lux_utils.vlm import analyze_screenshot
+    from software_qa_with_gemini_vlm_analysis import CROP_PRESETS, QATaskerAgent, build_suite, make_action_handler
+
+    def make_vlm(model_info_path):
+        with open(model_info_path, 'r', encoding='utf-8') as f:
+            model_info = ModelInfo(**json.load(f))
+        return AsyncModelEngine.from_args(model_info, args) if args.vlm_pooled else ModelEngine(model_info)
+
+    # With --vlm_pooled each shard gets its own pool; --vlm_rps and hedge latencies are per shard
+    vlm = HedgedEngine.from_args(args, make_vlm) if args.vlm_hedge else make_vlm(args.model_info_path)
+    preprocess = PreprocessConfig(
+        max_dim=args.vlm_max_dim,
+        crop=parse_crop(args.vlm_crop, CROP_PRESETS),
+        format=args.vlm_format,
+        quality=args.vlm_quality,
+    )
+    # Shards check different pages, so they can learn into one reference directory
+    verifier = build_verifier_chain(
+        lambda image, question: analyze_screenshot(image, question, vlm),
+        reference_dir=args.verify_refs,
+        ocr_crop=None if args.vlm_crop else CROP_PRESETS["page_header"],
+        use_ocr=args.verify_ocr,
+        threshold=args.verify_threshold,
+    )
+
+    # Shards always stream their history, so the combined report can be rendered from disk
+    observer = StreamingObserver(os.path.join(shard_dir, "history"))
+    capture = make_image_provider(args)
+    rate_limited = RateLimitedImageProvider(capture, bucket)
+    image_provider = rate_limited
+    action_handler = make_action_handler()
+    apply_capture_region(args, image_provider, action_handler)
+    tracer = Tracer() if args.trace else None
+    observer, image_provider, action_handler = instrument(tracer, observer, image_provider, action_handler)
+
+    instruction, todos, list_of_checkers = build_suite(pages)
+    tasker = QATaskerAgent(
+        api_key=os.getenv("OAGI_API_KEY"),
+        base_url=os.getenv("OAGI_BASE_URL", "https://api.agiopen.org"),
+        model=args.model_name,
+        max_steps=args.max_steps,
+        temperature=args.temperature,
+        step_observer=observer,
+        list_of_checkers=list_of_checkers,
+        vlm=vlm,
+        save_dir=shard_dir,
+        num_vlm_workers=args.vlm_workers,
+        save_screenshots=not args.skip_screenshot_save,
+        preprocess=preprocess,
+        verifier=verifier,
+        # Shards share one store; blobs are renamed into place, so concurrent writes are safe
+        artifact_store=ArtifactStore(args.artifact_store) if args.artifact_store else None,
+        **budget_kwargs(args),
+    )
+    tasker.set_task(task=instruction, todos=todos)
+
+    started_at, start = datetime.now(), time.perf_counter()
+    success, error = False, None
+    try:
+        success, qa_result = await tasker.execute(
+            instruction="",
+            action_handler=action_handler,
+            image_provider=image_provider,
+        )
+    except Exception as e:
+        error = repr(e)
+        raise
+    finally:
+        # Same workflow name as the unsharded run, so per-todo history lines up; a shard covers only
+        # some pages, so it is marked partial and kept out of the workflow-level wall time and steps
+        write_run_record(
+            shard_dir, "nuclear_qa_vlm", tasker.get_memory(), success, started_at, time.perf_counter() - start, error,
+            vlm_results=tasker.qa_result, vlm_timings=tasker.qa_timings, params={"pages": pages},
+            exp_name=args.exp_name, partial=True,
+        )
+    observer.close()
+    export_trace(tracer, shard_dir, "nuclear_qa")
+    print_verifier_stats(verifier)
+    print_capture_stats(capture)
+    print_budget_stats(tasker)
+    print_engine_stats(vlm)
+    print_hedge_stats(vlm)
+    if isinstance(vlm, (AsyncModelEngine, HedgedEngine)):
+        vlm.close()
+    return {
+        "success": success,
+        "qa_result": qa_result,
+        "qa_timings": tasker.qa_timings,
+        "todo_status": {status.value: count for status, count in tasker.get_memory().get_todo_status_summary().items()},
+        "rate_limit_wait_s": round(rate_limited.waited_s, 2),
+        "verifier": verifier.stats() if verifier is not None else None,
+        "artifacts": tasker.artifact_store.stats() if tasker.artifact_store is not None else None,
+        "vlm_hedge": vlm.stats() if isinstance(vlm, HedgedEngine) else None,
+    }
+
+
+def shard_main(shard_id, pages, args, result_queue, bucket) -> None:
+    """Own one Xvfb display and Nuclear instance, and run the QA agent over this shard's pages."""
+    shard_dir = os.path.join(args.save_dir, args.exp_name, f"shard_{shard_id}")
+    os.makedirs(shard_dir, exist_ok=True)
+    display = VirtualDisplay(args.display_base + shard_id, args.screen_width, args.screen_height)
+    result = {"shard": shard_id, "display": display.name, "pages": pages, "success": False, "error": None}
+    start = time.perf_counter()
+    try:
+        with display, tempfile.TemporaryDirectory(prefix="lux-nuclear-") as profile_dir:
+            with ManagedProcess(nuclear_command(args.nuclear, profile_dir), settle_s=args.app_settle):
+                result["startup_s"] = round(time.perf_counter() - start, 2)
+                print(f"[shard {shard_id} {display.name}] {len(pages)} pages: {', '.join(pages)}")
+                agent_start = time.perf_counter()
+                result.update(asyncio.run(run_shard(pages, args, shard_dir, bucket)))
+                result["agent_s"] = round(time.perf_counter() - agent_start, 2)
+    except Exception as e:
+        result["error"] = str(e)
+        traceback.print_exc()
+    result["elapsed_s"] = round(time.perf_counter() - start, 2)
+    result_queue.put(result)
+
+
+def main():
+    from software_qa_with_gemini_vlm_analysis import SIDEBAR_PAGES
+
+    parser = argparse.ArgumentParser(description='Run the Nuclear Player QA suite sharded across virtual displays')
+    parser.add_argument('--shards', type=int, default=4, help='Number of Nuclear instances (one Xvfb display each)')
+    parser.add_argument('--pages', type=str, default='', help='Comma-separated sidebar pages to check (default: all)')
+    parser.add_argument('--exp_name', type=str, default='nuclear_qa_sharded')
+    parser.add_argument('--save_dir', type=str, default='results/')
+    parser.add_argument('--model_info_path', type=str, default='apis/gemini.json')
+    parser.add_argument('--model_name', type=str, default='lux-actor-1')
+    parser.add_argument('--max_steps', type=int, default=24)
+    parser.add_argument('--temperature', type=float, default=0.0)
+    parser.add_argument('--trace', action='store_true', help='Record per-phase latency spans for every shard')
+    parser.add_argument('--vlm_workers', type=int, default=2, help='Concurrent background VLM checks per shard')
+    parser.add_argument('--vlm_max_dim', type=int, default=None, help='Downscale VLM screenshots so the longest side fits')
+    parser.add_argument('--vlm_crop', type=str, default='', help='Crop preset (main_pane, page_header) or left,top,right,bottom fractions')
+    parser.add_argument('--vlm_format', type=str, default=None, choices=['PNG', 'JPEG', 'WEBP'], help='Re-encode VLM screenshots')
+    parser.add_argument('--vlm_quality', type=int, default=80, help='JPEG/WebP quality for re-encoded screenshots')
+    parser.add_argument('--verify_refs', type=str, default='', help='Directory of reference page screenshots for the local verifier (learned from VLM answers)')
+    parser.add_argument('--verify_ocr', action='store_true', help='OCR the page header before asking the VLM (needs pytesseract)')
+    parser.add_argument('--verify_threshold', type=float, default=0.9, help='Local verifier confidence needed to skip the VLM')
+    parser.add_argument('--skip_screenshot_save', action='store_true', help='Do not write VLM screenshots to the shard directories')
+    parser.add_argument('--artifact_store', type=str, default='', help='Content-addressed directory shared by the shards to keep screenshots in (disabled if empty)')
+    add_engine_arguments(parser)
+    add_hedge_arguments(parser)
+    add_capture_arguments(parser)
+    add_budget_arguments(parser)
+    parser.add_argument('--lux_rps', type=float, default=2.0, help='Global Lux request rate across all shards')
+    parser.add_argument('--lux_burst', type=float, default=4.0, help='Token bucket burst size')
+    parser.add_argument('--display_base', type=int, default=99, help='First Xvfb display number')
+    parser.add_argument('--screen_width', type=int, default=1920)
+    parser.add_argument('--screen_height', type=int, default=1080)
+    parser.add_argument('--nuclear', type=str, default='nuclear', help='Nuclear Player binary or AppImage')
+    parser.add_argument('--app_settle', type=float, default=8.0, help='Seconds to wait after launching Nuclear')
+
+    args = parser.parse_args()
+
+    pages = [p.strip() for p in args.pages.split(",") if p.strip()] if args.pages else list(SIDEBAR_PAGES)
+    unknown = [page for page in pages if page not in SIDEBAR_PAGES]
+    if unknown:
+        parser.error(f"unknown sidebar pages: {', '.join(unknown)}")
+
+    save_dir = os.path.join(args.save_dir, args.exp_name)
+    os.makedirs(save_dir, exist_ok=True)
+
+    shards = shard_pages(pages, args.shards)
+    # spawn, not fork: every shard must import pyautogui fresh against its own display
+    ctx = multiprocessing.get_context("spawn")
+    bucket = SharedTokenBucket(args.lux_rps, args.lux_burst, ctx)
+    result_queue = ctx.Queue()
+
+    print(f"Starting {len(pages)} QA pages on {len(shards)} shards at {datetime.now()}")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    processes = [
+        ctx.Process(target=shard_main, args=(i, shard, args, result_queue, bucket), name=f"nuclear-shard-{i}")
+        for i, shard in enumerate(shards)
+    ]
+    for process in processes:
+        process.start()
+
+    results = []
+    while len(results) < len(shards):
+        if not any(process.is_alive() for process in processes) and result_queue.empty():
+            print("All shards exited before reporting")
+            break
+        try:
+            result = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            continue
+        results.append(result)
+        status = "✅" if result.get("success") else "❌"
+        print(f"  {status} shard {result['shard']} ({result['elapsed_s']}s): {result.get('error') or result.get('qa_result')}")
+
+    for process in processes:
+        process.join()
+    wall_s = time.perf_counter() - start
+    results.sort(key=lambda r: r["shard"])
+
+    # Merge in suite order, whichever shard a page landed on
+    merged_result, merged_timings = {}, {}
+    for page in pages:
+        for result in results:
+            if page in result.get("qa_result", {}):
+                merged_result[page] = result["qa_result"][page]
+                merged_timings[page] = result["qa_timings"].get(page, {})
+    missing = [page for page in pages if page not in merged_result]
+
+    # One instance running every page would start Nuclear once and then do all shards' QA work back to back
+    qa_s = sum(r.get("agent_s", 0) for r in results)
+    startups = [r["startup_s"] for r in results if "startup_s" in r]
+    single_instance_s = (sum(startups) / len(startups) if startups else 0.0) + qa_s
+    summary = {
+        "pages": len(pages),
+        "shards": len(shards),
+        "succeeded_shards": sum(1 for r in results if r.get("success")),
+        "wall_s": round(wall_s, 2),
+        "qa_s_total": round(qa_s, 2),
+        # An estimate; compare against a real `--shards 1` run for the exact figure
+        "est_single_instance_s": round(single_instance_s, 2),
+        "est_speedup_vs_single_instance": round(single_instance_s / wall_s, 2) if wall_s > 0 else 0.0,
+        "pages_per_minute": round(len(merged_result) / wall_s * 60, 2) if wall_s > 0 else 0.0,
+        "lux_rps_limit": args.lux_rps,
+        "qa_result": merged_result,
+        "qa_timings": merged_timings,
+        "missing": missing,
+        "shard_results": results,
+    }
+    summary_path = os.path.join(save_dir, "qa_result.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=4)
+
+    report_path = os.path.join(save_dir, "nuclear_qa_execution_history.html")
+    sections = [
+        (f"Shard {r['shard']} ({r['display']}): {', '.join(r['pages'])}", os.path.join(save_dir, f"shard_{r['shard']}", "history"))
+        for r in results
+    ]
+    sections = [(label, log_dir) for label, log_dir in sections if os.path.exists(os.path.join(log_dir, "events.jsonl"))]
+    render_combined_report(sections, report_path)
+
+    print("\n" + "=" * 60)
+    print("QA VALIDATION RESULTS")
+    print("=" * 60)
+    for page in pages:
+        print(f"  {page}: {merged_result.get(page, 'missing')}")
+
+    print(f"\n{'shard':>6}{'pages':>7}{'startup s':>11}{'agent s':>10}{'total s':>10}{'lux wait s':>12}")
+    for r in results:
+        print(
+            f"{r['shard']:>6}{len(r['pages']):>7}{r.get('startup_s', 0):>11}{r.get('agent_s', 0):>10}"
+            f"{r.get('elapsed_s', 0):>10}{r.get('rate_limit_wait_s', 0):>12}"
+        )
+    print(
+        f"\nShards: {len(shards)}, wall time: {wall_s:.1f}s, an estimated {summary['est_speedup_vs_single_instance']}x faster "
+        f"than one instance ({single_instance_s:.1f}s: one startup plus {qa_s:.1f}s of QA)"
+    )
+    print(f"Throughput: {summary['pages_per_minute']} pages/minute")
+    artifact_stats = [r["artifacts"] for r in results if r.get("artifacts")]
+    if artifact_stats:
+        print(
+            f"Artifact store: {sum(s['new_blobs'] for s in artifact_stats)} new blobs, "
+            f"{sum(s['dedup_hits'] for s in artifact_stats)} already stored, "
+            f"{sum(s['bytes_saved'] for s in artifact_stats)} B saved"
+        )
+    if missing:
+        print(f"⚠️  No result for: {', '.join(missing)}")
+    print(f"\n📄 QA results written to: {summary_path}")
+    print(f"📄 Combined execution history: {report_path}")
+
+
+if __name__ == '__main__':
+    main()
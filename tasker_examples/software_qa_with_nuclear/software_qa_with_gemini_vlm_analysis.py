@@ -1,104 +1,244 @@
 import os
+import sys
 import json
 import argparse
-import base64
+import threading
+import dataclasses
 import asyncio
+import time
 import traceback
 from datetime import datetime
 import logging
 
-from oagi import AsyncScreenshotMaker
-from oagi.types import SplitEvent
+from oagi.types import AsyncActionHandler, AsyncImageProvider, SplitEvent
 from oagi.agent.observer import AsyncAgentObserver
 from oagi.agent.tasker import TaskerAgent
-from oagi.handler import AsyncPyautoguiActionHandler
+from oagi.agent.tasker.models import TodoStatus
 
 from model_engine import ModelEngine, ModelInfo
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lux_utils.artifacts import ArtifactStore, AsyncArtifactWriter, print_artifact_stats, read_manifest, resolve  # noqa: E402
+from lux_utils.async_engine import AsyncModelEngine, add_engine_arguments, print_engine_stats  # noqa: E402
+from lux_utils.budget import BudgetMixin, add_budget_arguments, budget_kwargs, print_budget_stats  # noqa: E402
+from lux_utils.hedging import HedgedEngine, add_hedge_arguments, print_hedge_stats  # noqa: E402
+from lux_utils.checkpoint import CheckpointMixin, TodoCheckpoint, print_checkpoint_stats  # noqa: E402
+from lux_utils.imaging import PreprocessConfig, encode_image, parse_crop  # noqa: E402
+from lux_utils.pipeline import add_pipeline_arguments, close_pipeline, pipeline, pipeline_config, print_pipeline_stats  # noqa: E402
+from lux_utils.run_history import write_run_record  # noqa: E402
+from lux_utils.streaming_observer import StreamingObserver  # noqa: E402
+from lux_utils.vlm import analyze_screenshot  # noqa: E402
+from lux_utils.vlm_cache import VLMAnswerCache  # noqa: E402
+from lux_utils.verifier import CheckDecision, VerifierChain, build_verifier_chain, print_verifier_stats  # noqa: E402
+from lux_utils.vlm_pipeline import VLMCheck, VLMWorkerPool  # noqa: E402
+from lux_utils.tracing import Tracer, export_trace, instrument  # noqa: E402
+from lux_utils.trajectory_cache import TrajectoryCache, TrajectoryCacheMixin, print_trajectory_stats  # noqa: E402
+from lux_utils.x11_capture import add_capture_arguments, apply_capture_region, make_image_provider, print_capture_stats  # noqa: E402
+
 logger = logging.getLogger(__name__)
 
+# Regions of the Nuclear window worth sending to the VLM, as left, top, right, bottom fractions
+CROP_PRESETS = {
+    "main_pane": (0.18, 0.0, 1.0, 1.0),
+    "page_header": (0.18, 0.0, 1.0, 0.3),
+}
+
+# Sidebar pages the QA suite clicks through; each one is a todo and a VLM check
+SIDEBAR_PAGES = [
+    "Dashboard", "Downloads", "Lyrics", "Plugins",
+    "Search Results", "Settings", "Equalizer", "Visualizer",
+    "Listening History", "Favorite Albums", "Favorite Tracks",
+    "Favorite Artists", "Local Library", "Playlists",
+]
 
-def analyze_screenshot(screenshot_path: str, question: str, vlm: ModelEngine):
-    """Encode a screenshot and ask the model to answer `question` about it."""
-    if not os.path.exists(screenshot_path):
-        raise FileNotFoundError(f"Screenshot not found: {screenshot_path}")
 
-    with open(screenshot_path, "rb") as f:
-        b64_image = base64.b64encode(f.read()).decode("ascii")
+def build_suite(pages: list[str] = SIDEBAR_PAGES) -> tuple[str, list[str], list[str]]:
+    """Instruction, todos and matching checker names for clicking through `pages`."""
+    instruction = "QA: click through every sidebar button in the Nuclear Player UI"
+    todos = [f"Click on '{page}' in the left sidebar" for page in pages]
+    return instruction, todos, list(pages)
 
-    lower_path = screenshot_path.lower()
-    if lower_path.endswith((".jpg", ".jpeg")):
-        mime = "image/jpeg"
-    else:
-        mime = "image/png"
 
-    user_messages = [
-        {"type": "text", "content": question},
-        {"type": "image_url", "image_url": {"url": f"data:{mime};base64,{b64_image}"}},
-    ]
+def make_action_handler():
+    # pyautogui needs a display at import time, so it is imported only once one is up
+    from oagi.handler import AsyncPyautoguiActionHandler
 
-    return vlm([], user_messages)
+    return AsyncPyautoguiActionHandler()
 
 
-class QATaskerAgent(TaskerAgent):
-    def __init__(self, list_of_checkers: list[str], vlm: ModelEngine, save_dir: str, *args, **kwargs):
+class QATaskerAgent(CheckpointMixin, TrajectoryCacheMixin, BudgetMixin, TaskerAgent):
+    def __init__(
+        self,
+        list_of_checkers: list[str],
+        vlm: ModelEngine,
+        save_dir: str,
+        *args,
+        num_vlm_workers: int = 4,
+        save_screenshots: bool = True,
+        vlm_cache: VLMAnswerCache | None = None,
+        preprocess: PreprocessConfig | None = None,
+        verifier: VerifierChain | None = None,
+        artifact_store: ArtifactStore | None = None,
+        pipelined: bool = False,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
         self.list_of_checkers = list_of_checkers
         self.vlm = vlm
         self.save_dir = save_dir
+        self.num_vlm_workers = num_vlm_workers
+        self.save_screenshots = save_screenshots
+        self.vlm_cache = vlm_cache
+        self.preprocess = preprocess
+        self.verifier = verifier
+        self.artifact_store = artifact_store
+        self.pipelined = pipelined
         self.qa_result = {}
-    
+        self.qa_timings = {}
+        self._result_lock = threading.Lock()
+
+    async def _record_check(self, check: VLMCheck) -> None:
+        """Fill `qa_result` as soon as a background check finishes, and checkpoint it."""
+        timing = check.timing()
+        decision = check.answer
+        if isinstance(decision, CheckDecision):
+            timing.update(stage=decision.stage, confidence=round(decision.confidence, 3), stage_s=decision.stage_s)
+            check.answer = decision.answer
+        result = check.answer if check.error is None else f"VLM error: {check.error}"
+        with self._result_lock:
+            self.qa_result[check.key] = result
+            self.qa_timings[check.key] = timing
+        # The todo's own checkpoint was saved before its check was even submitted
+        await self._save_checkpoint()
+        print(f"{timing.get('stage', 'vlm').upper()} result for {check.key}: {result} ({check.duration:.2f}s)")
+
+    async def _save_checkpoint(self) -> None:
+        if self.checkpoint is not None:
+            await self.checkpoint.asave(self.memory, self.checkpoint_state())
+
+    def checkpoint_state(self) -> dict:
+        # Checks still in flight when the run stops are missing here; `execute` re-checks their todos on resume
+        return {"qa_result": dict(self.qa_result), "qa_timings": dict(self.qa_timings)}
+
+    def load_checkpoint_state(self, state: dict) -> None:
+        self.qa_result = dict(state.get("qa_result", {}))
+        self.qa_timings = dict(state.get("qa_timings", {}))
+
+    def _question(self, checker: str) -> str:
+        return f"Check if software is displaying the page of {checker} with a simple yes or no answer"
+
+    def _screenshot_path(self, todo_index: int) -> str:
+        return os.path.join(self.save_dir, f"todo_{todo_index}_{self.list_of_checkers[todo_index]}_screenshot.png")
+
+    def _saved_screenshot(self, todo_index: int) -> str | None:
+        """The check screenshot an earlier run saved for `todo_index` (a file or a store blob), if any."""
+        stem = os.path.splitext(os.path.basename(self._screenshot_path(todo_index)))[0]
+        names = set(os.listdir(self.save_dir)) | set(read_manifest(self.save_dir)["artifacts"])
+        for name in sorted(names):
+            if os.path.splitext(name)[0] == stem:
+                try:
+                    return resolve(os.path.join(self.save_dir, name))
+                except FileNotFoundError:
+                    return None
+        return None
+
+    def _recheck_resumed(self, pool: VLMWorkerPool) -> None:
+        """Queue checks for resumed todos whose result never made it into the checkpoint.
+
+        The screenshot saved by the earlier run is checked again; a todo without
+        one goes back to pending, so it runs again and gets a fresh check.
+        """
+        for todo_index, todo in enumerate(self.memory.todos):
+            checker = self.list_of_checkers[todo_index]
+            if todo.status != TodoStatus.COMPLETED or checker in self.qa_result:
+                continue
+            path = self._saved_screenshot(todo_index)
+            if path is not None and os.path.exists(path):
+                logger.info(f"Re-checking resumed todo {todo_index} from {path}")
+                pool.submit(checker, self._question(checker), path)
+            else:
+                logger.info(f"Resumed todo {todo_index} has no QA result or screenshot; running it again")
+                self.memory.update_todo(todo_index, TodoStatus.PENDING)
+
+    async def _submit_check(self, pool: VLMWorkerPool, writer: AsyncArtifactWriter, todo_index: int, screenshot) -> None:
+        checker = self.list_of_checkers[todo_index]
+        # Encode once in memory; the same bytes feed the VLM and the optional artifact
+        encoded = await asyncio.to_thread(encode_image, screenshot, preprocess=self.preprocess)
+        writer.write(encoded, self._screenshot_path(todo_index))
+        pool.submit(checker, self._question(checker), encoded)
+
     async def execute(
         self,
         instruction: str,
-        action_handler: AsyncPyautoguiActionHandler,
-        image_provider: AsyncScreenshotMaker,
+        action_handler: AsyncActionHandler,
+        image_provider: AsyncImageProvider,
     ):
         overall_success = True
-
-        while True:
-            todo_info = self._prepare()
-
-            if todo_info is None:
-                logger.info("No more todos to execute")
-                break
-
-            todo, todo_index = todo_info
-            logger.info(f"Executing todo {todo_index}: {todo.description}")
-
-            if self.step_observer:
-                await self.step_observer.on_event(
-                    SplitEvent(label=f"Start of todo {todo_index + 1}: {todo.description}")
-                )
-
-            success = await self._execute_todo(todo_index, action_handler, image_provider)
-
-            if self.step_observer:
-                await self.step_observer.on_event(
-                    SplitEvent(label=f"End of todo {todo_index + 1}: {todo.description}")
-                )
-
-            if not success:
-                logger.warning(f"Todo {todo_index} failed")
-                overall_success = False
-                break
-
-            self._update_task_summary()
-
-            screenshot_path = os.path.join(
-                self.save_dir, 
-                f"todo_{todo_index}_{self.list_of_checkers[todo_index]}_screenshot.png"
+        # Checks run in the background so the next todo starts right away
+        if self.verifier is not None:
+            pool = VLMWorkerPool(self.verifier, num_workers=self.num_vlm_workers, on_result=self._record_check, keyed=True)
+        else:
+            pool = VLMWorkerPool(
+                lambda image, question: analyze_screenshot(image, question, self.vlm, self.vlm_cache),
+                num_workers=self.num_vlm_workers,
+                on_result=self._record_check,
             )
-            last_screenshot = await image_provider()
-            last_screenshot.image.save(screenshot_path)
-            
-            result = analyze_screenshot(
-                screenshot_path, 
-                f"Check if software is displaying the page of {self.list_of_checkers[todo_index]} with a simple yes or no answer", 
-                self.vlm
-            )
-            print(f"VLM result for {self.list_of_checkers[todo_index]}: {result}")
-            self.qa_result[self.list_of_checkers[todo_index]] = result
+        writer = AsyncArtifactWriter(enabled=self.save_screenshots, store=self.artifact_store)
+        submits: list[asyncio.Task] = []
+        self._recheck_resumed(pool)
+
+        try:
+            while True:
+                todo_info = self._prepare()
+
+                if todo_info is None:
+                    logger.info("No more todos to execute")
+                    break
+
+                todo, todo_index = todo_info
+                logger.info(f"Executing todo {todo_index}: {todo.description}")
+
+                if self.step_observer:
+                    await self.step_observer.on_event(
+                        SplitEvent(label=f"Start of todo {todo_index + 1}: {todo.description}")
+                    )
+
+                success = await self._execute_todo(todo_index, action_handler, image_provider)
+
+                if self.step_observer:
+                    await self.step_observer.on_event(
+                        SplitEvent(label=f"End of todo {todo_index + 1}: {todo.description}")
+                    )
+
+                if not success:
+                    logger.warning(f"Todo {todo_index} failed")
+                    overall_success = False
+                    break
+
+                self._update_task_summary()
+
+                last_screenshot = await image_provider()
+                if self.pipelined:
+                    # Encode and queue the check while the next todo plans on this same (already uploaded) frame
+                    submits.append(asyncio.create_task(self._submit_check(pool, writer, todo_index, last_screenshot)))
+                else:
+                    await self._submit_check(pool, writer, todo_index, last_screenshot)
+
+            await asyncio.gather(*submits)
+            await pool.join()
+        finally:
+            # After an error or cancellation, stop the queued encodes and checks instead of leaving them running;
+            # results that already came in are checkpointed, and resume re-checks the rest
+            for task in submits:
+                task.cancel()
+            await asyncio.gather(*submits, return_exceptions=True)
+            await pool.cancel()
+            await writer.flush()
+        # Workers finish out of order, and resumed results come from an earlier run; report in todo order
+        with self._result_lock:
+            self.qa_result = {key: self.qa_result[key] for key in self.list_of_checkers if key in self.qa_result}
+            self.qa_timings = {key: self.qa_timings[key] for key in self.list_of_checkers if key in self.qa_timings}
+        await self._save_checkpoint()
 
         status_summary = self.memory.get_todo_status_summary()
         logger.info(f"Workflow complete. Status summary: {status_summary}")
@@ -115,49 +255,92 @@ async def main():
     parser.add_argument('--model_name', type=str, default='lux-actor-1')
     parser.add_argument('--max_steps', type=int, default=24)
     parser.add_argument('--temperature', type=float, default=0.0)
+    parser.add_argument('--trace', action='store_true', help='Record per-phase latency spans (Chrome trace + JSONL)')
+    parser.add_argument('--stream_history', action='store_true', help='Write events and screenshots to <save_dir>/history as they arrive instead of holding them in memory')
+    parser.add_argument('--vlm_workers', type=int, default=4, help='Concurrent background VLM checks')
+    parser.add_argument('--vlm_cache', type=str, default='', help='SQLite file for the VLM answer cache (disabled if empty)')
+    parser.add_argument('--vlm_cache_distance', type=int, default=4, help='Max perceptual-hash bit distance for a cache hit')
+    parser.add_argument('--vlm_cache_ttl_hours', type=float, default=24.0, help='Ignore cached answers older than this')
+    parser.add_argument('--vlm_cache_size', type=int, default=5000, help='Max cached answers before LRU eviction')
+    parser.add_argument('--vlm_max_dim', type=int, default=None, help='Downscale VLM screenshots so the longest side fits')
+    parser.add_argument('--vlm_crop', type=str, default='', help='Crop preset (main_pane, page_header) or left,top,right,bottom fractions')
+    parser.add_argument('--vlm_format', type=str, default=None, choices=['PNG', 'JPEG', 'WEBP'], help='Re-encode VLM screenshots')
+    parser.add_argument('--vlm_quality', type=int, default=80, help='JPEG/WebP quality for re-encoded screenshots')
+    parser.add_argument('--skip_screenshot_save', action='store_true', help='Do not write VLM screenshots to save_dir')
+    parser.add_argument('--artifact_store', type=str, default='', help='Content-addressed directory to keep screenshots in, deduplicated across runs (disabled if empty)')
+    add_engine_arguments(parser)
+    add_hedge_arguments(parser)
+    add_capture_arguments(parser)
+    parser.add_argument('--trajectory_cache', type=str, default='', help='SQLite file of known-good action sequences to replay (disabled if empty)')
+    parser.add_argument('--trajectory_distance', type=int, default=6, help='Max perceptual-hash bit distance for a screen to match')
+    parser.add_argument('--verify_refs', type=str, default='', help='Directory of reference page screenshots for the local verifier (learned from VLM answers)')
+    parser.add_argument('--verify_ocr', action='store_true', help='OCR the page header before asking the VLM (needs pytesseract)')
+    parser.add_argument('--verify_threshold', type=float, default=0.9, help='Local verifier confidence needed to skip the VLM')
+    parser.add_argument('--resume', action='store_true', help='Skip todos completed by the last run of this exp_name')
+    parser.add_argument('--resume_check', action='store_true', help='With --resume, start over unless the screen still matches the checkpoint')
+    add_budget_arguments(parser)
+    add_pipeline_arguments(parser)
 
     args = parser.parse_args()
 
     save_dir = os.path.join(args.save_dir, args.exp_name)
     os.makedirs(save_dir, exist_ok=True)
 
-    with open(args.model_info_path, 'r', encoding='utf-8') as f:
-        model_info = json.load(f)
-    model_info = ModelInfo(**model_info)
-    vlm = ModelEngine(model_info)
+    def make_vlm(model_info_path):
+        with open(model_info_path, 'r', encoding='utf-8') as f:
+            model_info = ModelInfo(**json.load(f))
+        return AsyncModelEngine.from_args(model_info, args) if args.vlm_pooled else ModelEngine(model_info)
+
+    vlm = HedgedEngine.from_args(args, make_vlm) if args.vlm_hedge else make_vlm(args.model_info_path)
+    preprocess = PreprocessConfig(
+        max_dim=args.vlm_max_dim,
+        crop=parse_crop(args.vlm_crop, CROP_PRESETS),
+        format=args.vlm_format,
+        quality=args.vlm_quality,
+    )
+    vlm_cache = None
+    if args.vlm_cache:
+        vlm_cache = VLMAnswerCache(
+            args.vlm_cache,
+            max_distance=args.vlm_cache_distance,
+            ttl_s=args.vlm_cache_ttl_hours * 3600,
+            max_entries=args.vlm_cache_size,
+        )
+    trajectory_cache = None
+    if args.trajectory_cache:
+        trajectory_cache = TrajectoryCache(args.trajectory_cache, max_distance=args.trajectory_distance)
+
+    verifier = build_verifier_chain(
+        lambda image, question: analyze_screenshot(image, question, vlm, vlm_cache),
+        reference_dir=args.verify_refs,
+        # OCR the header of the full frame; with --vlm_crop the frame is already cropped
+        ocr_crop=None if args.vlm_crop else CROP_PRESETS["page_header"],
+        use_ocr=args.verify_ocr,
+        threshold=args.verify_threshold,
+    )
 
-    instruction = "QA: click through every sidebar button in the Nuclear Player UI"
-    todos = [
-        "Click on 'Dashboard' in the left sidebar",
-        "Click on 'Downloads' in the left sidebar",
-        "Click on 'Lyrics' in the left sidebar",
-        "Click on 'Plugins' in the left sidebar",
-        "Click on 'Search Results' in the left sidebar",
-        "Click on 'Settings' in the left sidebar",
-        "Click on 'Equalizer' in the left sidebar",
-        "Click on 'Visualizer' in the left sidebar",
-        "Click on 'Listening History' in the left sidebar",
-        "Click on 'Favorite Albums' in the left sidebar",
-        "Click on 'Favorite Tracks' in the left sidebar",
-        "Click on 'Favorite Artists' in the left sidebar",
-        "Click on 'Local Library' in the left sidebar",
-        "Click on 'Playlists' in the left sidebar",
-    ]
-
-    list_of_checkers = [
-        "Dashboard", "Downloads", "Lyrics", "Plugins",
-        "Search Results", "Settings", "Equalizer", "Visualizer",
-        "Listening History", "Favorite Albums", "Favorite Tracks",
-        "Favorite Artists", "Local Library", "Playlists",
-    ]
-
-    observer = AsyncAgentObserver()
-    image_provider = AsyncScreenshotMaker()
-    action_handler = AsyncPyautoguiActionHandler()
+    artifact_store = ArtifactStore(args.artifact_store) if args.artifact_store else None
 
+    instruction, todos, list_of_checkers = build_suite()
+
+    observer = StreamingObserver(os.path.join(save_dir, "history"), resume=args.resume) if args.stream_history else AsyncAgentObserver()
+    image_provider = make_image_provider(args)
+    action_handler = make_action_handler()
+    apply_capture_region(args, image_provider, action_handler)
+    capture = image_provider
+
+    tracer = Tracer() if args.trace else None
+    observer, image_provider, action_handler = instrument(tracer, observer, image_provider, action_handler)
+    api_key = os.getenv("OAGI_API_KEY")
+    base_url = os.getenv("OAGI_BASE_URL", "https://api.agiopen.org")
+    observer, image_provider, action_handler = pipeline(
+        pipeline_config(args), observer, image_provider, action_handler, api_key=api_key, base_url=base_url
+    )
+
+    checkpoint = TodoCheckpoint(save_dir)
     tasker = QATaskerAgent(
-        api_key=os.getenv("OAGI_API_KEY"),
-        base_url=os.getenv("OAGI_BASE_URL", "https://api.agiopen.org"),
+        api_key=api_key,
+        base_url=base_url,
         model=args.model_name,
         max_steps=args.max_steps,
         temperature=args.temperature,
@@ -165,15 +348,30 @@ async def main():
         list_of_checkers=list_of_checkers,
         vlm=vlm,
         save_dir=save_dir,
+        num_vlm_workers=args.vlm_workers,
+        save_screenshots=not args.skip_screenshot_save,
+        vlm_cache=vlm_cache,
+        preprocess=preprocess,
+        verifier=verifier,
+        artifact_store=artifact_store,
+        pipelined=args.pipeline,
+        trajectory_cache=trajectory_cache,
+        checkpoint=checkpoint,
+        **budget_kwargs(args),
     )
 
     tasker.set_task(task=instruction, todos=todos)
+    if args.resume:
+        await tasker.restore_checkpoint(image_provider, check_screen=args.resume_check)
 
-    print(f"Starting task execution at {datetime.now()}")
+    started_at = datetime.now()
+    print(f"Starting task execution at {started_at}")
     print(f"Task: {instruction}")
     print(f"Number of todos: {len(todos)}")
     print("=" * 60)
 
+    start = time.perf_counter()
+    success, error = False, None
     try:
         success, qa_result = await tasker.execute(
             instruction="",
@@ -208,24 +406,55 @@ async def main():
 
         print("\nQA Validation Results:")
         for checker, result in qa_result.items():
-            print(f"  {checker}: {result}")
+            timing = tasker.qa_timings.get(checker, {})
+            print(
+                f"  {checker}: {result} (decided by {timing.get('stage', 'vlm')}, "
+                f"queued {timing.get('queue_wait_s', 0)}s, check {timing.get('vlm_s', 0)}s)"
+            )
 
     except Exception as e:
         print(f"\n❌ Error during execution: {e}")
         traceback.print_exc()
+        error = repr(e)
+    # Background checks that finished are in qa_result even when the run failed
+    write_run_record(
+        save_dir, "nuclear_qa_vlm", tasker.get_memory(), success, started_at, time.perf_counter() - start, error,
+        vlm_results=tasker.qa_result, vlm_timings=tasker.qa_timings,
+    )
 
-    screenshot_path = os.path.join(save_dir, f"{args.product_name}_screenshot.png")
+    writer = AsyncArtifactWriter(enabled=not args.skip_screenshot_save, store=artifact_store)
     last_screenshot = await image_provider()
-    last_screenshot.image.save(screenshot_path)
-    result = analyze_screenshot(
-        screenshot_path,
+    # The sidebar question needs the whole window, so only the downscale/re-encode apply here
+    encoded = encode_image(last_screenshot, preprocess=dataclasses.replace(preprocess, crop=None))
+    writer.write(encoded, os.path.join(save_dir, f"{args.product_name}_screenshot.png"))
+    result = await asyncio.to_thread(
+        analyze_screenshot,
+        encoded,
         "List the sidebar buttons visible in the Nuclear Player and describe any that look disabled.",
         vlm,
+        vlm_cache,
     )
     print(f"VLM result: {result}")
+    await writer.flush()
+    print_artifact_stats(artifact_store)
+    if vlm_cache:
+        print(f"VLM cache: {vlm_cache.stats()}")
+        vlm_cache.close()
+    print_engine_stats(vlm)
+    print_hedge_stats(vlm)
+    if isinstance(vlm, (AsyncModelEngine, HedgedEngine)):
+        vlm.close()
+    print_trajectory_stats(trajectory_cache)
+    print_checkpoint_stats(checkpoint)
+    print_budget_stats(tasker)
+    print_verifier_stats(verifier)
+    print_capture_stats(capture)
+    print_pipeline_stats(observer)
+    await close_pipeline(image_provider)
 
     output_file = os.path.join(save_dir, "nuclear_qa_execution_history.html")
     observer.export("html", output_file)
+    export_trace(tracer, save_dir, "nuclear_qa")
     print(f"\n📄 Execution history exported to: {output_file}")
 
 